@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
-from .models import User, Resource, Tag, Rating, Comment
+from .models import User, Resource, Tag, Rating, Comment, ProcessingJob, UploadSession
 
 # Custom admin site configuration
 admin.site.site_header = 'StudyShare Administration'
@@ -22,10 +22,11 @@ class UserAdmin(BaseUserAdmin):
 
 @admin.register(Resource)
 class ResourceAdmin(admin.ModelAdmin):
-    list_display = ['title', 'uploader', 'subject', 'topic', 'course_code', 'upload_date', 'download_count', 'average_rating']
-    list_filter = ['subject', 'topic', 'course_code', 'upload_date', 'uploader__role']
+    list_display = ['title', 'uploader', 'subject', 'topic', 'course_code', 'upload_date', 'file_size', 'download_count', 'average_rating']
+    list_filter = ['subject', 'topic', 'course_code', 'upload_date', 'uploader__role', 'file_extension']
     search_fields = ['title', 'description', 'subject', 'topic', 'course_code']
-    readonly_fields = ['upload_date', 'download_count', 'average_rating']
+    readonly_fields = ['upload_date', 'original_filename', 'file_size', 'mime_type', 'file_extension',
+                       'download_count', 'rating_count', 'average_rating']
     filter_horizontal = ['tags']
     date_hierarchy = 'upload_date'
     
@@ -62,4 +63,24 @@ class CommentAdmin(admin.ModelAdmin):
     content_preview.short_description = 'Content Preview'
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('resource', 'user')
\ No newline at end of file
+        return super().get_queryset(request).select_related('resource', 'user')
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'total_size', 'status', 'created_at', 'updated_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['filename', 'user__username']
+    readonly_fields = ['received_chunks', 'created_at', 'updated_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+
+@admin.register(ProcessingJob)
+class ProcessingJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'resource', 'status', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['attempts', 'error', 'created_at', 'started_at', 'finished_at']
+    raw_id_fields = ['resource']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('resource')
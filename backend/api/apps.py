@@ -1,5 +1,13 @@
+import logging
 from django.apps import AppConfig
+from django.conf import settings
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'api'
\ No newline at end of file
+    name = 'api'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .logs import queue_handlers
+        if settings.API_LOG_QUEUE_SIZE > 0:
+            queue_handlers(logging.getLogger('api.middleware'), settings.API_LOG_QUEUE_SIZE)
@@ -0,0 +1,73 @@
+"""JWT authentication that reuses recently loaded users.
+
+``JWTAuthentication`` loads the user row on every request. Here each worker
+keeps the users it loaded for ``AUTH_CACHE_TIMEOUT`` seconds, keyed by user
+id and the user's *auth version*. The version is a response-cache
+generation (see ``api.cache``) that ``api.signals`` bumps when the user is
+saved or deleted and ``logout`` bumps when a token is blacklisted, so with
+a shared cache backend every worker drops its copy at once. With the
+local-memory backend other workers notice within the timeout.
+"""
+import copy
+import threading
+import time
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from . import cache
+
+# Past this many users, expired entries are dropped before another is added
+MAX_CACHED_USERS = 10000
+
+_users = {}
+_lock = threading.Lock()
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def invalidate(user_id):
+    """Make every worker load ``user_id`` from the database again"""
+    cache.bump(user_scope(user_id))
+    with _lock:
+        _users.pop(str(user_id), None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        timeout = getattr(settings, 'AUTH_CACHE_TIMEOUT', 60)
+        if timeout <= 0:
+            return super().get_user(validated_token)
+        try:
+            user_id = str(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        
+        # Read before loading, so a change made meanwhile leaves the entry already stale
+        version = cache.generations([user_scope(user_id)])[0]
+        now = time.monotonic()
+        with _lock:
+            entry = _users.get(user_id)
+        if entry is not None and entry[0] == version and entry[1] > now:
+            user = entry[2]
+            # Inactive users are never cached, but tokens from before a password change still reach here
+            if api_settings.CHECK_REVOKE_TOKEN and (
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+            ):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        else:
+            user = super().get_user(validated_token)
+            with _lock:
+                if len(_users) >= MAX_CACHED_USERS:
+                    for key in [key for key, cached in _users.items() if cached[1] <= now]:
+                        del _users[key]
+                    if len(_users) >= MAX_CACHED_USERS:
+                        _users.clear()
+                _users[user_id] = (version, now + timeout, user)
+        # Each request gets its own instance to change
+        return copy.copy(user)
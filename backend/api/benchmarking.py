@@ -0,0 +1,340 @@
+"""Benchmark dataset, measurements and result files.
+
+``seed`` fills the database with a synthetic catalogue: users, tags,
+resources backed by real files, ratings, comments and a week of downloads.
+Rows are written with ``bulk_create`` in batches, and the same ``seed``
+value always produces the same data. ``measure`` times a callable and
+counts the queries it runs. The ``benchmark`` and ``loadtest`` commands
+store their results as JSON through ``write_results``, and ``compare``
+sets a run against an earlier one.
+
+Everything runs offline, against SQLite (``DB_ENGINE=sqlite``) or a local
+PostgreSQL.
+"""
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import timedelta
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import connection, connections, transaction
+from django.db.utils import load_backend
+from django.utils import timezone
+from . import cache, metrics
+from .models import Comment, DownloadTally, Rating, Resource, StoredBlob, Tag, User
+from .ranking import refresh_scores
+from .search import update_search_vectors
+from .storage import resource_storage
+
+# Benchmark users are recognised by their address, so a dataset can be replaced
+EMAIL_DOMAIN = 'bench.example.com'
+PASSWORD = 'bench-password'
+SUBJECTS = {
+    'Maths': ['Algebra', 'Calculus', 'Statistics', 'Geometry'],
+    'Physics': ['Mechanics', 'Optics', 'Thermodynamics', 'Electromagnetism'],
+    'Chemistry': ['Organic', 'Inorganic', 'Kinetics', 'Equilibrium'],
+    'Biology': ['Genetics', 'Ecology', 'Cells', 'Evolution'],
+    'Computer Science': ['Algorithms', 'Databases', 'Networks', 'Compilers'],
+    'Economics': ['Markets', 'Inflation', 'Trade', 'Auctions'],
+}
+WORDS = (
+    'lecture notes summary revision exam practice problems solutions worked examples tutorial '
+    'introduction advanced review guide chapter week lab report slides handout proof theorem '
+    'definition formula diagram past paper answers midterm final project'
+).split()
+# Higher ratings are more common, as on the live site
+RATING_WEIGHTS = (1, 1, 3, 5, 4)
+# Connection handling compared by the connection.* benchmarks: settings overrides per mode
+CONNECTION_MODES = {
+    'new': {'CONN_MAX_AGE': 0},
+    'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+    'pooled': {'ENGINE': 'studyshare.pooled_postgresql', 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True,
+               'POOL': {'SIZE': 1, 'MAX_OVERFLOW': 0}},
+}
+# Results compared between runs, and whether a bigger number is better
+COMPARED = {'p50_ms': False, 'p95_ms': False, 'p99_ms': False, 'queries': False, 'throughput_rps': True}
+
+
+def bench_users():
+    return User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+
+
+def clear():
+    """Delete the benchmark users and, with them, their resources, ratings and comments"""
+    with transaction.atomic():
+        deleted, _ = bench_users().delete()
+    cache.bump(cache.RESOURCES, cache.COMMENTS, cache.RANKINGS)
+    return deleted
+
+
+def _file_content(rng, index, size):
+    words = ' '.join(rng.choice(WORDS) for _ in range(700)).encode()
+    body = f'Benchmark file {index}\n'.encode() + words * (size // len(words) + 1)
+    return body[:size]
+
+
+def seed(users=50, resources=2000, tags=100, ratings=5, comments=3, files=20, file_size=64 * 1024,
+         seed=0, batch_size=1000, progress=None):
+    """
+    Write a benchmark dataset and return the number of rows created per
+    model. ``ratings`` and ``comments`` are averages per resource.
+    ``progress(done, total)`` is called after each batch of resources.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    # Files are not transactional, so they go first; identical content is stored once anyway
+    blobs = []
+    for index in range(max(files, 1)):
+        name = resource_storage.save(f'resources/bench-{index}.txt',
+                                     ContentFile(_file_content(rng, index, file_size)))
+        blobs.append((name, resource_storage.size(name)))
+    
+    with transaction.atomic():
+        # One hash for everyone; hashing per user would dominate seeding
+        password = make_password(PASSWORD)
+        user_rows = User.objects.bulk_create([
+            User(username=f'user{index}@{EMAIL_DOMAIN}', email=f'user{index}@{EMAIL_DOMAIN}', password=password,
+                 name=f'Bench User {index}', university_name='Benchmark University',
+                 role='teacher' if index % 10 == 0 else 'student')
+            for index in range(max(users, 1))
+        ], batch_size=batch_size)
+        tag_rows = Tag.resolve(f'{rng.choice(WORDS)} {index}' for index in range(tags))
+    
+    counts = {'users': len(user_rows), 'tags': len(tag_rows), 'resources': 0, 'ratings': 0, 'comments': 0,
+              'download_tallies': 0}
+    for start in range(0, resources, batch_size):
+        with transaction.atomic():
+            _seed_batch(rng, now, min(batch_size, resources - start), user_rows, tag_rows, blobs,
+                        ratings, comments, counts)
+        if progress:
+            progress(counts['resources'], resources)
+    # Saving each file counted a reference of its own; the resources now hold theirs
+    for name, _ in blobs:
+        StoredBlob.release(name)
+    
+    refresh_scores(now)
+    cache.bump(cache.RESOURCES, cache.TAGS, cache.COMMENTS)
+    return counts
+
+
+def _seed_batch(rng, now, size, user_rows, tag_rows, blobs, ratings, comments, counts):
+    batch, rating_values, tag_sets, dates = [], [], [], []
+    for _ in range(size):
+        number = counts['resources'] + len(batch)
+        subject = rng.choice(list(SUBJECTS))
+        topic = rng.choice(SUBJECTS[subject])
+        name, file_size = blobs[number % len(blobs)]
+        raters = rng.sample(user_rows, min(len(user_rows), rng.randint(0, 2 * ratings)))
+        values = [(user, rng.choices(range(1, 6), weights=RATING_WEIGHTS)[0]) for user in raters]
+        title = f'{topic} {rng.choice(WORDS)} {rng.choice(WORDS)} {number}'
+        batch.append(Resource(
+            title=title,
+            description=' '.join(rng.choice(WORDS) for _ in range(30)),
+            file=name,
+            original_filename=title.lower().replace(' ', '-') + '.txt',
+            file_size=file_size,
+            mime_type='text/plain',
+            file_extension='.txt',
+            uploader=rng.choice(user_rows),
+            subject=subject,
+            topic=topic,
+            course_code=f'{subject[:2].upper()}{101 + SUBJECTS[subject].index(topic)}',
+            # Heavy-tailed, like real download counts
+            download_count=int(rng.paretovariate(1.5) * 3) - 3,
+            rating_count=len(values),
+            rating_sum=sum(value for _, value in values),
+        ))
+        rating_values.append(values)
+        tag_sets.append(rng.sample(tag_rows, min(len(tag_rows), rng.randint(0, 4))))
+        dates.append(now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)))
+    
+    Resource.objects.bulk_create(batch)
+    # auto_now_add overrides upload_date on insert; spread the uploads over a year
+    for resource, upload_date in zip(batch, dates):
+        resource.upload_date = upload_date
+    Resource.objects.bulk_update(batch, ['upload_date'])
+    
+    Resource.tags.through.objects.bulk_create([
+        Resource.tags.through(resource_id=resource.id, tag_id=tag.id)
+        for resource, tag_set in zip(batch, tag_sets)
+        for tag in tag_set
+    ])
+    # Aggregates were set on the rows above; bulk_create sends no signals to add them twice
+    rating_rows = Rating.objects.bulk_create([
+        Rating(resource_id=resource.id, user=user, rating_value=value)
+        for resource, values in zip(batch, rating_values)
+        for user, value in values
+    ])
+    comment_rows = Comment.objects.bulk_create([
+        Comment(resource_id=resource.id, user=rng.choice(user_rows),
+                content=' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))).capitalize() + '.')
+        for resource in batch
+        for _ in range(rng.randint(0, 2 * comments))
+    ])
+    # A week of downloads for a quarter of the resources, so trending has something to rank
+    tallies = DownloadTally.objects.bulk_create([
+        DownloadTally(resource_id=resource.id, count=rng.randint(1, 20),
+                      recorded_at=now - timedelta(hours=rng.uniform(0, 24 * 7)))
+        for resource in batch if rng.random() < 0.25
+        for _ in range(rng.randint(1, 5))
+    ])
+    StoredBlob.acquire_many(resource.file.name for resource in batch)
+    update_search_vectors([resource.id for resource in batch])
+    
+    counts['resources'] += len(batch)
+    counts['ratings'] += len(rating_rows)
+    counts['comments'] += len(comment_rows)
+    counts['download_tallies'] += len(tallies)
+
+
+def connection_lifecycles(alias='default'):
+    """
+    One request's worth of connection handling in each of ``CONNECTION_MODES``:
+    what Django does when a request starts, one query, and what it does when
+    the request ends. Returns the callables by mode and a function that
+    closes their connections. Pooling is PostgreSQL only.
+    """
+    wrappers = {}
+    for mode, overrides in CONNECTION_MODES.items():
+        if mode == 'pooled' and connections[alias].vendor != 'postgresql':
+            continue
+        settings_dict = dict(connections[alias].settings_dict, **overrides)
+        if mode != 'pooled' and settings_dict['ENGINE'] == CONNECTION_MODES['pooled']['ENGINE']:
+            settings_dict['ENGINE'] = 'django.db.backends.postgresql'
+        wrappers[mode] = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, f'benchmark-{mode}')
+        # Registered, as connection_created receivers look connections up by alias
+        connections[wrappers[mode].alias] = wrappers[mode]
+    
+    def lifecycle(wrapper):
+        def run():
+            wrapper.close_if_unusable_or_obsolete()
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            wrapper.close_if_unusable_or_obsolete()
+        return run
+    
+    def close():
+        for wrapper in wrappers.values():
+            wrapper.close()
+            if hasattr(wrapper, 'pool'):
+                wrapper.pool.close()
+            del connections[wrapper.alias]
+    
+    return {mode: lifecycle(wrapper) for mode, wrapper in wrappers.items()}, close
+
+
+def percentile(samples, fraction):
+    """Linear interpolation between the closest ranks, as numpy's default"""
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * fraction
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples, **extra):
+    """Latency summary of ``samples`` (milliseconds) merged with ``extra``"""
+    if not samples:
+        return dict(extra, runs=0)
+    return dict(
+        extra,
+        runs=len(samples),
+        mean_ms=round(statistics.fmean(samples), 3),
+        p50_ms=round(percentile(samples, 0.50), 3),
+        p95_ms=round(percentile(samples, 0.95), 3),
+        p99_ms=round(percentile(samples, 0.99), 3),
+        max_ms=round(max(samples), 3),
+    )
+
+
+def measure(func, repeat, warmup=1):
+    """Time ``repeat`` calls of ``func`` after ``warmup`` untimed ones, with their queries per call"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    queries, token = metrics.track_queries()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        metrics.stop_tracking(token)
+    return summarize(samples, queries=round(queries.count / repeat, 2),
+                     db_ms=round(queries.seconds * 1000 / repeat, 3))
+
+
+def environment():
+    """What a result depends on besides the code: database, versions, commit and dataset size"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'commit': commit,
+        'dataset': {
+            'users': User.objects.count(),
+            'resources': Resource.objects.count(),
+            'ratings': Rating.objects.count(),
+            'comments': Comment.objects.count(),
+        },
+    }
+
+
+def write_results(kind, results, options, path=None):
+    """Store a run as JSON, by default under ``benchmarks/results/``; returns the path written"""
+    if path is None:
+        path = os.path.join(settings.BASE_DIR, 'benchmarks', 'results', f'{kind}-{timezone.now():%Y%m%d-%H%M%S}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    document = {
+        'kind': kind,
+        'created_at': timezone.now().isoformat(),
+        'environment': environment(),
+        'options': options,
+        'results': results,
+    }
+    with open(path, 'w') as fh:
+        json.dump(document, fh, indent=2, sort_keys=True)
+    return path
+
+
+def load_results(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def compare(results, baseline):
+    """
+    ``(name, metric, before, after, change)`` for each metric measured in
+    both runs. ``change`` is the relative difference, positive when the new
+    run is better.
+    """
+    rows = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get('results', {}).get(name, {})
+        for metric, higher_is_better in COMPARED.items():
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = after / before - 1
+            rows.append((name, metric, before, after, change if higher_is_better else -change))
+    return rows
+
+
+def format_comparison(rows):
+    return [
+        f'{name:<34} {metric:<15} {before:>10.2f} -> {after:>10.2f}  '
+        f'{"better" if change > 0 else "worse" if change < 0 else "same":<6} {abs(change):.1%}'
+        for name, metric, before, after, change in rows
+    ]
@@ -0,0 +1,188 @@
+"""Response cache for read-heavy API views.
+
+Cached entries are keyed by the request's host, path and normalized query
+parameters plus the current *generation* of every scope the view depends
+on. Writes never delete entries; signals bump the generation of the
+affected scopes instead (see ``api.signals``), so every key built after a
+write is new and stale entries simply age out of the cache backend.
+
+Generations live in the cache itself, so with a shared backend (Redis,
+Memcached) an invalidation in one worker is seen by all of them. Hit and
+miss counters are kept per process.
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+from urllib.parse import urlencode
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from rest_framework.response import Response
+
+RESOURCES = 'resources'
+TAGS = 'tags'
+COMMENTS = 'comments'
+RANKINGS = 'rankings'
+
+_GENERATION_KEY = 'api:generation:{}'
+
+
+def response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def cache_enabled():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300) > 0
+
+
+def _fresh_generation():
+    # Millisecond clock: a generation recreated after eviction can't collide with an older one
+    return int(time.time() * 1000)
+
+
+def generations(scopes):
+    cache = response_cache()
+    keys = [_GENERATION_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: _fresh_generation() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Invalidate every cached response that depends on any of ``scopes``"""
+    cache = response_cache()
+    for scope in scopes:
+        key = _GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_generation(), timeout=None)
+
+
+def normalized_query(request):
+    """Query string with keys and repeated values sorted and empty values dropped"""
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+        if value != ''
+    )
+    return urlencode(params)
+
+
+def cache_key(request, scopes):
+    generation = '.'.join(str(g) for g in generations(scopes))
+    url = f'{request.scheme}://{request.get_host()}{request.path}?{normalized_query(request)}'
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f'api:response:{"+".join(scopes)}:{generation}:{digest}'
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters per cached view"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {'hits': 0, 'misses': 0})
+    
+    def record(self, name, hit):
+        with self._lock:
+            self._counts[name]['hits' if hit else 'misses'] += 1
+    
+    def snapshot(self):
+        with self._lock:
+            views = {name: dict(counts) for name, counts in self._counts.items()}
+        hits = sum(c['hits'] for c in views.values())
+        misses = sum(c['misses'] for c in views.values())
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'views': views,
+        }
+    
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def cached(request, name, scopes, compute):
+    """Return the cached ``Response`` for this GET, or build it with ``compute`` and store it"""
+    if request.method != 'GET' or not cache_enabled():
+        return compute()
+    
+    cache = response_cache()
+    key = cache_key(request, scopes)
+    data = cache.get(key)
+    if data is not None:
+        stats.record(name, hit=True)
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+    
+    stats.record(name, hit=False)
+    response = compute()
+    if response.status_code == 200:
+        cache.set(key, response.data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def json_response(data, status=200):
+    """``JsonResponse`` encoded the way DRF's ``JSONRenderer`` encodes, for async views outside DRF"""
+    return JsonResponse(data, status=status, safe=False,
+                        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+async def acached(request, name, scopes, compute):
+    """``cached`` for async views: ``compute`` is a coroutine function returning ``(data, status)``"""
+    if request.method != 'GET' or not cache_enabled():
+        return json_response(*await compute())
+    
+    cache = response_cache()
+    key = await sync_to_async(cache_key)(request, scopes)
+    data = await cache.aget(key)
+    if data is not None:
+        stats.record(name, hit=True)
+        response = json_response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+    
+    stats.record(name, hit=False)
+    data, status = await compute()
+    if status == 200:
+        await cache.aset(key, data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+    response = json_response(data, status)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def cache_response(*scopes):
+    """Cache a function view's GET responses; apply it beneath ``@api_view`` so permissions run first"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return cached(request, view.__name__, scopes, lambda: view(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+class CachedResponseMixin:
+    """Caches ``list``/``retrieve`` of a generic view; set ``cache_scopes`` to what its output depends on"""
+    cache_scopes = ()
+    
+    def list(self, request, *args, **kwargs):
+        return cached(request, type(self).__name__, self.cache_scopes,
+                      lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+    
+    def retrieve(self, request, *args, **kwargs):
+        return cached(request, type(self).__name__, self.cache_scopes,
+                      lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs))
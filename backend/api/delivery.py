@@ -0,0 +1,63 @@
+"""How file bytes leave the server once a view has decided to send them.
+
+``FILE_DELIVERY_BACKEND`` selects the strategy:
+
+* ``direct`` - Django returns a ``FileResponse``; WSGI servers that expose
+  ``wsgi.file_wrapper`` (gunicorn, uWSGI) send it with ``os.sendfile``.
+* ``x-accel-redirect`` - nginx serves the file from an ``internal``
+  location mapped to ``MEDIA_ROOT`` (see ``frontend/nginx.conf``).
+* ``x-sendfile`` - Apache/lighttpd serve the absolute path themselves.
+
+In every mode the worker never holds the file contents in memory.
+"""
+import mimetypes
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, HttpResponse
+from django.utils.http import content_disposition_header
+
+DIRECT = 'direct'
+X_ACCEL_REDIRECT = 'x-accel-redirect'
+X_SENDFILE = 'x-sendfile'
+BACKENDS = (DIRECT, X_ACCEL_REDIRECT, X_SENDFILE)
+
+
+def delivery_backend():
+    backend = getattr(settings, 'FILE_DELIVERY_BACKEND', DIRECT).lower()
+    if backend not in BACKENDS:
+        raise ImproperlyConfigured(
+            f'FILE_DELIVERY_BACKEND must be one of {", ".join(BACKENDS)}, not {backend!r}'
+        )
+    return backend
+
+
+def offloads_transfer():
+    """True when the front-end server sends the bytes (and handles Range itself)"""
+    return delivery_backend() != DIRECT
+
+
+def guess_content_type(path):
+    content_type, _ = mimetypes.guess_type(path)
+    return content_type or 'application/octet-stream'
+
+
+def file_response(field_file, content_type=None, as_attachment=False, filename=None):
+    """Response that delivers ``field_file`` through the configured backend"""
+    path = field_file.path
+    content_type = content_type or guess_content_type(path)
+    filename = filename or field_file.name.rsplit('/', 1)[-1]
+    backend = delivery_backend()
+    
+    if backend == DIRECT:
+        return FileResponse(open(path, 'rb'), content_type=content_type,
+                            as_attachment=as_attachment, filename=filename)
+    
+    response = HttpResponse(content_type=content_type)
+    if backend == X_ACCEL_REDIRECT:
+        internal_url = getattr(settings, 'FILE_DELIVERY_INTERNAL_URL', '/protected-media/')
+        response['X-Accel-Redirect'] = internal_url.rstrip('/') + '/' + quote(field_file.name)
+    else:
+        response['X-Sendfile'] = path
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
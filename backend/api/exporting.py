@@ -0,0 +1,98 @@
+"""Resource manifests: the row format shared by export_resources, import_resources and the export endpoint.
+
+A manifest is JSON Lines (one object per line) or CSV with a header row.
+``file`` is the stored file's path relative to the files directory that
+accompanies the manifest; in CSV, ``tags`` are joined with ``|``.
+"""
+import csv
+import io
+import json
+from itertools import islice
+from .models import Resource
+from .storage import hash_from_name
+
+MANIFEST_FIELDS = [
+    'id', 'title', 'description', 'subject', 'topic', 'course_code', 'tags', 'uploader',
+    'upload_date', 'download_count', 'file', 'original_filename', 'sha256', 'file_size', 'mime_type',
+]
+FORMATS = ('jsonl', 'csv')
+TAG_SEPARATOR = '|'
+
+_VALUE_FIELDS = [
+    'id', 'title', 'description', 'subject', 'topic', 'course_code', 'uploader__email',
+    'upload_date', 'download_count', 'file', 'original_filename', 'file_size', 'mime_type',
+]
+
+
+def manifest_format(path, default='jsonl'):
+    """Format implied by a manifest file name"""
+    return 'csv' if str(path).lower().endswith('.csv') else default
+
+
+def iter_rows(queryset=None, chunk_size=1000, file_url=None):
+    """
+    Yield one manifest dict per resource in constant memory: rows are read
+    with a server-side cursor in ``chunk_size`` batches, with one extra
+    query per batch for their tags. ``file_url``, if given, maps the stored
+    file name to what goes in the ``file`` column.
+    """
+    queryset = Resource.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('id').values(*_VALUE_FIELDS).iterator(chunk_size=chunk_size)
+    through = Resource.tags.through
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        tags = {}
+        for resource_id, name in (through.objects.filter(resource_id__in=[row['id'] for row in chunk])
+                                  .order_by('tag__name').values_list('resource_id', 'tag__name')):
+            tags.setdefault(resource_id, []).append(name)
+        for row in chunk:
+            row['uploader'] = row.pop('uploader__email')
+            row['upload_date'] = row['upload_date'].isoformat()
+            row['tags'] = tags.get(row['id'], [])
+            row['sha256'] = hash_from_name(row['file']) or ''
+            if file_url is not None and row['file']:
+                row['file'] = file_url(row['file'])
+            yield {field: row[field] for field in MANIFEST_FIELDS}
+
+
+def encode_rows(rows, fmt):
+    """Serialize manifest rows lazily, yielding one string per line (CSV starts with its header)"""
+    if fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+        return
+    
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=MANIFEST_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({**row, 'tags': TAG_SEPARATOR.join(row['tags'])})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # No rows: still emit the header
+        yield buffer.getvalue()
+
+
+def read_rows(stream, fmt):
+    """Parse a manifest from a text stream lazily, yielding ``(line_number, row)``; bad syntax raises ValueError"""
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                raise ValueError(f'Line {line_number}: {exc}')
+            if not isinstance(row, dict):
+                raise ValueError(f'Line {line_number}: expected a JSON object')
+            yield line_number, row
+        return
+    
+    reader = csv.DictReader(stream)
+    for row in reader:
+        row['tags'] = [tag for tag in (row.get('tags') or '').split(TAG_SEPARATOR) if tag]
+        yield reader.line_num, row
@@ -0,0 +1,114 @@
+"""Plain text of uploaded documents, for full-text search.
+
+Text is pulled out of ``.txt``, ``.docx`` and ``.pdf`` files in the
+``process_jobs`` worker pool and kept in ``ResourceContent``, one row per
+resource, so listing resources never loads it. Each row records the
+SHA-256 of the bytes it came from. A file is only read again when its
+content changes, and identical uploads reuse the text already extracted.
+
+``.docx`` is read with the standard library. PDFs need ``pdftotext``
+(poppler-utils, installed in the Docker images); without it their jobs
+fail and the missing tool is logged. Text is capped at
+``SEARCH_CONTENT_MAX_CHARS`` to keep each search vector well within
+PostgreSQL's 1 MB limit.
+"""
+import subprocess
+import zipfile
+from xml.etree import ElementTree
+from django.conf import settings
+from .storage import hash_from_name, hash_path, resource_storage
+from .utils import find_tool
+
+_WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+class ExtractionError(Exception):
+    """No text can be read from the file"""
+
+
+def max_chars():
+    return getattr(settings, 'SEARCH_CONTENT_MAX_CHARS', 100000)
+
+
+def _plain_text(path, limit):
+    with open(path, 'rb') as fh:
+        # UTF-8 needs at most four bytes a character
+        data = fh.read(limit * 4)
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError as exc:
+        if len(data) == limit * 4 and len(data) - exc.start < 4:
+            # Only the read cut the last character short
+            return data[:exc.start].decode('utf-8', errors='replace')
+        # Not UTF-8; cp1252 is what older Windows editors write
+        return data.decode('cp1252', errors='replace')
+
+
+def _docx_text(path, limit):
+    parts = []
+    length = 0
+    try:
+        with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as document:
+            for _, element in ElementTree.iterparse(document):
+                if element.tag == _WORD_NS + 't' and element.text:
+                    parts.append(element.text)
+                    length += len(element.text)
+                elif element.tag == _WORD_NS + 'tab':
+                    parts.append('\t')
+                elif element.tag in (_WORD_NS + 'p', _WORD_NS + 'br'):
+                    parts.append('\n')
+                if element.tag == _WORD_NS + 'p':
+                    # Paragraphs are done with; don't keep the whole tree in memory
+                    element.clear()
+                if length >= limit:
+                    break
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as exc:
+        raise ExtractionError(f'not a readable .docx file ({exc})')
+    return ''.join(parts)
+
+
+def _pdf_text(path, limit):
+    if find_tool('pdftotext') is None:
+        raise ExtractionError('pdftotext is not installed')
+    try:
+        result = subprocess.run(['pdftotext', '-enc', 'UTF-8', '-q', path, '-'], check=True,
+                                stdin=subprocess.DEVNULL, capture_output=True,
+                                timeout=getattr(settings, 'PREVIEW_COMMAND_TIMEOUT', 60))
+    except subprocess.CalledProcessError:
+        raise ExtractionError('pdftotext could not read the file')
+    except subprocess.TimeoutExpired:
+        raise ExtractionError('pdftotext timed out')
+    return result.stdout[:limit * 4].decode('utf-8', errors='ignore')
+
+
+_EXTRACTORS = {
+    'text/plain': _plain_text,
+    'application/pdf': _pdf_text,
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': _docx_text,
+}
+
+
+def extractable(mime_type):
+    return mime_type in _EXTRACTORS
+
+
+def extract_text(file_name, mime_type):
+    """
+    Text of the stored file ``file_name``; runs in a worker process.
+    Returns ``((sha256, text), error)``. When no text can be read,
+    ``error`` says why and is not worth retrying.
+    """
+    extractor = _EXTRACTORS.get(mime_type)
+    if extractor is None:
+        return None, f'no text extraction for {mime_type or "unknown"} files'
+    path = resource_storage.path(file_name)
+    limit = max_chars()
+    try:
+        digest = hash_from_name(file_name) or hash_path(path)
+        text = extractor(path, limit)
+    except ExtractionError as exc:
+        return None, str(exc)
+    except OSError as exc:
+        return None, f'cannot read {file_name}: {exc.strerror}'
+    # PostgreSQL text cannot hold NUL characters
+    return (digest, text[:limit].replace('\x00', ' ')), None
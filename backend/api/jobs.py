@@ -0,0 +1,90 @@
+"""Local job queue on the ``ProcessingJob`` table.
+
+Jobs are queued in the transaction that creates or replaces a file and
+are claimed in batches by ``process_jobs`` workers. On PostgreSQL
+``SKIP LOCKED`` lets several workers claim side by side without ever
+taking the same job. A job whose worker died is claimed again once it
+has been running for ``PROCESSING_JOB_TIMEOUT`` seconds. After
+``MAX_ATTEMPTS`` tries it is marked failed.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .extraction import extractable
+from .models import ProcessingJob, Resource
+from .previews import previewable
+
+MAX_ATTEMPTS = 3
+# Job kinds run for every new file, and whether a file of a given MIME type gets one
+FILE_JOBS = {
+    ProcessingJob.PREVIEWS: previewable,
+    ProcessingJob.TEXT: extractable,
+}
+
+
+def enqueue(kind, resource_ids):
+    """Queue a ``kind`` job for each resource that has none pending; returns the number queued"""
+    resource_ids = set(resource_ids)
+    if not resource_ids:
+        return 0
+    queued = set(
+        ProcessingJob.objects.filter(kind=kind, status='pending', resource_id__in=resource_ids)
+        .values_list('resource_id', flat=True)
+    )
+    jobs = [ProcessingJob(kind=kind, resource_id=resource_id) for resource_id in sorted(resource_ids - queued)]
+    return len(ProcessingJob.objects.bulk_create(jobs))
+
+
+def enqueue_file_jobs(resources, kinds=FILE_JOBS):
+    """Queue the jobs that apply to each of ``resources`` (previews, text extraction) given its file type"""
+    resources = list(resources)
+    return sum(
+        enqueue(kind, [resource.pk for resource in resources if FILE_JOBS[kind](resource.mime_type)])
+        for kind in kinds
+    )
+
+
+def claim(limit, now=None):
+    """Mark up to ``limit`` runnable jobs as running and return them, oldest first"""
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'PROCESSING_JOB_TIMEOUT', 600))
+    runnable = Q(status='pending') | Q(status='running', started_at__lt=stale)
+    with transaction.atomic():
+        jobs = ProcessingJob.objects.filter(runnable).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            jobs = jobs.select_for_update(skip_locked=True)
+        ids = list(jobs.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        ProcessingJob.objects.filter(id__in=ids).update(status='running', started_at=now, attempts=F('attempts') + 1)
+    return list(ProcessingJob.objects.filter(id__in=ids).select_related('resource').order_by('id'))
+
+
+def finish(job, error=''):
+    """Record the outcome of a job run; ``error`` marks it failed for good"""
+    job.status = 'failed' if error else 'done'
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+
+
+def retry(job, error):
+    """Put a job that crashed back in the queue, or fail it once it has used up its attempts"""
+    if job.attempts >= MAX_ATTEMPTS:
+        finish(job, error)
+        return
+    job.status = 'pending'
+    job.error = error
+    job.save(update_fields=['status', 'error'])
+
+
+def enqueue_missing():
+    """Queue file jobs for resources that never had one of that kind (uploaded before it existed)"""
+    queued = 0
+    for kind in FILE_JOBS:
+        jobs = ProcessingJob.objects.filter(kind=kind)
+        resources = Resource.objects.exclude(id__in=jobs.values('resource_id')).only('id', 'mime_type')
+        queued += enqueue_file_jobs(resources.iterator(), kinds=[kind])
+    return queued
@@ -0,0 +1,88 @@
+"""Logging kept off the request path.
+
+``queue_handlers`` puts a logger's handlers behind a ``QueueHandler``.
+The request thread then only appends the record to an in-memory queue,
+and a ``QueueListener`` thread formats it and writes it to the file or
+console. When the writer falls behind and the queue fills up, records
+are dropped and counted rather than making requests wait.
+
+``JSONFormatter`` writes one JSON object per line, holding the fields a
+record was given as ``extra={'fields': {...}}``.
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+_queue_handlers = []
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    ``QueueHandler`` that drops records instead of raising when its queue is
+    full. A ``listener`` given to it is started with the first record, so
+    processes that never log (migrate, the test runner, most management
+    commands) never start its thread, and a forked worker starts its own.
+    """
+    
+    def __init__(self, maxsize, listener=None):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        self.listener = listener
+        self._started = False
+        self._start_lock = threading.Lock()
+    
+    def enqueue(self, record):
+        if self.listener is not None and not self._started:
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+    
+    def _start_listener(self):
+        with self._start_lock:
+            if self._started:
+                return
+            self.listener.start()
+            # Write out what is still queued when the process exits
+            atexit.register(self.listener.stop)
+            self._started = True
+
+
+def queue_handlers(logger, maxsize=10000):
+    """
+    Move ``logger``'s handlers onto a background thread, started when the
+    first record arrives; returns the listener, or None if there was nothing to move
+    """
+    handlers = [handler for handler in logger.handlers if not isinstance(handler, QueueHandler)]
+    if not handlers:
+        return None
+    for handler in handlers:
+        logger.removeHandler(handler)
+    queue_handler = DroppingQueueHandler(maxsize)
+    queue_handler.listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    logger.addHandler(queue_handler)
+    _queue_handlers.append(queue_handler)
+    return queue_handler.listener
+
+
+def dropped_records():
+    return sum(handler.dropped for handler in _queue_handlers)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from api import cache
+from api.models import Resource
+
+
+class Command(BaseCommand):
+    help = 'Fill the stored size, MIME type and extension of resources uploaded before they were captured'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute every resource, not just missing ones')
+        parser.add_argument('--batch-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        resources = Resource.objects.exclude(file='').only('id', 'file', 'file_size', 'mime_type', 'file_extension')
+        if not options['all']:
+            resources = resources.filter(mime_type='')
+        
+        fields = ['file_size', 'mime_type', 'file_extension']
+        batch, updated, missing = [], 0, 0
+        for resource in resources.iterator(chunk_size=options['batch_size']):
+            try:
+                resource.capture_file_metadata()
+            except OSError:
+                missing += 1
+                continue
+            batch.append(resource)
+            if len(batch) >= options['batch_size']:
+                updated += Resource.objects.bulk_update(batch, fields)
+                batch = []
+        if batch:
+            updated += Resource.objects.bulk_update(batch, fields)
+        
+        cache.bump(cache.RESOURCES)
+        self.stdout.write(self.style.SUCCESS(f'Updated file metadata for {updated} resources'))
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{missing} resources point at missing files'))
@@ -0,0 +1,101 @@
+import fnmatch
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from api.benchmarking import (
+    compare, connection_lifecycles, format_comparison, load_results, measure, write_results,
+)
+from api.models import Comment, Rating, Resource, ResourceScore
+from api.pagination import KeysetPagination
+from api.search import FACETS, RANKED_ORDERING, facet_counts, filter_by_query, is_ranked
+from api.serializers import CommentSerializer, RatingSerializer, ResourceSerializer
+from api.views import ResourceListCreateView
+
+SEARCH_WORD = 'revision'
+
+
+class Command(BaseCommand):
+    help = ('Time serializers, querysets and per-request connection handling (new, persistent, pooled) on '
+            'the current database (see seed_benchmark_data) and write the timings and queries per run as JSON')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30, help='Timed runs per benchmark')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed runs first')
+        parser.add_argument('--rows', type=int, default=50, help='Rows per page and per serializer run')
+        parser.add_argument('--only', action='append', default=[], metavar='PATTERN',
+                            help='Run only benchmarks matching this glob, e.g. "queryset.*" (repeatable)')
+        parser.add_argument('--output', help='Result file (default benchmarks/results/benchmark-<time>.json)')
+        parser.add_argument('--compare', metavar='FILE', help='Earlier result file to compare against')
+    
+    def handle(self, *args, **options):
+        if not Resource.objects.exists():
+            raise CommandError('Nothing to benchmark; run seed_benchmark_data first')
+        baseline = load_results(options['compare']) if options['compare'] else None
+        lifecycles, close_connections = connection_lifecycles()
+        benchmarks = dict(self.benchmarks(options['rows']), **{
+            f'connection.{mode}': lifecycle for mode, lifecycle in lifecycles.items()
+        })
+        benchmarks = {
+            name: func for name, func in benchmarks.items()
+            if not options['only'] or any(fnmatch.fnmatch(name, pattern) for pattern in options['only'])
+        }
+        if not benchmarks:
+            raise CommandError('No benchmark matches --only')
+        
+        results = {}
+        try:
+            for name, func in benchmarks.items():
+                results[name] = measure(func, options['repeat'], warmup=options['warmup'])
+                result = results[name]
+                self.stdout.write(f'{name:<34} p50 {result["p50_ms"]:>8.2f} ms  p95 {result["p95_ms"]:>8.2f} ms  '
+                                  f'p99 {result["p99_ms"]:>8.2f} ms  {result["queries"]:>5} queries')
+        finally:
+            close_connections()
+        
+        path = write_results('benchmark', results, {
+            'repeat': options['repeat'], 'warmup': options['warmup'], 'rows': options['rows'], 'only': options['only'],
+        }, path=options['output'])
+        if baseline:
+            self.stdout.write('\n'.join(format_comparison(compare(results, baseline))))
+        self.stdout.write(self.style.SUCCESS(f'Results written to {path}'))
+    
+    def benchmarks(self, rows):
+        factory = RequestFactory()
+        context = {'request': factory.get('/api/resources/')}
+        page_request = Request(factory.get('/api/resources/', {'page_size': rows}))
+        # Serializers get rows loaded up front, so only serialization is timed
+        resources = list(ResourceListCreateView.queryset.all()[:rows])
+        comments = list(Comment.objects.select_related('user').order_by('-created_at')[:rows])
+        ratings = list(Rating.objects.select_related('user')[:rows])
+        subject = resources[0].subject
+        busiest = (Comment.objects.values('resource_id').annotate(comments=Count('id')).order_by('-comments')
+                   .values_list('resource_id', flat=True).first())
+        
+        def render(serializer_class, instances):
+            return JSONRenderer().render(serializer_class(instances, many=True, context=context).data)
+        
+        def page(queryset):
+            ordering = RANKED_ORDERING if is_ranked(queryset) else None
+            return KeysetPagination(ordering=ordering).paginate_queryset(queryset, page_request)
+        
+        def ranked(field, **filters):
+            return list(ResourceScore.objects.filter(**filters).order_by(f'-{field}', 'resource_id')
+                        .select_related('resource__uploader').prefetch_related('resource__tags')[:20])
+        
+        return {
+            'serialize.resources': lambda: render(ResourceSerializer, resources),
+            'serialize.comments': lambda: render(CommentSerializer, comments),
+            'serialize.ratings': lambda: render(RatingSerializer, ratings),
+            'queryset.resource_page': lambda: page(ResourceListCreateView.queryset.all()),
+            'queryset.resource_page_by_subject': lambda: page(ResourceListCreateView.queryset.filter(subject=subject)),
+            'queryset.search_page': lambda: page(filter_by_query(ResourceListCreateView.queryset.all(), SEARCH_WORD)),
+            'queryset.search_count': lambda: filter_by_query(Resource.objects.all(), SEARCH_WORD).count(),
+            'queryset.search_facets': lambda: facet_counts(filter_by_query(Resource.objects.all(), SEARCH_WORD),
+                                                           list(FACETS)),
+            'queryset.trending': lambda: ranked('trending_score', trending_score__isnull=False),
+            'queryset.top_rated': lambda: ranked('rating_score'),
+            'queryset.comments': lambda: list(Comment.objects.filter(resource_id=busiest).select_related('user')
+                                              .order_by('-created_at')[:rows]),
+        }
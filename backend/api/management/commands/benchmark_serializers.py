@@ -0,0 +1,66 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from api.models import Comment, Rating, Resource, Tag, User
+from api.serializers import CommentSerializer, RatingSerializer, ResourceSerializer
+
+
+def sample_rows(count):
+    """Unsaved, fully populated instances, so only serialization is measured"""
+    now = timezone.now()
+    users = [User(id=i, username=f'user{i}@example.com', email=f'user{i}@example.com', name=f'User {i}',
+                  university_name='Example University', role='student', date_joined=now - timedelta(days=i))
+             for i in range(1, 11)]
+    tags = [Tag(id=i, name=f'tag {i}') for i in range(1, 21)]
+    resources, ratings, comments = [], [], []
+    for i in range(1, count + 1):
+        resource = Resource(
+            id=i, title=f'Lecture notes {i}', description='Week summary ' * 10, file=f'resources/notes{i}.pdf',
+            original_filename=f'notes{i}.pdf', uploader=users[i % 10], subject='Maths', topic='Algebra',
+            course_code='MA101', upload_date=now - timedelta(minutes=i), download_count=i * 3,
+            rating_count=i % 7, rating_sum=(i % 7) * 4, file_size=1024 * i, mime_type='application/pdf',
+            file_extension='.pdf',
+        )
+        resource._prefetched_objects_cache = {'tags': [tags[(i + k) % 20] for k in range(3)]}
+        resources.append(resource)
+        ratings.append(Rating(id=i, resource_id=i, user=users[i % 10], rating_value=i % 5 + 1))
+        comments.append(Comment(id=i, resource_id=i, user=users[i % 10], content='Helpful, thanks! ' * 3,
+                                created_at=now - timedelta(seconds=i)))
+    return {'resources': (ResourceSerializer, resources), 'ratings': (RatingSerializer, ratings),
+            'comments': (CommentSerializer, comments)}
+
+
+def render(serializer_class, rows, context, fast):
+    if fast:
+        data = serializer_class(rows, many=True, context=context).data
+    else:
+        data = serializers.ListSerializer(rows, child=serializer_class(), context=context).data
+    return JSONRenderer().render(data)
+
+
+class Command(BaseCommand):
+    help = 'Compare DRF and compiled field-plan rendering of list pages, checking the JSON is identical'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Rows per page')
+        parser.add_argument('--repeat', type=int, default=200, help='Pages rendered per measurement')
+    
+    def handle(self, *args, **options):
+        context = {'request': RequestFactory().get('/api/resources/')}
+        for name, (serializer_class, rows) in sample_rows(options['rows']).items():
+            if render(serializer_class, rows, context, fast=True) != render(serializer_class, rows, context, fast=False):
+                raise CommandError(f'{name}: fast rendering differs from {serializer_class.__name__}')
+            timings = {}
+            for fast in (False, True):
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    render(serializer_class, rows, context, fast)
+                timings[fast] = (time.perf_counter() - started) / options['repeat'] * 1000
+            self.stdout.write(
+                f'{name:<10} {options["rows"]} rows/page: DRF {timings[False]:.2f} ms, '
+                f'field plan {timings[True]:.2f} ms ({timings[False] / timings[True]:.1f}x), identical JSON'
+            )
@@ -0,0 +1,66 @@
+import os
+import shutil
+import time
+from django.core.management.base import BaseCommand
+from api.exporting import FORMATS, encode_rows, iter_rows, manifest_format
+from api.models import Resource
+from api.storage import resource_storage
+
+
+class Command(BaseCommand):
+    help = 'Stream every resource (optionally with its file) to a JSONL or CSV manifest'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help='Manifest path, or - for stdout')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the output extension, else jsonl')
+        parser.add_argument('--files-dir', help='Also copy each stored file here, at the path named in the manifest')
+        parser.add_argument('--subject', help='Only export resources of this subject')
+        parser.add_argument('--course-code', help='Only export resources of this course')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or manifest_format(output)
+        queryset = Resource.objects.all()
+        if options['subject']:
+            queryset = queryset.filter(subject=options['subject'])
+        if options['course_code']:
+            queryset = queryset.filter(course_code=options['course_code'])
+        
+        rows = iter_rows(queryset, chunk_size=options['chunk_size'])
+        if options['files_dir']:
+            rows = self.copy_files(rows, options['files_dir'])
+        
+        counted = self.count(rows)
+        started = time.monotonic()
+        if output == '-':
+            for line in encode_rows(counted, fmt):
+                self.stdout.write(line, ending='')
+        else:
+            with open(output, 'w', encoding='utf-8', newline='') as fh:
+                for line in encode_rows(counted, fmt):
+                    fh.write(line)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        
+        self.stderr.write(self.style.SUCCESS(
+            f'Exported {self.exported} resources in {elapsed:.2f}s ({self.exported / elapsed:.0f} rows/s)'
+        ))
+    
+    def count(self, rows):
+        self.exported = 0
+        for row in rows:
+            self.exported += 1
+            yield row
+    
+    def copy_files(self, rows, files_dir):
+        for row in rows:
+            if row['file']:
+                target = os.path.join(files_dir, row['file'])
+                if not os.path.exists(target):
+                    try:
+                        source = resource_storage.path(row['file'])
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        shutil.copyfile(source, target)
+                    except FileNotFoundError:
+                        self.stderr.write(f'Resource {row["id"]}: stored file {row["file"]} is missing')
+            yield row
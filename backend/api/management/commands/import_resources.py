@@ -0,0 +1,208 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from api import cache
+from api.delivery import guess_content_type
+from api.exporting import FORMATS, manifest_format, read_rows
+from api.jobs import enqueue_file_jobs
+from api.models import Resource, StoredBlob, Tag, User
+from api.search import update_search_vectors
+from api.storage import hash_path, resource_storage
+from api.utils import InlineExecutor
+from api.validators import check_file_extension, check_file_size
+
+REQUIRED_FIELDS = ('title', 'subject', 'topic', 'course_code', 'file')
+TEXT_FIELDS = ('title', 'description', 'subject', 'topic', 'course_code')
+
+
+def inspect_file(path, expected_sha256=''):
+    """Validate and hash one file; runs in a worker process. Returns ``(sha256, size, error)``"""
+    try:
+        check_file_extension(path)
+        size = os.path.getsize(path)
+        check_file_size(size)
+        digest = hash_path(path)
+    except ValidationError as exc:
+        return None, 0, ' '.join(exc.messages)
+    except OSError as exc:
+        return None, 0, f'cannot read {path}: {exc.strerror}'
+    if expected_sha256 and digest != expected_sha256:
+        return None, 0, f'checksum mismatch for {path}'
+    return digest, size, None
+
+
+class Command(BaseCommand):
+    help = 'Create resources in bulk from a JSONL or CSV manifest and a directory of files'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help='Manifest path, as written by export_resources')
+        parser.add_argument('--files-dir', help='Directory the manifest file paths are relative to '
+                                                '(default: the manifest directory)')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the manifest extension, else jsonl')
+        parser.add_argument('--uploader', help='Email of the user to own rows whose uploader is missing or unknown')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes hashing and validating files (0 = in this process)')
+    
+    def handle(self, *args, **options):
+        self.files_dir = os.path.realpath(options['files_dir'] or os.path.dirname(os.path.abspath(options['manifest'])))
+        self.default_uploader = None
+        if options['uploader']:
+            self.default_uploader = User.objects.filter(email=options['uploader']).first()
+            if self.default_uploader is None:
+                raise CommandError(f'No user with email {options["uploader"]}')
+        fmt = options['format'] or manifest_format(options['manifest'])
+        self.verbosity = options['verbosity']
+        
+        self.imported = self.skipped = 0
+        started = time.monotonic()
+        executor = ProcessPoolExecutor(options['workers']) if options['workers'] > 0 else InlineExecutor()
+        try:
+            with open(options['manifest'], encoding='utf-8', newline='') as fh:
+                rows = read_rows(fh, fmt)
+                # Hash the next batch in the pool while the current one is written to the database
+                pending = None
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    submitted = self.submit(executor, batch) if batch else None
+                    if pending:
+                        self.import_batch(pending)
+                    if submitted is None:
+                        break
+                    pending = submitted
+        except ValueError as exc:
+            raise CommandError(f'Malformed manifest: {exc}')
+        finally:
+            executor.shutdown(wait=True)
+        
+        if self.imported:
+            cache.bump(cache.RESOURCES, cache.TAGS)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported} resources ({self.skipped} skipped) in {elapsed:.2f}s '
+            f'({self.imported / elapsed:.0f} rows/s)'
+        ))
+    
+    def submit(self, executor, batch):
+        jobs = []
+        for line_number, row in batch:
+            error = self.check_row(row)
+            path = None if error else self.file_path(row['file'])
+            if path is None and error is None:
+                error = f'file path {row["file"]!r} is outside {self.files_dir}'
+            future = None if error else executor.submit(inspect_file, path, row.get('sha256') or '')
+            jobs.append((line_number, row, path, future, error))
+        return jobs
+    
+    def check_row(self, row):
+        for field in REQUIRED_FIELDS:
+            if not str(row.get(field) or '').strip():
+                return f'{field} is required'
+        for field in TEXT_FIELDS:
+            max_length = Resource._meta.get_field(field).max_length
+            if max_length and len(str(row.get(field) or '')) > max_length:
+                return f'{field} is longer than {max_length} characters'
+        tags = row.get('tags') or []
+        if not isinstance(tags, list):
+            return 'tags must be a list'
+        max_length = Tag._meta.get_field('name').max_length
+        for tag in tags:
+            if not isinstance(tag, str):
+                return f'tag {tag!r} is not a string'
+            if not 1 <= len(Tag.normalize_name(tag)) <= max_length:
+                return f'tag {tag!r} must be 1 to {max_length} characters long'
+        if not str(row.get('download_count') or 0).isdigit():
+            return 'download_count must be a whole number'
+        return None
+    
+    def file_path(self, relative):
+        path = os.path.realpath(os.path.join(self.files_dir, relative))
+        return path if path.startswith(self.files_dir + os.sep) else None
+    
+    def import_batch(self, jobs):
+        started = time.monotonic()
+        uploaders = self.uploaders(row for _, row, _, _, _ in jobs)
+        resources, files, tag_names, upload_dates = [], [], [], []
+        for line_number, row, path, future, error in jobs:
+            digest, size = None, 0
+            if error is None:
+                digest, size, error = future.result()
+            uploader = uploaders.get(str(row.get('uploader') or '').lower(), self.default_uploader)
+            if error is None and uploader is None:
+                error = f'unknown uploader {row.get("uploader")!r} and no --uploader given'
+            if error:
+                self.skipped += 1
+                self.stderr.write(f'Line {line_number}: skipped, {error}')
+                continue
+            
+            original_filename = row.get('original_filename') or os.path.basename(path)
+            files.append((path, digest))
+            resources.append(Resource(
+                uploader=uploader,
+                original_filename=original_filename[:255],
+                file_size=size,
+                mime_type=guess_content_type(original_filename),
+                file_extension=os.path.splitext(original_filename)[1].lower()[:20],
+                download_count=int(row.get('download_count') or 0),
+                **{field: str(row.get(field) or '').strip() for field in TEXT_FIELDS},
+            ))
+            tag_names.append([Tag.normalize_name(tag) for tag in row.get('tags') or []])
+            upload_dates.append(self.parse_date(row.get('upload_date')))
+        
+        if not resources:
+            return
+        stored = []
+        try:
+            with transaction.atomic():
+                # Saving counts each blob reference, so they roll back with the batch
+                for resource, (path, digest) in zip(resources, files):
+                    resource.file = resource_storage.save_hashed(path, digest)
+                    stored.append(resource.file.name)
+                Resource.objects.bulk_create(resources)
+                # auto_now_add overrides upload_date on insert; put the manifest's dates back
+                dated = []
+                for resource, upload_date in zip(resources, upload_dates):
+                    if upload_date:
+                        resource.upload_date = upload_date
+                        dated.append(resource)
+                if dated:
+                    Resource.objects.bulk_update(dated, ['upload_date'])
+                
+                tags = {tag.name: tag for tag in Tag.resolve(name for names in tag_names for name in names)}
+                Resource.tags.through.objects.bulk_create([
+                    Resource.tags.through(resource_id=resource.id, tag_id=tags[name].id)
+                    for resource, names in zip(resources, tag_names)
+                    for name in dict.fromkeys(names)
+                ], ignore_conflicts=True)
+                update_search_vectors([resource.id for resource in resources])
+                enqueue_file_jobs(resources)
+        except Exception:
+            # Remove the files this batch put in place that nothing else holds
+            StoredBlob.forget(stored)
+            raise
+        
+        self.imported += len(resources)
+        if self.verbosity >= 2:
+            elapsed = max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f'  batch of {len(resources)} written ({len(resources) / elapsed:.0f} rows/s), '
+                              f'{self.imported} so far')
+    
+    def uploaders(self, rows):
+        emails = {str(row.get('uploader') or '').lower() for row in rows} - {''}
+        users = User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails)
+        return {user.email_lower: user for user in users}
+    
+    def parse_date(self, value):
+        if not value:
+            return None
+        parsed = parse_datetime(str(value))
+        if parsed is not None and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
@@ -0,0 +1,230 @@
+import http.client
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from api import metrics
+from api.benchmarking import (
+    SUBJECTS, WORDS, bench_users, compare, format_comparison, load_results, summarize, write_results,
+)
+from api.models import Resource, User
+
+# Endpoint -> (path, route name the request metrics are recorded under). Placeholders are
+# filled per request from the seeded data, so the response cache sees a realistic key mix.
+ENDPOINTS = {
+    'resources': ('/api/resources/', 'resource-list'),
+    'resources_by_subject': ('/api/resources/?subject={subject}', 'resource-list'),
+    'resource_detail': ('/api/resources/{id}/', 'resource-detail'),
+    'comments': ('/api/resources/{id}/comments/', 'resource-comments'),
+    'search': ('/api/search/?query={word}', 'search-resources'),
+    'search_facets': ('/api/search/?query={word}&facets=subject,tags', 'search-resources'),
+    'trending': ('/api/resources/trending/', 'resource-trending'),
+    'tags': ('/api/tags/', 'tag-list'),
+    'serve_file': ('/api/resources/{id}/serve/', 'serve-file'),
+    'download': ('/api/resources/{id}/download/', 'download-resource'),
+}
+_METRIC_LINE = re.compile(
+    r'^studyshare_(db_queries|http_requests)_total\{route="([^"]*)"[^}]*\} (\S+)$', re.MULTILINE
+)
+
+
+class InProcessClient:
+    """Requests through Django's test client: the whole middleware and view stack, without a server"""
+    
+    def __init__(self, authorization):
+        self.client = Client(raise_request_exception=False, HTTP_AUTHORIZATION=authorization)
+    
+    def get(self, path):
+        response = self.client.get(path)
+        # The test client closes the response, streamed ones once their content is consumed
+        if response.streaming:
+            return response.status_code, sum(len(chunk) for chunk in response.streaming_content)
+        return response.status_code, len(response.content)
+    
+    def close(self):
+        # Worker threads opened database connections of their own
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+class HTTPClient:
+    """Keep-alive HTTP/1.1 connection to a running server"""
+    
+    def __init__(self, url, authorization):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.headers = {'Authorization': authorization}
+        self.connection = None
+    
+    def get(self, path):
+        status, body = self.fetch(path)
+        return status, len(body)
+    
+    def fetch(self, path):
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.connection.request('GET', path, headers=self.headers)
+                response = self.connection.getresponse()
+                body = response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.close()
+                return response.status, body
+            except (http.client.HTTPException, OSError):
+                # The server closed an idle keep-alive connection; retry once on a new one
+                self.close()
+                if attempt == 2:
+                    raise
+    
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Command(BaseCommand):
+    help = ('Drive load at the API endpoints and report p50/p95/p99 latency, throughput and queries per '
+            'request as JSON. Runs in-process by default, or against a running server with --url')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000 '
+                                          '(queries per request are read from its /api/metrics/)')
+        parser.add_argument('--endpoint', action='append', choices=list(ENDPOINTS), dest='endpoints',
+                            help='Endpoint to load (repeatable; default all)')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per endpoint first')
+        parser.add_argument('--concurrency', type=int, default=4, help='Clients sending requests at once')
+        parser.add_argument('--user', help='Email of the user the requests authenticate as '
+                                           '(default the first seed_benchmark_data user)')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Disable the response cache (in-process only)')
+        parser.add_argument('--log-requests', action='store_true',
+                            help='Keep per-request logging on (in-process only; off so logs do not flood the console)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the request mix')
+        parser.add_argument('--output', help='Result file (default benchmarks/results/loadtest-<time>.json)')
+        parser.add_argument('--compare', metavar='FILE', help='Earlier result file to compare against')
+    
+    def handle(self, *args, **options):
+        if options['url'] and (options['no_cache'] or options['log_requests']):
+            raise CommandError('--no-cache and --log-requests only apply to in-process runs')
+        users = User.objects.filter(email=options['user']) if options['user'] else bench_users().order_by('id')
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to authenticate as; run seed_benchmark_data or pass --user')
+        self.resource_ids = list(Resource.objects.order_by('id').values_list('id', flat=True)[:1000])
+        if not self.resource_ids:
+            raise CommandError('No resources to request; run seed_benchmark_data first')
+        baseline = load_results(options['compare']) if options['compare'] else None
+        
+        self.options = options
+        self.authorization = f'Bearer {RefreshToken.for_user(user).access_token}'
+        self.rng = random.Random(options['seed'])
+        middleware_logger = logging.getLogger('api.middleware')
+        level = middleware_logger.level
+        if not options['url'] and not options['log_requests']:
+            middleware_logger.setLevel(logging.WARNING)
+        try:
+            with override_settings(**({'RESPONSE_CACHE_TIMEOUT': 0} if options['no_cache'] else {})):
+                results = {name: self.run_endpoint(name) for name in options['endpoints'] or ENDPOINTS}
+        finally:
+            middleware_logger.setLevel(level)
+        
+        path = write_results('loadtest', results, {
+            key: options[key] for key in ('url', 'endpoints', 'requests', 'warmup', 'concurrency', 'no_cache', 'seed')
+        }, path=options['output'])
+        if baseline:
+            self.stdout.write('\n'.join(format_comparison(compare(results, baseline))))
+        self.stdout.write(self.style.SUCCESS(f'Results written to {path}'))
+    
+    def client(self):
+        if self.options['url']:
+            return HTTPClient(self.options['url'], self.authorization)
+        return InProcessClient(self.authorization)
+    
+    def paths(self, template, count):
+        return [
+            template.format(id=self.rng.choice(self.resource_ids), word=quote(self.rng.choice(WORDS)),
+                            subject=quote(self.rng.choice(list(SUBJECTS))))
+            for _ in range(count)
+        ]
+    
+    def send(self, paths):
+        """Requests ``paths`` in order on one client; returns ``(milliseconds, status, bytes)`` for each"""
+        client = self.client()
+        outcomes = []
+        try:
+            for path in paths:
+                started = time.perf_counter()
+                try:
+                    status, size = client.get(path)
+                except (http.client.HTTPException, OSError):
+                    status, size = 0, 0
+                outcomes.append(((time.perf_counter() - started) * 1000, status, size))
+        finally:
+            client.close()
+        return outcomes
+    
+    def run_endpoint(self, name):
+        template, route = ENDPOINTS[name]
+        concurrency = max(self.options['concurrency'], 1)
+        self.send(self.paths(template, self.options['warmup']))
+        paths = self.paths(template, self.options['requests'])
+        before = self.route_totals()
+        
+        started = time.perf_counter()
+        if concurrency == 1:
+            outcomes = self.send(paths)
+        else:
+            with ThreadPoolExecutor(concurrency, thread_name_prefix='loadtest') as pool:
+                chunks = pool.map(self.send, [paths[index::concurrency] for index in range(concurrency)])
+                outcomes = [outcome for chunk in chunks for outcome in chunk]
+        elapsed = time.perf_counter() - started
+        
+        after = self.route_totals()
+        served = after[route]['requests'] - before[route]['requests']
+        statuses = Counter(status for _, status, _ in outcomes)
+        result = summarize(
+            [milliseconds for milliseconds, _, _ in outcomes],
+            requests=len(outcomes),
+            errors=sum(count for status, count in statuses.items() if not 200 <= status < 400),
+            statuses={str(status): count for status, count in sorted(statuses.items())},
+            throughput_rps=round(len(outcomes) / elapsed, 2) if elapsed else None,
+            bytes_per_request=round(sum(size for _, _, size in outcomes) / max(len(outcomes), 1)),
+            queries=round((after[route]['queries'] - before[route]['queries']) / served, 2) if served else None,
+        )
+        self.stdout.write(
+            f'{name:<22} {result["throughput_rps"]:>8.1f} req/s  p50 {result["p50_ms"]:>8.2f} ms  '
+            f'p95 {result["p95_ms"]:>8.2f} ms  p99 {result["p99_ms"]:>8.2f} ms  '
+            f'{result["queries"] if result["queries"] is not None else "?":>5} queries/req  {result["errors"]} errors'
+        )
+        return result
+    
+    def route_totals(self):
+        """Requests served and queries run so far per route, from the server's request metrics"""
+        totals = defaultdict(lambda: {'requests': 0, 'queries': 0})
+        if not self.options['url']:
+            for (route, _), entry in metrics.registry.snapshot().items():
+                totals[route]['requests'] += sum(entry['statuses'].values())
+                totals[route]['queries'] += entry['queries']
+            return totals
+        
+        client = HTTPClient(self.options['url'], f'Bearer {settings.METRICS_TOKEN}')
+        try:
+            status, body = client.fetch('/api/metrics/')
+        finally:
+            client.close()
+        if status == 200:
+            for kind, route, value in _METRIC_LINE.findall(body.decode()):
+                totals[route]['queries' if kind == 'db_queries' else 'requests'] += float(value)
+        return totals
@@ -0,0 +1,43 @@
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from api import cache
+from api.models import Resource, StoredBlob
+from api.storage import hash_from_name, resource_storage
+
+
+class Command(BaseCommand):
+    help = 'Move resource files stored under their upload names into the content-addressed store'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would move without changing anything')
+    
+    def handle(self, *args, **options):
+        moved = deduplicated = 0
+        saved_bytes = 0
+        for resource in Resource.objects.only('id', 'file').iterator():
+            old_name = resource.file.name
+            if not old_name or hash_from_name(old_name) or not resource_storage.exists(old_name):
+                continue
+            if options['dry_run']:
+                self.stdout.write(f'Would move {old_name}')
+                moved += 1
+                continue
+            
+            size = resource_storage.size(old_name)
+            with resource_storage.open(old_name, 'rb') as fh:
+                new_name = resource_storage.save(old_name, File(fh))
+            # Saving counted this resource's reference; more means the bytes were already stored
+            if StoredBlob.objects.filter(sha256=hash_from_name(new_name), ref_count__gt=1).exists():
+                deduplicated += 1
+                saved_bytes += size
+            Resource.objects.filter(id=resource.id).update(file=new_name)
+            if not Resource.objects.filter(file=old_name).exists():
+                resource_storage.delete(old_name)
+            moved += 1
+        
+        if moved and not options['dry_run']:
+            cache.bump(cache.RESOURCES)
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {moved} files; {deduplicated} were duplicates ({saved_bytes} bytes reclaimed)'
+        ))
@@ -0,0 +1,118 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+from api import cache
+from api.extraction import extract_text
+from api.jobs import claim, enqueue_missing, finish, retry
+from api.models import ProcessingJob, Resource, ResourceContent
+from api.previews import render_previews
+from api.search import update_search_vectors
+from api.utils import InlineExecutor
+
+# Job kind -> function run in the pool as ``work(file_name, mime_type)``, returning ``(result, error)``
+WORK = {
+    ProcessingJob.PREVIEWS: render_previews,
+    ProcessingJob.TEXT: extract_text,
+}
+
+
+class Command(BaseCommand):
+    help = ('Run queued background jobs (thumbnails, previews, text extraction) in a process pool; '
+            'runs until stopped unless --once is given')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes running the jobs (0 = in this process)')
+        parser.add_argument('--batch-size', type=int, default=20, help='Jobs claimed at a time')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait before looking again when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit as soon as the queue is empty')
+        parser.add_argument('--enqueue-missing', action='store_true',
+                            help='First queue jobs for resources uploaded before the queue existed')
+    
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if options['enqueue_missing']:
+            self.stdout.write(f'Queued {enqueue_missing()} jobs')
+        
+        self.done = self.failed = 0
+        executor = ProcessPoolExecutor(options['workers']) if options['workers'] > 0 else InlineExecutor()
+        try:
+            while True:
+                jobs = claim(options['batch_size'])
+                if jobs:
+                    self.run_batch(executor, jobs)
+                    continue
+                if options['once']:
+                    break
+                close_old_connections()
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            executor.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {self.done + self.failed} jobs ({self.failed} without results)'
+        ))
+    
+    def run_batch(self, executor, jobs):
+        self.changed = False
+        running = []
+        for job in jobs:
+            resource = job.resource
+            if job.kind == ProcessingJob.TEXT and self.reuse_text(resource):
+                finish(job)
+                self.done += 1
+                continue
+            future = executor.submit(WORK[job.kind], resource.file.name, resource.mime_type)
+            running.append((job, resource.file.name, future))
+        
+        for job, file_name, future in running:
+            try:
+                result, error = future.result()
+            except Exception as exc:
+                retry(job, f'{type(exc).__name__}: {exc}')
+                continue
+            if result:
+                getattr(self, f'apply_{job.kind}')(job.resource_id, file_name, result)
+            finish(job, error or '')
+            if error:
+                self.failed += 1
+                if self.verbosity >= 2:
+                    self.stderr.write(f'Resource {job.resource_id}: {job.kind} job failed, {error}')
+            else:
+                self.done += 1
+        if self.changed:
+            cache.bump(cache.RESOURCES)
+    
+    def apply_previews(self, resource_id, file_name, previews):
+        # Only if the file was not replaced while its previews were drawn
+        self.changed |= bool(Resource.objects.filter(pk=resource_id, file=file_name).update(previews=previews))
+    
+    def apply_text(self, resource_id, file_name, result):
+        digest, text = result
+        with transaction.atomic():
+            if Resource.objects.select_for_update().filter(pk=resource_id, file=file_name).exists():
+                self.store_text(resource_id, digest, text)
+    
+    def reuse_text(self, resource):
+        """Skip extraction when the text of these exact bytes is already stored, for this resource or another"""
+        digest = resource.content_hash
+        if digest is None:
+            return False
+        stored = ResourceContent.objects.filter(content_hash=digest)
+        if stored.filter(resource_id=resource.id).exists():
+            return True
+        text = stored.values_list('text', flat=True).first()
+        if text is None:
+            return False
+        self.store_text(resource.id, digest, text)
+        return True
+    
+    def store_text(self, resource_id, digest, text):
+        ResourceContent.objects.update_or_create(resource_id=resource_id,
+                                                 defaults={'content_hash': digest, 'text': text})
+        update_search_vectors([resource_id])
+        self.changed = True
@@ -0,0 +1,24 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.models import UploadSession
+from api.uploads import discard_part_file
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked upload sessions that were abandoned or completed, along with their part files'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=settings.CHUNKED_UPLOAD_EXPIRY_HOURS,
+                            help='Purge sessions not touched for this many hours')
+    
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        sessions = UploadSession.objects.filter(updated_at__lt=cutoff)
+        purged = 0
+        for session in sessions.iterator():
+            discard_part_file(session)
+            session.delete()
+            purged += 1
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} upload sessions'))
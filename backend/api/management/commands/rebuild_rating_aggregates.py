@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from api import cache
+from api.models import Rating, Resource
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored rating count and sum of every resource from the Rating table'
+    
+    def handle(self, *args, **options):
+        stats = (
+            Rating.objects.filter(resource=OuterRef('pk'))
+            .order_by()
+            .values('resource')
+            .annotate(count=Count('id'), total=Sum('rating_value'))
+        )
+        with transaction.atomic():
+            updated = Resource.objects.update(
+                rating_count=Coalesce(Subquery(stats.values('count')), Value(0)),
+                rating_sum=Coalesce(Subquery(stats.values('total')), Value(0)),
+            )
+        cache.bump(cache.RESOURCES)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {updated} resources'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from api.search import full_text_enabled, update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored full-text search vector of every resource (PostgreSQL only)'
+    
+    def handle(self, *args, **options):
+        if not full_text_enabled():
+            self.stdout.write('Full-text search needs PostgreSQL; nothing to rebuild')
+            return
+        updated = update_search_vectors()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search vectors for {updated} resources'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from api.ranking import refresh_scores, reset_trending
+
+
+class Command(BaseCommand):
+    help = ('Fold new download tallies into the trending scores and recompute rating scores; '
+            'run it on a schedule (e.g. every few minutes from cron)')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute trending scores from all retained tallies, folded or not')
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            reset_trending()
+        summary = refresh_scores(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            'Scores refreshed: {created} new resources, {tallies} download tallies folded, '
+            '{rated} rating scores, {pruned} old tallies pruned'.format(**summary)
+        ))
@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api.benchmarking import PASSWORD, bench_users, clear, seed
+
+
+class Command(BaseCommand):
+    help = ('Fill the database with a reproducible synthetic dataset for the benchmark and loadtest commands. '
+            'Set DB_ENGINE=sqlite to work on a local SQLite file')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--resources', type=int, default=2000)
+        parser.add_argument('--tags', type=int, default=100)
+        parser.add_argument('--ratings', type=int, default=5, help='Average ratings per resource')
+        parser.add_argument('--comments', type=int, default=3, help='Average comments per resource')
+        parser.add_argument('--files', type=int, default=20, help='Distinct files shared by the resources')
+        parser.add_argument('--file-size', type=int, default=64 * 1024, help='Bytes per file')
+        parser.add_argument('--seed', type=int, default=0, help='Same seed, same data')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--replace', action='store_true',
+                            help='Delete an existing benchmark dataset first (other data is left alone)')
+    
+    def handle(self, *args, **options):
+        if bench_users().exists():
+            if not options['replace']:
+                raise CommandError('A benchmark dataset already exists; pass --replace to start over')
+            self.stdout.write(f'Deleted {clear()} rows of the previous dataset')
+        
+        started = time.monotonic()
+        counts = seed(
+            users=options['users'], resources=options['resources'], tags=options['tags'],
+            ratings=options['ratings'], comments=options['comments'], files=options['files'],
+            file_size=options['file_size'], seed=options['seed'], batch_size=options['batch_size'],
+            progress=self.progress if options['verbosity'] >= 2 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {", ".join(f"{count} {name}" for name, count in counts.items())} '
+            f'in {time.monotonic() - started:.1f}s; users log in as user0@... with password {PASSWORD!r}'
+        ))
+    
+    def progress(self, done, total):
+        self.stdout.write(f'  {done}/{total} resources')
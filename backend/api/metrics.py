@@ -0,0 +1,183 @@
+"""Per-route request metrics in Prometheus text format.
+
+``APILoggingMiddleware`` records every API request here. For each route
+and method it keeps a latency histogram and counters of requests by
+status, response bytes, and database queries and the time spent in them.
+``/api/metrics/`` serves the totals together with the response cache
+counters.
+
+Queries are timed by a wrapper installed on every database connection as
+it is opened. The wrapper adds to the ``QueryStats`` of the request
+running in the current context. Context variables follow ``sync_to_async``
+into its worker thread, so the queries of async views are counted too.
+
+Like the cache statistics, the registry lives in process memory. Run
+Prometheus against each worker (one port per process) to get totals.
+"""
+import bisect
+import contextvars
+import sys
+import threading
+import time
+from collections import Counter
+from . import cache, logs
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Upper bounds in seconds, the Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_query_stats = contextvars.ContextVar('query_stats', default=None)
+
+
+class QueryStats:
+    """Number of queries run for one request and the seconds they took"""
+    __slots__ = ('count', 'seconds')
+    
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+def track_queries():
+    """Start counting the queries of the current request; returns the stats and a token for ``stop_tracking``"""
+    stats = QueryStats()
+    return stats, _query_stats.set(stats)
+
+
+def stop_tracking(token):
+    _query_stats.reset(token)
+
+
+def time_query(execute, sql, params, many, context):
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+
+
+def install_query_timer(connection):
+    # Execute wrappers outlive reconnects, so only add it the first time
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class RouteMetrics:
+    """Thread-safe request counters and latency histograms per (route, method)"""
+    
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._routes = {}
+    
+    def record(self, route, method, status, seconds, size=0, queries=0, query_seconds=0.0):
+        # Buckets are counted one by one and summed up when rendered
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self._routes.get((route, method))
+            if entry is None:
+                entry = self._routes[(route, method)] = {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'seconds': 0.0,
+                    'statuses': Counter(),
+                    'bytes': 0,
+                    'queries': 0,
+                    'query_seconds': 0.0,
+                }
+            entry['buckets'][bucket] += 1
+            entry['seconds'] += seconds
+            entry['statuses'][status] += 1
+            entry['bytes'] += size
+            entry['queries'] += queries
+            entry['query_seconds'] += query_seconds
+    
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: dict(entry, buckets=list(entry['buckets']), statuses=Counter(entry['statuses']))
+                for key, entry in self._routes.items()
+            }
+    
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+registry = RouteMetrics()
+
+
+def _labels(**labels):
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+def _family(lines, name, kind, help_text, samples):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    lines.extend(f'{sample}{labels} {value}' for sample, labels, value in samples)
+
+
+def render(routes=registry):
+    """The metrics of this process in the Prometheus text exposition format"""
+    snapshot = sorted(routes.snapshot().items())
+    lines = []
+    
+    histogram = []
+    for (route, method), entry in snapshot:
+        total = 0
+        for bound, count in zip(routes.buckets + ('+Inf',), entry['buckets']):
+            total += count
+            histogram.append(('studyshare_http_request_duration_seconds_bucket',
+                              _labels(route=route, method=method, le=bound), total))
+        histogram.append(('studyshare_http_request_duration_seconds_sum',
+                          _labels(route=route, method=method), entry['seconds']))
+        histogram.append(('studyshare_http_request_duration_seconds_count',
+                          _labels(route=route, method=method), total))
+    _family(lines, 'studyshare_http_request_duration_seconds', 'histogram',
+            'Time to build API responses (streamed bodies excluded)', histogram)
+    
+    _family(lines, 'studyshare_http_requests_total', 'counter', 'API requests by response status', [
+        ('studyshare_http_requests_total', _labels(route=route, method=method, status=code), count)
+        for (route, method), entry in snapshot
+        for code, count in sorted(entry['statuses'].items())
+    ])
+    for name, field, help_text in (
+        ('studyshare_http_response_bytes_total', 'bytes', 'Response body bytes (Content-Length of streams)'),
+        ('studyshare_db_queries_total', 'queries', 'Database queries run by API requests'),
+        ('studyshare_db_query_seconds_total', 'query_seconds', 'Time API requests spent in database queries'),
+    ):
+        _family(lines, name, 'counter', help_text, [
+            (name, _labels(route=route, method=method), entry[field]) for (route, method), entry in snapshot
+        ])
+    
+    views = sorted(cache.stats.snapshot()['views'].items())
+    _family(lines, 'studyshare_response_cache_requests_total', 'counter', 'Response cache lookups by result', [
+        ('studyshare_response_cache_requests_total', _labels(view=view, result=result), counts[key])
+        for view, counts in views
+        for result, key in (('hit', 'hits'), ('miss', 'misses'))
+    ])
+    _family(lines, 'studyshare_log_records_dropped_total', 'counter',
+            'Request log records dropped because the log queue was full',
+            [('studyshare_log_records_dropped_total', '', logs.dropped_records())])
+    
+    # Only loaded when the pooled backend is in use; the pool exists once the first connection was made
+    pooled = sys.modules.get('studyshare.pooled_postgresql.base')
+    pool = pooled.get_pool('default') if pooled else None
+    if pool is not None:
+        stats = pool.stats()
+        _family(lines, 'studyshare_db_pool_connections', 'gauge', 'Pooled database connections by state', [
+            ('studyshare_db_pool_connections', _labels(state=state), stats[state]) for state in ('idle', 'in_use')
+        ])
+        _family(lines, 'studyshare_db_pool_waits_total', 'counter',
+                'Times a request waited for a pooled connection', [('studyshare_db_pool_waits_total', '', stats['waits'])])
+        _family(lines, 'studyshare_db_pool_timeouts_total', 'counter',
+                'Times a request gave up waiting for a pooled connection',
+                [('studyshare_db_pool_timeouts_total', '', stats['timeouts'])])
+    return '\n'.join(lines) + '\n'
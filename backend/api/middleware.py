@@ -1,17 +1,85 @@
 import logging
-from django.utils.deprecation import MiddlewareMixin
+import random
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
-class APILoggingMiddleware(MiddlewareMixin):
+class APILoggingMiddleware:
     """
-    Middleware to log API requests and responses
+    Measure every API request: wall time, database queries and the time
+    spent in them, response bytes, status and route name. Each request
+    goes into the per-route metrics served at ``/api/metrics/``. A sample
+    of ``API_LOG_SAMPLE_RATE`` of them is also logged as one structured
+    record. Server errors and requests slower than ``API_LOG_SLOW_MS`` are
+    always logged.
+    
+    Works in both sync and async mode, so async views under ASGI are not
+    moved to a thread for the middleware's sake.
     """
-    def process_request(self, request):
-        if request.path.startswith('/api/'):
-            logger.info(f"API Request: {request.method} {request.path} from {request.META.get('REMOTE_ADDR')}")
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not request.path.startswith('/api/'):
+            return self.get_response(request)
+        started = time.perf_counter()
+        queries, token = metrics.track_queries()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop_tracking(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+    
+    async def __acall__(self, request):
+        if not request.path.startswith('/api/'):
+            return await self.get_response(request)
+        started = time.perf_counter()
+        queries, token = metrics.track_queries()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop_tracking(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
     
-    def process_response(self, request, response):
-        if request.path.startswith('/api/'):
-            logger.info(f"API Response: {response.status_code} for {request.method} {request.path}")
-        return response
\ No newline at end of file
+    def record(self, request, response, seconds, queries):
+        match = request.resolver_match
+        route = (match.view_name or match.route) if match else 'unmatched'
+        if response.streaming:
+            # Streamed bodies are sent after this returns; count what the headers promise
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        metrics.registry.record(route, request.method, response.status_code, seconds,
+                                size=size, queries=queries.count, query_seconds=queries.seconds)
+        
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        duration_ms = seconds * 1000
+        if (response.status_code < 500 and duration_ms < settings.API_LOG_SLOW_MS
+                and random.random() >= settings.API_LOG_SAMPLE_RATE):
+            return
+        logger.info('%s %s %s %.1fms', request.method, request.path, response.status_code, duration_ms, extra={
+            'fields': {
+                'method': request.method,
+                'path': request.path,
+                'route': route,
+                'status': response.status_code,
+                'duration_ms': round(duration_ms, 2),
+                'db_queries': queries.count,
+                'db_ms': round(queries.seconds * 1000, 2),
+                'bytes': size,
+                'remote_addr': request.META.get('REMOTE_ADDR'),
+            },
+        })
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:18
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Rating = apps.get_model('api', 'Rating')
+    Resource = apps.get_model('api', 'Resource')
+    stats = (
+        Rating.objects.filter(resource=models.OuterRef('pk'))
+        .order_by()
+        .values('resource')
+        .annotate(count=models.Count('id'), total=models.Sum('rating_value'))
+    )
+    Resource.objects.update(
+        rating_count=Coalesce(models.Subquery(stats.values('count')), models.Value(0)),
+        rating_sum=Coalesce(models.Subquery(stats.values('total')), models.Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_sync_model_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:18
+
+import api.validators
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Catches the migrations up with model changes made before the rating aggregates"""
+
+    dependencies = [
+        ('api', '0003_merge_20251029_0355'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='resource',
+            options={'ordering': ['-upload_date']},
+        ),
+        migrations.RenameIndex(
+            model_name='resource',
+            new_name='api_resourc_subject_4c9b4a_idx',
+            old_name='api_resource_subject_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='resource',
+            new_name='api_resourc_topic_16b47a_idx',
+            old_name='api_resource_topic_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='resource',
+            new_name='api_resourc_course__9345ea_idx',
+            old_name='api_resource_course_code_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='resource',
+            new_name='api_resourc_upload__4bf9d2_idx',
+            old_name='api_resource_upload_date_idx',
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='rating_value',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.AlterField(
+            model_name='resource',
+            name='file',
+            field=models.FileField(upload_to='resources/', validators=[api.validators.validate_file_size, api.validators.validate_file_extension]),
+        ),
+    ]
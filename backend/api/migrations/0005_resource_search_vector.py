@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:20
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+BACKFILL_SQL = """
+UPDATE api_resource AS r SET search_vector =
+    setweight(to_tsvector('english', coalesce(r.title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(r.course_code, '') || ' ' || coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM api_tag t JOIN api_resource_tags rt ON rt.tag_id = t.id
+        WHERE rt.resource_id = r.id
+    ), '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(r.subject, '') || ' ' || coalesce(r.topic, '')), 'C') ||
+    setweight(to_tsvector('english', coalesce(r.description, '')), 'D')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS api_resource_search_vector_gin ON api_resource USING gin (search_vector)'
+    )
+    schema_editor.execute(BACKFILL_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS api_resource_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_resource_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
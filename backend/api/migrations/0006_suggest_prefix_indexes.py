@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# Expression indexes behind api.search.suggest: the "C" collation lets a
+# prefix LIKE and ORDER BY on UPPER(column) run as one ordered index scan.
+PREFIX_INDEXES = [
+    ('api_resource_title_prefix', 'api_resource', 'title'),
+    ('api_resource_course_code_prefix', 'api_resource', 'course_code'),
+    ('api_tag_name_prefix', 'api_tag', 'name'),
+]
+
+
+def create_suggest_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} ((UPPER({column}) COLLATE "C"))'
+        )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        trigram_available = cursor.fetchone() is not None
+    if trigram_available:
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS api_resource_title_trgm ON api_resource USING gin (title gin_trgm_ops)'
+        )
+
+
+def drop_suggest_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+    schema_editor.execute('DROP INDEX IF EXISTS api_resource_title_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_resource_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_suggest_indexes, drop_suggest_indexes),
+    ]
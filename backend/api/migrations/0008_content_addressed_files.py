@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:33
+
+import os
+import api.storage
+import api.validators
+from django.db import migrations, models
+
+
+def backfill_original_filenames(apps, schema_editor):
+    Resource = apps.get_model('api', 'Resource')
+    for resource in Resource.objects.only('id', 'file').iterator():
+        name = os.path.basename(resource.file.name or '')[:255]
+        Resource.objects.filter(id=resource.id).update(original_filename=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_upload_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='original_filename',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='resource',
+            name='file',
+            field=models.FileField(storage=api.storage.get_resource_storage, upload_to='resources/', validators=[api.validators.validate_file_size, api.validators.validate_file_extension]),
+        ),
+        migrations.RunPython(backfill_original_filenames, migrations.RunPython.noop),
+    ]
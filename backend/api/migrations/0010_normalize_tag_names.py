@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+def normalize_tag_names(apps, schema_editor):
+    """Merge tags that differ only in case or whitespace into one lower-case tag"""
+    Tag = apps.get_model('api', 'Tag')
+    Resource = apps.get_model('api', 'Resource')
+    Through = Resource.tags.through
+    
+    groups = {}
+    for tag in Tag.objects.order_by('id'):
+        groups.setdefault(' '.join(tag.name.split()).lower(), []).append(tag)
+    
+    for name, tags in groups.items():
+        keeper = next((tag for tag in tags if tag.name == name), tags[0])
+        for duplicate in tags:
+            if duplicate.pk == keeper.pk:
+                continue
+            tagged = Through.objects.filter(tag_id=keeper.pk).values('resource_id')
+            Through.objects.filter(tag_id=duplicate.pk).exclude(resource_id__in=tagged).update(tag_id=keeper.pk)
+            Through.objects.filter(tag_id=duplicate.pk).delete()
+            duplicate.delete()
+        if keeper.name != name:
+            keeper.name = name
+            keeper.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_resource_file_metadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_tag_names, migrations.RunPython.noop),
+    ]
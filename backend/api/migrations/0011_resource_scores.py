@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_normalize_tag_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResourceScore',
+            fields=[
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='api.resource')),
+                ('subject', models.CharField(max_length=100)),
+                ('course_code', models.CharField(max_length=20)),
+                ('trending_score', models.FloatField(null=True)),
+                ('rating_score', models.FloatField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-trending_score'], name='api_resourc_trendin_09a313_idx'), models.Index(fields=['subject', '-trending_score'], name='api_resourc_subject_3cf95a_idx'), models.Index(fields=['course_code', '-trending_score'], name='api_resourc_course__ac30e3_idx'), models.Index(fields=['-rating_score'], name='api_resourc_rating__180c65_idx'), models.Index(fields=['subject', '-rating_score'], name='api_resourc_subject_e62c9d_idx'), models.Index(fields=['course_code', '-rating_score'], name='api_resourc_course__0af704_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DownloadTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField()),
+                ('recorded_at', models.DateTimeField(db_index=True)),
+                ('resource', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.resource')),
+            ],
+        ),
+    ]
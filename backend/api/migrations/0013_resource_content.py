@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_processing_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceContent',
+            fields=[
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='content', serialize=False, to='api.resource')),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('text', models.TextField(blank=True)),
+                ('extracted_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='processingjob',
+            name='kind',
+            field=models.CharField(choices=[('previews', 'Thumbnail and preview images'), ('text', 'Text extraction for search')], max_length=20),
+        ),
+    ]
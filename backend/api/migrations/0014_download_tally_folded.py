@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:39
+
+from django.db import migrations, models
+
+
+def mark_folded_tallies(apps, schema_editor):
+    """Flag the tallies the old id watermark had already read"""
+    DownloadTally = apps.get_model('api', 'DownloadTally')
+    ScoreWatermark = apps.get_model('api', 'ScoreWatermark')
+    last_id = ScoreWatermark.objects.filter(name='downloads').values_list('last_id', flat=True).first() or 0
+    DownloadTally.objects.filter(id__lte=last_id).update(folded=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_resource_content'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='downloadtally',
+            name='folded',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='downloadtally',
+            index=models.Index(fields=['folded', 'id'], name='api_downloa_folded_f73076_idx'),
+        ),
+        migrations.RunPython(mark_folded_tallies, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='scorewatermark',
+            name='last_id',
+        ),
+    ]
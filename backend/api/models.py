@@ -1,6 +1,15 @@
+import math
+import os
+import uuid
+from collections import Counter
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
+from . import cache
+from .delivery import guess_content_type
+from .previews import delete_previews
+from .storage import get_resource_storage, hash_from_name, resource_storage
 from .validators import validate_file_size, validate_file_extension
 
 class User(AbstractUser):
@@ -19,14 +28,42 @@ class Tag(models.Model):
     
     def __str__(self):
         return self.name
+    
+    @staticmethod
+    def normalize_name(name):
+        """Lower-case and collapse whitespace so 'Exam  Prep' and 'exam prep' are one tag"""
+        return ' '.join(name.split()).lower()
+    
+    @classmethod
+    def resolve(cls, names):
+        """Tags for already-normalized ``names``, creating the missing ones in a single INSERT"""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+        tags = {tag.name: tag for tag in cls.objects.filter(name__in=names)}
+        missing = [name for name in names if name not in tags]
+        if missing:
+            # ignore_conflicts: a concurrent request may create the same tag; pks aren't returned, so re-read
+            cls.objects.bulk_create([cls(name=name) for name in missing], ignore_conflicts=True)
+            tags.update((tag.name, tag) for tag in cls.objects.filter(name__in=missing))
+            # bulk_create sends no post_save, so invalidate cached tag lists here
+            transaction.on_commit(lambda: cache.bump(cache.TAGS))
+        return [tags[name] for name in names]
 
 class Resource(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     file = models.FileField(
         upload_to='resources/',
+        storage=get_resource_storage,
         validators=[validate_file_size, validate_file_extension]
     )
+    # Stored file names are content hashes; this keeps the name the uploader gave
+    original_filename = models.CharField(max_length=255, blank=True, editable=False)
+    # Captured once at upload so listings never stat (or call) the storage backend per row
+    file_size = models.PositiveBigIntegerField(default=0, editable=False)
+    mime_type = models.CharField(max_length=100, blank=True, editable=False)
+    file_extension = models.CharField(max_length=20, blank=True, editable=False)
     uploader = models.ForeignKey(User, on_delete=models.CASCADE, related_name='resources')
     subject = models.CharField(max_length=100)
     topic = models.CharField(max_length=100)
@@ -34,6 +71,12 @@ class Resource(models.Model):
     tags = models.ManyToManyField(Tag, blank=True)
     upload_date = models.DateTimeField(auto_now_add=True)
     download_count = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    # Maintained by api.search; its GIN index is created by migration on PostgreSQL only
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Rendition name -> stored JPEG, filled in by the process_jobs worker (see api.previews)
+    previews = models.JSONField(default=dict, blank=True, editable=False)
     
     class Meta:
         ordering = ['-upload_date']
@@ -49,10 +92,109 @@ class Resource(models.Model):
     
     @property
     def average_rating(self):
-        ratings = self.ratings.all()
-        if ratings:
-            return sum(r.rating_value for r in ratings) / len(ratings)
+        if self.rating_count:
+            return self.rating_sum / self.rating_count
         return 0
+    
+    def capture_file_metadata(self):
+        """Copy size, MIME type and extension of the current file onto the row"""
+        self.file_size = self.file.size
+        self.mime_type = guess_content_type(self.file.name)
+        self.file_extension = os.path.splitext(self.file.name)[1].lower()[:20]
+    
+    @property
+    def content_hash(self):
+        """SHA-256 of the file, read from its content-addressed name (None for legacy files)"""
+        return hash_from_name(self.file.name)
+
+class StoredBlob(models.Model):
+    """A file in the content-addressed store and the number of resources pointing at it"""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.name
+    
+    @classmethod
+    def hold(cls, name, place):
+        """
+        Count a reference to the blob stored as ``name`` and only then make
+        sure its file exists: ``place()`` runs under the row lock and puts
+        the file in the store if it is missing, e.g. purged a moment ago.
+        """
+        digest = hash_from_name(name)
+        with transaction.atomic():
+            blob = None
+            while blob is None:
+                cls.objects.bulk_create([cls(sha256=digest, name=name)], ignore_conflicts=True)
+                # None if a purge holding the lock deleted the row meanwhile; then insert it again
+                blob = cls.objects.select_for_update().filter(sha256=digest).first()
+            place()
+            blob.size = resource_storage.size(name)
+            blob.ref_count += 1
+            blob.save(update_fields=['size', 'ref_count'])
+    
+    @classmethod
+    def acquire(cls, name):
+        """Count one more reference to the blob stored as ``name``"""
+        cls.acquire_many([name])
+    
+    @classmethod
+    def acquire_many(cls, names):
+        """Count one reference per entry of ``names`` (repeats allowed) in a fixed number of queries"""
+        counts = Counter()
+        blob_names = {}
+        for name in names:
+            digest = hash_from_name(name)
+            if digest is not None:
+                counts[digest] += 1
+                blob_names[digest] = name
+        if not counts:
+            return
+        existing = set(cls.objects.filter(sha256__in=counts).values_list('sha256', flat=True))
+        missing = [
+            cls(sha256=digest, name=blob_names[digest],
+                size=resource_storage.size(blob_names[digest]) if resource_storage.exists(blob_names[digest]) else 0)
+            for digest in counts if digest not in existing
+        ]
+        if missing:
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+        by_increment = {}
+        for digest, count in counts.items():
+            by_increment.setdefault(count, []).append(digest)
+        for count, digests in sorted(by_increment.items()):
+            cls.objects.filter(sha256__in=sorted(digests)).update(ref_count=models.F('ref_count') + count)
+    
+    @classmethod
+    def release(cls, name):
+        """Drop one reference; the file is deleted after commit if that was the last one"""
+        digest = hash_from_name(name)
+        if digest is None:
+            return
+        cls.objects.filter(sha256=digest, ref_count__gt=0).update(ref_count=models.F('ref_count') - 1)
+        transaction.on_commit(lambda: cls.purge(digest))
+    
+    @classmethod
+    def purge(cls, digest):
+        with transaction.atomic():
+            # Checked under the lock hold() takes, so a blob referenced again meanwhile stays
+            blob = cls.objects.select_for_update().filter(sha256=digest, ref_count=0).first()
+            if blob is not None:
+                blob.delete()
+                resource_storage.delete(blob.name)
+                delete_previews(digest)
+    
+    @classmethod
+    def forget(cls, names):
+        """Delete the files of ``names`` that no blob row counts a reference to, e.g. after a rollback"""
+        for name in names:
+            digest = hash_from_name(name)
+            # Waits for a transaction inserting the row to finish, so purge sees its count
+            cls.objects.bulk_create([cls(sha256=digest, name=name)], ignore_conflicts=True)
+            cls.purge(digest)
 
 class Rating(models.Model):
     resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='ratings')
@@ -63,6 +205,14 @@ class Rating(models.Model):
     
     class Meta:
         unique_together = ('resource', 'user')
+    
+    @staticmethod
+    def apply_to_resource(resource_id, count_delta, sum_delta):
+        """Atomically shift the stored rating aggregates of a resource"""
+        Resource.objects.filter(id=resource_id).update(
+            rating_count=models.F('rating_count') + count_delta,
+            rating_sum=models.F('rating_sum') + sum_delta,
+        )
 
 class Comment(models.Model):
     resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='comments')
@@ -71,4 +221,119 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f'Comment by {self.user.username} on {self.resource.title}'
\ No newline at end of file
+        return f'Comment by {self.user.username} on {self.resource.title}'
+
+class DownloadTally(models.Model):
+    """Downloads of one resource written by one counter flush; folded into ResourceScore by refresh_scores"""
+    # No database constraint: flushes must not fail because a resource was deleted meanwhile
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, db_constraint=False, related_name='+')
+    count = models.PositiveIntegerField()
+    recorded_at = models.DateTimeField(db_index=True)
+    # Set by refresh_scores once the tally is in the trending scores; kept until pruned for --rebuild
+    folded = models.BooleanField(default=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['folded', 'id']),
+        ]
+
+class ResourceScore(models.Model):
+    """Precomputed ranking scores of a resource, maintained by the refresh_scores command (see api.ranking)"""
+    resource = models.OneToOneField(Resource, on_delete=models.CASCADE, primary_key=True, related_name='score')
+    # Copied from the resource so per-subject/per-course rankings are index scans
+    subject = models.CharField(max_length=100)
+    course_code = models.CharField(max_length=20)
+    # ln(sum of downloads weighted by exp(decay * seconds since SCORE_EPOCH)); NULL until first download
+    trending_score = models.FloatField(null=True)
+    rating_score = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-trending_score']),
+            models.Index(fields=['subject', '-trending_score']),
+            models.Index(fields=['course_code', '-trending_score']),
+            models.Index(fields=['-rating_score']),
+            models.Index(fields=['subject', '-rating_score']),
+            models.Index(fields=['course_code', '-rating_score']),
+        ]
+
+class ScoreWatermark(models.Model):
+    """When refresh_scores last folded a source; its row is locked while that runs"""
+    name = models.CharField(max_length=50, primary_key=True)
+    refreshed_at = models.DateTimeField(null=True)
+
+class ResourceContent(models.Model):
+    """Text extracted from a resource's file for search, kept apart so listings never load it"""
+    resource = models.OneToOneField(Resource, on_delete=models.CASCADE, primary_key=True, related_name='content')
+    # SHA-256 of the bytes the text came from; extraction is skipped while it matches the file
+    content_hash = models.CharField(max_length=64, db_index=True)
+    text = models.TextField(blank=True)
+    extracted_at = models.DateTimeField(auto_now=True)
+
+class ProcessingJob(models.Model):
+    """Background work on one resource, queued after upload and run by the process_jobs command"""
+    PREVIEWS = 'previews'
+    TEXT = 'text'
+    KIND_CHOICES = [
+        (PREVIEWS, 'Thumbnail and preview images'),
+        (TEXT, 'Text extraction for search'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+    
+    def __str__(self):
+        return f'{self.get_kind_display()} for resource {self.resource_id} ({self.status})'
+
+class UploadSession(models.Model):
+    """A resumable upload whose chunks are written straight to a file on disk"""
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('complete', 'Complete'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    received_chunks = models.JSONField(default=list)
+    metadata = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
+    resource = models.ForeignKey(Resource, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f'Upload of {self.filename} by {self.user.username}'
+    
+    @property
+    def chunk_count(self):
+        return max(math.ceil(self.total_size / self.chunk_size), 1)
+    
+    def chunk_length(self, index):
+        """Expected byte length of chunk ``index``"""
+        return min(self.chunk_size, self.total_size - index * self.chunk_size)
+    
+    @property
+    def missing_chunks(self):
+        received = set(self.received_chunks)
+        return [i for i in range(self.chunk_count) if i not in received]
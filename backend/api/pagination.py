@@ -0,0 +1,143 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque cursor pagination that seeks past the last row of the previous
+    page instead of counting and OFFSET-ing. The ordering must end in a
+    unique column so every row has a distinct position.
+    
+    The total is only computed when the client asks for it with
+    ``?count=exact`` or, more cheaply, ``?count=estimate``.
+    """
+    ordering = ('-upload_date', 'id')
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+    
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset, request.query_params.get(self.count_query_param))
+        return self.take_page(list(self.page_queryset(queryset, request)))
+    
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, fetching through the async ORM"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = await self.aget_count(queryset, request.query_params.get(self.count_query_param))
+        return self.take_page([row async for row in self.page_queryset(queryset, request)])
+    
+    def page_queryset(self, queryset, request):
+        """The rows of this page plus one, which tells whether there is a next page"""
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.rows_after(position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return queryset[:self.page_size + 1]
+    
+    def take_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self.position_of(rows[-1]) if self.has_next else None
+        return rows
+    
+    def get_paginated_response(self, data):
+        payload = OrderedDict([('next', self.get_next_link()), ('results', data)])
+        if self.count is not None:
+            payload['count'], payload['count_is_estimate'] = self.count
+        return Response(payload)
+    
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+    
+    def get_count(self, queryset, mode):
+        if mode == 'exact':
+            return queryset.order_by().count(), False
+        if mode == 'estimate':
+            return estimate_count(queryset), connection.vendor == 'postgresql'
+        return None
+    
+    async def aget_count(self, queryset, mode):
+        if mode == 'exact':
+            return await queryset.order_by().acount(), False
+        if mode == 'estimate':
+            return await sync_to_async(estimate_count)(queryset), connection.vendor == 'postgresql'
+        return None
+    
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+    
+    def position_of(self, row):
+        return [getattr(row, field.lstrip('-')) for field in self.ordering]
+    
+    def rows_after(self, position):
+        """Rows strictly after ``position`` in lexicographic ordering order"""
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[i]})
+            for previous, value in zip(self.ordering[:i], position[:i]):
+                step &= Q(**{previous.lstrip('-'): value})
+            condition |= step
+        return condition
+    
+    def encode_cursor(self, position):
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+    
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+
+def estimate_count(queryset):
+    """Planner row estimate on PostgreSQL (driven by pg_class.reltuples); exact count elsewhere"""
+    queryset = queryset.order_by()
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
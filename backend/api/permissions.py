@@ -11,7 +11,7 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
             return True
         
         # Write permissions are only allowed to the owner of the object.
-        return obj.uploader == request.user
+        return obj.uploader_id == request.user.id
 
 class IsCommentOwnerOrReadOnly(permissions.BasePermission):
     """
@@ -20,4 +20,4 @@ class IsCommentOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.user == request.user
\ No newline at end of file
+        return obj.user_id == request.user.id
\ No newline at end of file
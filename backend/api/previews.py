@@ -0,0 +1,160 @@
+"""Thumbnails and previews of resource files.
+
+Every rendition is a JPEG derived from the file's bytes, so it is stored
+beside the file under the same SHA-256: ``previews/ab/cd/<hash>-<rendition>.jpg``.
+Identical uploads share their previews and a rendition never changes once
+written, which lets the thumbnail endpoint hand out year-long cache headers
+for versioned URLs.
+
+Rendering is CPU-heavy and runs in the ``process_jobs`` worker's process
+pool. Images are decoded with Pillow. The first page of a PDF is drawn by
+``pdftoppm`` (poppler-utils) and a video's poster frame is grabbed by
+``ffmpeg``; without those tools the jobs for such files fail and the
+missing tool is logged.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .storage import blob_name, hash_from_name, hash_path, resource_storage
+from .utils import find_tool
+
+# Rendition -> longest side in pixels
+RENDITIONS = {
+    'thumbnail': 320,
+    'preview': 1280,
+}
+PREVIEW_PREFIX = 'previews'
+JPEG_QUALITY = 82
+
+
+class Unsupported(Exception):
+    """The file is of a kind no preview can be drawn for here"""
+
+
+def preview_name(digest, rendition):
+    return blob_name(PREVIEW_PREFIX, digest, f'-{rendition}.jpg')
+
+
+def preview_version(name):
+    """Short token naming the bytes of a rendition, used as ETag and cache-busting ``?v=``"""
+    return os.path.basename(name).split('-', 1)[0][:16]
+
+
+def previewable(mime_type):
+    """Whether previews can be attempted for files of ``mime_type``"""
+    mime_type = mime_type or ''
+    return mime_type.startswith(('image/', 'video/')) or mime_type == 'application/pdf'
+
+
+def delete_previews(digest):
+    for rendition in RENDITIONS:
+        resource_storage.delete(preview_name(digest, rendition))
+
+
+def _command_timeout():
+    return getattr(settings, 'PREVIEW_COMMAND_TIMEOUT', 60)
+
+
+def _run(args):
+    try:
+        subprocess.run(args, check=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.PIPE, timeout=_command_timeout())
+    except subprocess.CalledProcessError as exc:
+        raise Unsupported(exc.stderr.decode(errors='replace').strip()[-200:] or f'{args[0]} failed')
+    except subprocess.TimeoutExpired:
+        raise Unsupported(f'{args[0]} timed out')
+
+
+def _pdf_first_page(path, workdir):
+    if find_tool('pdftoppm') is None:
+        raise Unsupported('pdftoppm is not installed')
+    output = os.path.join(workdir, 'page')
+    _run(['pdftoppm', '-f', '1', '-l', '1', '-singlefile', '-png',
+          '-scale-to', str(max(RENDITIONS.values())), path, output])
+    return output + '.png'
+
+
+def _video_poster_frame(path, workdir):
+    if find_tool('ffmpeg') is None:
+        raise Unsupported('ffmpeg is not installed')
+    output = os.path.join(workdir, 'frame.png')
+    size = max(RENDITIONS.values())
+    scale = f"scale='min({size},iw)':-2"
+    # A second in skips fade-ins; clips shorter than that fall back to the first frame
+    for seek in ('1', '0'):
+        _run(['ffmpeg', '-v', 'error', '-y', '-ss', seek, '-i', path, '-frames:v', '1', '-vf', scale, output])
+        if os.path.exists(output) and os.path.getsize(output):
+            return output
+    raise Unsupported('no video frame could be decoded')
+
+
+def _open_image(path, mime_type, workdir):
+    if mime_type == 'application/pdf':
+        path = _pdf_first_page(path, workdir)
+    elif mime_type.startswith('video/'):
+        path = _video_poster_frame(path, workdir)
+    elif not mime_type.startswith('image/'):
+        raise Unsupported(f'no previews for {mime_type or "unknown"} files')
+    try:
+        image = Image.open(path)
+        # Let the JPEG decoder downscale while decoding instead of expanding every pixel
+        image.draft('RGB', (max(RENDITIONS.values()),) * 2)
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError) as exc:
+        raise Unsupported(str(exc))
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        # JPEG has no alpha; flatten onto white as the cards are drawn on white
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image.convert('RGBA'), mask=image.convert('RGBA').getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _write_jpeg(image, name):
+    full_path = resource_storage.path(name)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    fd, scratch = tempfile.mkstemp(dir=os.path.dirname(full_path), suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            image.save(fh, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        if resource_storage.file_permissions_mode is not None:
+            os.chmod(scratch, resource_storage.file_permissions_mode)
+        os.replace(scratch, full_path)
+    finally:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+
+
+def render_previews(file_name, mime_type):
+    """
+    Draw every rendition of the stored file ``file_name``; runs in a worker
+    process. Returns ``({rendition: name}, error)``, where the mapping is
+    empty and ``error`` says why when no preview can be made. Such errors
+    are properties of the file and not worth retrying; exceptions are.
+    """
+    path = resource_storage.path(file_name)
+    try:
+        # Legacy files stored under their upload name are hashed here
+        digest = hash_from_name(file_name) or hash_path(path)
+    except OSError as exc:
+        return {}, f'cannot read {file_name}: {exc.strerror}'
+    names = {rendition: preview_name(digest, rendition) for rendition in RENDITIONS}
+    if all(resource_storage.exists(name) for name in names.values()):
+        # The same bytes were uploaded before
+        return names, None
+    
+    workdir = tempfile.mkdtemp(prefix='previews-')
+    try:
+        image = _open_image(path, mime_type, workdir)
+        for rendition, size in RENDITIONS.items():
+            rendered = image.copy()
+            rendered.thumbnail((size, size), Image.LANCZOS)
+            _write_jpeg(rendered, names[rendition])
+    except Unsupported as exc:
+        return {}, str(exc)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return names, None
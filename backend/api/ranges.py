@@ -0,0 +1,180 @@
+"""HTTP Range (RFC 9110 section 14) and conditional request handling for file previews"""
+import asyncio
+import inspect
+import os
+import secrets
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+# Requests asking for more disjoint ranges than this get the whole file instead
+MAX_RANGES = 16
+
+
+def file_etag(stat):
+    """Strong validator derived from the file's modification time and size"""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range_header(header, size):
+    """
+    Parse a ``Range`` header against a representation of ``size`` bytes.
+    
+    Returns a sorted list of inclusive ``(start, end)`` pairs with
+    overlapping or adjacent ranges merged; an empty list when nothing is
+    satisfiable; and None when the header is malformed, uses another unit
+    or asks for too many pieces, in which case it must be ignored.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition('-')
+        first, last = first.strip(), last.strip()
+        if not dash or (first and not first.isdigit()) or (last and not last.isdigit()) or not (first or last):
+            return None
+        if first:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                continue
+            ranges.append((start, min(int(last), size - 1) if last else size - 1))
+        else:
+            suffix = int(last)
+            if suffix and size:
+                ranges.append((max(size - suffix, 0), size - 1))
+    
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
+
+
+def if_range_passes(request, etag, last_modified):
+    """Whether a Range request may be honoured given its ``If-Range`` validator"""
+    validator = request.META.get('HTTP_IF_RANGE')
+    if not validator:
+        return True
+    validator = validator.strip()
+    if validator.startswith('W/'):
+        return False
+    if validator.startswith('"'):
+        return validator == etag
+    return parse_http_date_safe(validator) == int(last_modified)
+
+
+def read_file(path, offset=0, length=None, chunk_size=CHUNK_SIZE):
+    with open(path, 'rb') as fh:
+        fh.seek(offset)
+        remaining = length
+        while remaining is None or remaining > 0:
+            data = fh.read(chunk_size if remaining is None else min(remaining, chunk_size))
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            yield data
+
+
+async def aread_file(path, offset=0, length=None, chunk_size=CHUNK_SIZE):
+    """``read_file`` for async views: disk reads run in a thread, so a slow client only holds a coroutine"""
+    fh = await asyncio.to_thread(open, path, 'rb')
+    try:
+        await asyncio.to_thread(fh.seek, offset)
+        remaining = length
+        while remaining is None or remaining > 0:
+            data = await asyncio.to_thread(fh.read, chunk_size if remaining is None else min(remaining, chunk_size))
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            yield data
+    finally:
+        fh.close()
+
+
+def _multipart_body(path, ranges, size, content_type, boundary, reader):
+    for start, end in ranges:
+        yield _part_header(boundary, content_type, start, end, size)
+        yield from reader(path, start, end - start + 1)
+    yield f'\r\n--{boundary}--\r\n'.encode()
+
+
+async def _amultipart_body(path, ranges, size, content_type, boundary, reader):
+    for start, end in ranges:
+        yield _part_header(boundary, content_type, start, end, size)
+        async for data in reader(path, start, end - start + 1):
+            yield data
+    yield f'\r\n--{boundary}--\r\n'.encode()
+
+
+def _part_header(boundary, content_type, start, end, size):
+    return (f'\r\n--{boundary}\r\nContent-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n').encode()
+
+
+def cache_headers(response, etag, last_modified):
+    max_age = getattr(settings, 'FILE_CACHE_MAX_AGE', 0)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = f'public, max-age={max_age}' if max_age else 'public, no-cache'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def ranged_file_response(request, path, content_type, stat=None, etag=None, reader=read_file):
+    """
+    Serve ``path`` honouring ``If-None-Match``/``If-Modified-Since`` (304),
+    ``If-Match``/``If-Unmodified-Since`` (412), ``If-Range`` and single or
+    multiple byte ranges (206, ``multipart/byteranges``, or 416).
+    ``reader`` may be an async generator function such as ``aread_file``.
+    """
+    stat = stat or os.stat(path)
+    size = stat.st_size
+    etag = etag or file_etag(stat)
+    last_modified = int(stat.st_mtime)
+    
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return cache_headers(conditional, etag, last_modified)
+    
+    ranges = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and if_range_passes(request, etag, last_modified):
+        ranges = parse_range_header(range_header, size)
+    
+    if ranges is None:
+        response = StreamingHttpResponse(reader(path, 0, size), content_type=content_type)
+        response['Content-Length'] = str(size)
+    elif not ranges:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(reader(path, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        boundary = secrets.token_hex(16)
+        length = sum(len(_part_header(boundary, content_type, start, end, size)) + end - start + 1
+                     for start, end in ranges) + len(f'\r\n--{boundary}--\r\n')
+        multipart_body = _amultipart_body if inspect.isasyncgenfunction(reader) else _multipart_body
+        response = StreamingHttpResponse(
+            multipart_body(path, ranges, size, content_type, boundary, reader),
+            status=206,
+            content_type=f'multipart/byteranges; boundary={boundary}',
+        )
+        response['Content-Length'] = str(length)
+    return cache_headers(response, etag, last_modified)
@@ -0,0 +1,162 @@
+"""Trending and top-rated scores behind /api/resources/trending/ and /top/.
+
+Trending is download velocity with exponential time decay. Each download
+counts ``exp(decay_rate * t)``, where ``t`` is seconds since the fixed
+``SCORE_EPOCH``. Older downloads are never decayed in place: a new one
+just weighs more. The stored value is the natural log of the sum. Adding
+downloads is then a ``logaddexp`` on one row, and the values never overflow
+however much time passes. ``TRENDING_HALF_LIFE_HOURS`` sets the decay.
+
+Top-rated is a Bayesian average: each resource's ratings are blended with
+``RATING_PRIOR_WEIGHT`` phantom ratings at the site-wide mean. A single
+5-star rating does not outrank forty 4.8s.
+
+``refresh_scores()`` folds only the download tallies not yet marked as
+folded into the scores, then marks them. It then recomputes the rating
+scores in one UPDATE.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast
+from django.utils import timezone
+from . import cache
+from .models import DownloadTally, Resource, ResourceScore, ScoreWatermark
+
+SCORE_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+DOWNLOADS_WATERMARK = 'downloads'
+
+
+def decay_rate():
+    half_life = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 72) * 3600
+    return math.log(2) / half_life
+
+
+def log_weight(count, when, rate=None):
+    rate = decay_rate() if rate is None else rate
+    return math.log(count) + rate * (when - SCORE_EPOCH).total_seconds()
+
+
+def log_add(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def recent_downloads(score, now=None):
+    """A trending score as a number of downloads, each counted at its decayed weight as of ``now``"""
+    if score is None:
+        return 0.0
+    now = now or timezone.now()
+    return math.exp(score - decay_rate() * (now - SCORE_EPOCH).total_seconds())
+
+
+def sync_score_rows(batch_size=1000):
+    """Create score rows for new resources and copy subject/course changes onto existing ones"""
+    missing = Resource.objects.filter(score__isnull=True).values_list('id', 'subject', 'course_code')
+    created = 0
+    batch = []
+    for resource_id, subject, course_code in missing.iterator(chunk_size=batch_size):
+        batch.append(ResourceScore(resource_id=resource_id, subject=subject, course_code=course_code))
+        if len(batch) >= batch_size:
+            created += len(ResourceScore.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    if batch:
+        created += len(ResourceScore.objects.bulk_create(batch, ignore_conflicts=True))
+    
+    resource = Resource.objects.filter(pk=OuterRef('resource_id'))
+    ResourceScore.objects.filter(
+        ~Q(subject=F('resource__subject')) | ~Q(course_code=F('resource__course_code'))
+    ).update(
+        subject=Subquery(resource.values('subject')[:1]),
+        course_code=Subquery(resource.values('course_code')[:1]),
+    )
+    return created
+
+
+def fold_download_tallies(now, batch_size=1000):
+    """Add the tallies not folded yet to the trending scores; returns the number of tallies read"""
+    rate = decay_rate()
+    with transaction.atomic():
+        # Held until commit, so concurrent refreshes never fold a tally twice
+        watermark, _ = ScoreWatermark.objects.select_for_update().get_or_create(name=DOWNLOADS_WATERMARK)
+        gains = {}
+        folded = []
+        tallies = (DownloadTally.objects.filter(folded=False).order_by('id')
+                   .values_list('id', 'resource_id', 'count', 'recorded_at'))
+        for tally_id, resource_id, count, recorded_at in tallies.iterator(chunk_size=batch_size):
+            gains[resource_id] = log_add(gains.get(resource_id), log_weight(count, recorded_at, rate))
+            folded.append(tally_id)
+        # Marked by id, not by position: a flush that commits a lower id late is folded by the next run
+        for start in range(0, len(folded), batch_size):
+            DownloadTally.objects.filter(id__in=folded[start:start + batch_size]).update(folded=True)
+        
+        resource_ids = sorted(gains)
+        for start in range(0, len(resource_ids), batch_size):
+            batch = resource_ids[start:start + batch_size]
+            scores = list(ResourceScore.objects.filter(resource_id__in=batch))
+            for score in scores:
+                score.trending_score = log_add(score.trending_score, gains[score.resource_id])
+            ResourceScore.objects.bulk_update(scores, ['trending_score'])
+            # Resources created after sync_score_rows ran (deleted ones simply drop out)
+            scored = {score.resource_id for score in scores}
+            ResourceScore.objects.bulk_create([
+                ResourceScore(resource_id=resource_id, subject=subject, course_code=course_code,
+                              trending_score=gains[resource_id])
+                for resource_id, subject, course_code in Resource.objects.filter(
+                    id__in=[resource_id for resource_id in batch if resource_id not in scored]
+                ).values_list('id', 'subject', 'course_code')
+            ])
+        
+        watermark.refreshed_at = now
+        watermark.save()
+    return len(folded)
+
+
+def update_rating_scores():
+    """Recompute every Bayesian rating score in one UPDATE against the current site-wide mean"""
+    totals = Resource.objects.aggregate(count=Sum('rating_count'), total=Sum('rating_sum'))
+    mean = totals['total'] / totals['count'] if totals['count'] else 3.0
+    prior = float(getattr(settings, 'RATING_PRIOR_WEIGHT', 5))
+    
+    resource = Resource.objects.filter(pk=OuterRef('resource_id'))
+    rating_sum = Cast(Subquery(resource.values('rating_sum')[:1]), FloatField())
+    rating_count = Subquery(resource.values('rating_count')[:1])
+    return ResourceScore.objects.update(
+        rating_count=rating_count,
+        rating_score=ExpressionWrapper(
+            (Value(prior * mean) + rating_sum) / (Value(prior) + Cast(rating_count, FloatField())),
+            output_field=FloatField(),
+        ),
+    )
+
+
+def prune_tallies(now):
+    """Drop folded tallies older than TRENDING_TALLY_RETENTION_DAYS (kept that long for --rebuild)"""
+    retention = timedelta(days=getattr(settings, 'TRENDING_TALLY_RETENTION_DAYS', 30))
+    deleted, _ = DownloadTally.objects.filter(folded=True, recorded_at__lt=now - retention).delete()
+    return deleted
+
+
+def reset_trending():
+    """Forget all trending scores so the next refresh rebuilds them from the retained tallies"""
+    with transaction.atomic():
+        ResourceScore.objects.update(trending_score=None)
+        DownloadTally.objects.filter(folded=True).update(folded=False)
+
+
+def refresh_scores(now=None, batch_size=1000):
+    now = now or timezone.now()
+    summary = {
+        'created': sync_score_rows(batch_size),
+        'tallies': fold_download_tallies(now, batch_size),
+        'rated': update_rating_scores(),
+        'pruned': prune_tallies(now),
+    }
+    cache.bump(cache.RANKINGS)
+    return summary
@@ -0,0 +1,217 @@
+"""Full-text search and autocomplete over resources.
+
+On PostgreSQL every resource carries a weighted ``search_vector`` that is
+kept current by signals and matched through a GIN index. Other databases
+fall back to the plain ``icontains`` filters.
+
+Suggestions are prefix matches on upper-cased, "C"-collated expression
+indexes so the top few rows come straight off an index scan, topped up
+with trigram matches when pg_trgm is installed.
+
+Facet counts for a result set are computed together: one grouped count per
+facet, glued into a single ``UNION ALL`` query.
+"""
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import CharField, Count, F, FloatField, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce, Collate, Upper
+from .models import Resource, ResourceContent, Tag
+from .utils import LRUCache
+
+SEARCH_CONFIG = 'english'
+# Keyset ordering for ranked results; see api.pagination.KeysetPagination
+RANKED_ORDERING = ('-rank', '-upload_date', 'id')
+# Facet name -> field counted, in the order facets are listed
+FACETS = {
+    'subject': 'subject',
+    'topic': 'topic',
+    'course_code': 'course_code',
+    'tags': 'tags__name',
+}
+
+suggestion_cache = LRUCache(
+    maxsize=getattr(settings, 'SEARCH_SUGGEST_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'SEARCH_SUGGEST_CACHE_TTL', 60),
+)
+_trigram_available = {}
+
+
+def full_text_enabled():
+    return connection.vendor == 'postgresql'
+
+
+def _tag_names():
+    return Coalesce(
+        Subquery(
+            Tag.objects.filter(resource=OuterRef('pk'))
+            .order_by()
+            .values('resource')
+            .annotate(names=StringAgg('name', ' '))
+            .values('names'),
+            output_field=TextField(),
+        ),
+        Value(''),
+        output_field=TextField(),
+    )
+
+
+def _content_text():
+    return Coalesce(
+        Subquery(ResourceContent.objects.filter(resource=OuterRef('pk')).values('text')[:1], output_field=TextField()),
+        Value(''),
+        output_field=TextField(),
+    )
+
+
+def search_vector_expression():
+    """Title ranks above tags and course code, then subject/topic, then description and file contents"""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('course_code', _tag_names(), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('subject', 'topic', weight='C', config=SEARCH_CONFIG)
+        + SearchVector('description', _content_text(), weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(resource_ids=None):
+    """Recompute stored search vectors in a single UPDATE; all resources when ``resource_ids`` is None"""
+    if not full_text_enabled():
+        return 0
+    resources = Resource.objects.all()
+    if resource_ids is not None:
+        resources = resources.filter(pk__in=list(resource_ids))
+    return resources.update(search_vector=search_vector_expression())
+
+
+def is_ranked(queryset):
+    return 'rank' in queryset.query.annotations
+
+
+def filter_by_query(queryset, query):
+    """Restrict ``queryset`` to resources matching ``query``, best matches first"""
+    if full_text_enabled():
+        search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+        # ts_rank is a float4; casting to double keeps the value exact across a cursor round trip
+        return (
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=Cast(SearchRank(F('search_vector'), search_query), FloatField()))
+            .order_by(*RANKED_ORDERING)
+        )
+    return queryset.filter(
+        Q(title__icontains=query) |
+        Q(description__icontains=query) |
+        Q(subject__icontains=query) |
+        Q(topic__icontains=query) |
+        Q(content__text__icontains=query)
+    )
+
+
+def _facet_rows(queryset, names, limit):
+    queryset = queryset.order_by()
+    branches = []
+    for name in names:
+        branch = (
+            queryset.values(facet=Value(name, output_field=CharField()), value=F(FACETS[name]))
+            .filter(value__isnull=False)
+            .annotate(count=Count('pk'))
+            .values_list('facet', 'value', 'count')
+        )
+        if connection.features.supports_slicing_ordering_in_compound:
+            # Let the database cut each facet to its top values; elsewhere that happens in _group_facets
+            branch = branch.order_by('-count', 'value')[:limit]
+        branches.append(branch)
+    return branches[0].union(*branches[1:], all=True) if len(branches) > 1 else branches[0]
+
+
+def _group_facets(rows, names, limit):
+    facets = {name: [] for name in names}
+    for name, value, count in sorted(rows, key=lambda row: (-row[2], row[1])):
+        if len(facets[name]) < limit:
+            facets[name].append({'value': value, 'count': count})
+    return facets
+
+
+def facet_counts(queryset, names, limit=10):
+    """
+    Most common values of each named facet among the rows of ``queryset``,
+    as ``{name: [{'value': ..., 'count': ...}]}`` with at most ``limit``
+    values per facet, most frequent first. All facets come from one query.
+    """
+    if not names:
+        return {}
+    return _group_facets(_facet_rows(queryset, names, limit), names, limit)
+
+
+async def afacet_counts(queryset, names, limit=10):
+    """``facet_counts`` through the async ORM"""
+    if not names:
+        return {}
+    return _group_facets([row async for row in _facet_rows(queryset, names, limit)], names, limit)
+
+
+def trigram_enabled():
+    """Whether pg_trgm is installed in the current database (checked once per process)"""
+    if not full_text_enabled():
+        return False
+    alias = connection.alias
+    if alias not in _trigram_available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available[alias] = cursor.fetchone() is not None
+    return _trigram_available[alias]
+
+
+def _prefix_key(field):
+    # Must match the expression indexes created in migration 0006
+    if full_text_enabled():
+        return Collate(Upper(field), 'C')
+    return Upper(field)
+
+
+def _prefix_matches(queryset, field, prefix, limit, distinct=False):
+    matches = queryset.annotate(key=_prefix_key(field)).filter(key__startswith=prefix.upper()).order_by('key')
+    if distinct:
+        # Many resources share a course code; collapse them on the indexed key itself
+        return list(matches.values_list('key', flat=True).distinct()[:limit])
+    return list(matches.values_list(field, flat=True)[:limit])
+
+
+def _fuzzy_title_matches(prefix, limit):
+    return list(
+        Resource.objects.filter(title__trigram_word_similar=prefix)
+        .annotate(similarity=TrigramWordSimilarity(prefix, 'title'))
+        .order_by('-similarity')
+        .values_list('title', flat=True)[:limit]
+    )
+
+
+def suggest(prefix, limit=8):
+    """Top ``limit`` completions for ``prefix`` across course codes, tag names and titles"""
+    prefix = ' '.join(prefix.split())
+    if not prefix:
+        return []
+    key = (prefix.lower(), limit)
+    cached = suggestion_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    candidates = [('course_code', code) for code in
+                  _prefix_matches(Resource.objects.all(), 'course_code', prefix, limit, distinct=True)]
+    candidates += [('tag', name) for name in _prefix_matches(Tag.objects.all(), 'name', prefix, limit)]
+    candidates += [('title', title) for title in _prefix_matches(Resource.objects.all(), 'title', prefix, limit)]
+    if len(candidates) < limit and len(prefix) >= 3 and trigram_enabled():
+        candidates += [('title', title) for title in _fuzzy_title_matches(prefix, limit)]
+    
+    suggestions = []
+    seen = set()
+    for kind, text in candidates:
+        if text.lower() in seen:
+            continue
+        seen.add(text.lower())
+        suggestions.append({'text': text, 'type': kind})
+        if len(suggestions) == limit:
+            break
+    suggestion_cache.set(key, suggestions)
+    return suggestions
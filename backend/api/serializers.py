@@ -1,6 +1,14 @@
+import json
+from collections.abc import Mapping
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from .models import User, Resource, Tag, Rating, Comment
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.urls import reverse
+from .fieldplans import FastListSerializer
+from .models import User, Resource, Tag, Rating, Comment, UploadSession
+from .previews import preview_version
+from .validators import check_file_extension, check_file_size
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -48,48 +56,94 @@ class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ['id', 'name']
+    
+    def to_internal_value(self, data):
+        # Anything but a mapping is left for DRF to reject with its usual 400
+        if isinstance(data, Mapping) and isinstance(data.get('name'), str):
+            data = data.copy()
+            data['name'] = Tag.normalize_name(data['name'])
+        return super().to_internal_value(data)
 
 class ResourceSerializer(serializers.ModelSerializer):
     uploader = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
-    tag_names = serializers.ListField(child=serializers.CharField(), write_only=True, required=False)
+    tag_names = serializers.ListField(child=serializers.CharField(allow_blank=True), write_only=True, required=False)
     average_rating = serializers.ReadOnlyField()
     download_count = serializers.ReadOnlyField()
     file_size = serializers.SerializerMethodField()
     file_type = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Resource
-        fields = ['id', 'title', 'description', 'file', 'uploader', 'subject', 
-                 'topic', 'course_code', 'tags', 'tag_names', 'upload_date', 
-                 'average_rating', 'download_count', 'file_size', 'file_type']
+        list_serializer_class = FastListSerializer
+        fields = ['id', 'title', 'description', 'file', 'original_filename', 'uploader', 'subject', 
+                  'topic', 'course_code', 'tags', 'tag_names', 'upload_date', 
+                  'average_rating', 'download_count', 'file_size', 'file_type', 'mime_type',
+                  'thumbnail_url', 'preview_url']
     
     def get_file_size(self, obj):
-        if obj.file:
-            return obj.file.size
-        return 0
+        return obj.file_size
     
     def get_file_type(self, obj):
-        if obj.file:
-            import os
-            return os.path.splitext(obj.file.name)[1].lower()
-        return ''
+        return obj.file_extension
+    
+    def get_thumbnail_url(self, obj):
+        return self.rendition_url(obj, 'thumbnail')
+    
+    def get_preview_url(self, obj):
+        return self.rendition_url(obj, 'preview')
+    
+    def rendition_url(self, obj, rendition):
+        # Versioned by content, so the endpoint can let browsers cache it for good
+        name = obj.previews.get(rendition)
+        if not name:
+            return None
+        url = reverse(f'resource-{rendition}', args=[obj.id]) + f'?v={preview_version(name)}'
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+    
+    def validate_tag_names(self, value):
+        names = []
+        for item in value:
+            # The upload form sends the whole list JSON-encoded in a single field
+            if item.lstrip().startswith('['):
+                try:
+                    decoded = json.loads(item)
+                except ValueError:
+                    decoded = None
+                if isinstance(decoded, list):
+                    names.extend(str(name) for name in decoded)
+                    continue
+            names.append(item)
+        names = [Tag.normalize_name(name) for name in names]
+        if any(len(name) > 50 for name in names):
+            raise serializers.ValidationError('Tag names can be at most 50 characters.')
+        return list(dict.fromkeys(name for name in names if name))
     
     def create(self, validated_data):
         tag_names = validated_data.pop('tag_names', [])
-        resource = Resource.objects.create(**validated_data)
-        
-        for tag_name in tag_names:
-            tag, created = Tag.objects.get_or_create(name=tag_name.strip())
-            resource.tags.add(tag)
-        
+        with transaction.atomic():
+            resource = Resource.objects.create(**validated_data)
+            if tag_names:
+                resource.tags.add(*Tag.resolve(tag_names))
         return resource
+    
+    def update(self, instance, validated_data):
+        tag_names = validated_data.pop('tag_names', None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if tag_names is not None:
+                instance.tags.set(Tag.resolve(tag_names))
+        return instance
 
 class RatingSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
     class Meta:
         model = Rating
+        list_serializer_class = FastListSerializer
         fields = ['id', 'resource', 'user', 'rating_value']
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -97,5 +151,38 @@ class CommentSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Comment
+        list_serializer_class = FastListSerializer
         fields = ['id', 'resource', 'user', 'content', 'created_at']
-        read_only_fields = ['resource', 'user', 'created_at']
\ No newline at end of file
+        read_only_fields = ['resource', 'user', 'created_at']
+
+class UploadSessionCreateSerializer(ResourceSerializer):
+    """Resource metadata plus the declared file name and size, validated before any bytes arrive"""
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    
+    class Meta(ResourceSerializer.Meta):
+        fields = ['title', 'description', 'subject', 'topic', 'course_code', 'tag_names', 'filename', 'size']
+    
+    def validate_filename(self, value):
+        try:
+            check_file_extension(value)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+        return value
+    
+    def validate_size(self, value):
+        try:
+            check_file_size(value)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+        return value
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    chunk_count = serializers.ReadOnlyField()
+    missing_chunks = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'total_size', 'chunk_size', 'chunk_count', 'received_chunks',
+                  'missing_chunks', 'status', 'resource', 'created_at', 'updated_at']
+        read_only_fields = fields
\ No newline at end of file
@@ -0,0 +1,165 @@
+import os
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from . import authentication, cache
+from .models import User, Resource, ResourceContent, Tag, Rating, Comment, StoredBlob
+from .jobs import enqueue_file_jobs
+from .metrics import install_query_timer
+from .search import update_search_vectors
+
+
+@receiver(pre_save, sender=Rating)
+def remember_previous_rating(sender, instance, **kwargs):
+    """Keep the stored value so post_save can apply only the difference"""
+    instance._previous_rating_value = None
+    if instance.pk:
+        instance._previous_rating_value = (
+            Rating.objects.filter(pk=instance.pk).values_list('rating_value', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Rating)
+def add_rating_to_aggregates(sender, instance, created, **kwargs):
+    value = int(instance.rating_value)
+    previous = getattr(instance, '_previous_rating_value', None)
+    if created or previous is None:
+        Rating.apply_to_resource(instance.resource_id, 1, value)
+    elif value != previous:
+        Rating.apply_to_resource(instance.resource_id, 0, value - previous)
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_aggregates(sender, instance, **kwargs):
+    Rating.apply_to_resource(instance.resource_id, -1, -int(instance.rating_value))
+
+
+@receiver(post_save, sender=Resource)
+def index_resource(sender, instance, **kwargs):
+    update_search_vectors([instance.pk])
+
+
+@receiver(m2m_changed, sender=Resource.tags.through)
+def index_retagged_resources(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # ``instance`` is a Tag; remember its resources before a clear drops them
+        if action == 'pre_clear':
+            instance._cleared_resource_ids = list(instance.resource_set.values_list('pk', flat=True))
+        elif action == 'post_clear':
+            update_search_vectors(getattr(instance, '_cleared_resource_ids', []))
+        elif action in ('post_add', 'post_remove'):
+            update_search_vectors(pk_set)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        update_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+def index_renamed_tag(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vectors(instance.resource_set.values_list('pk', flat=True))
+
+
+@receiver(pre_save, sender=Resource)
+def remember_previous_file(sender, instance, update_fields=None, **kwargs):
+    """Record the stored file name so post_save can move the blob reference; describe new uploads"""
+    instance._previous_file_name = None
+    instance._file_held = False
+    if update_fields is not None and 'file' not in update_fields:
+        instance._previous_file_name = instance.file.name
+        return
+    if instance.pk:
+        instance._previous_file_name = (
+            Resource.objects.filter(pk=instance.pk).values_list('file', flat=True).first()
+        )
+    # Saving a new upload counts its reference (see api.storage)
+    instance._file_held = bool(instance.file) and not instance.file._committed
+    if instance._file_held:
+        instance.original_filename = os.path.basename(instance.file.name)[:255]
+        instance.capture_file_metadata()
+        instance.previews = {}
+
+
+@receiver(post_save, sender=Resource)
+def count_file_reference(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_file_name', None)
+    held = getattr(instance, '_file_held', False)
+    if instance.file.name and instance.file.name != previous and not held:
+        StoredBlob.acquire(instance.file.name)
+    # Re-uploading the same bytes counted a second reference to the same blob
+    if previous and (instance.file.name != previous or held):
+        StoredBlob.release(previous)
+
+
+@receiver(post_delete, sender=Resource)
+def release_file_reference(sender, instance, **kwargs):
+    if instance.file.name:
+        StoredBlob.release(instance.file.name)
+
+
+@receiver(post_save, sender=Resource)
+def queue_file_jobs(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_file_name', None)
+    if instance.file.name == previous:
+        return
+    # The old file's text must not keep matching searches, whether or not the new one has any
+    if previous and ResourceContent.objects.filter(resource=instance).delete()[0]:
+        update_search_vectors([instance.pk])
+    if instance.file.name:
+        # After commit, so a worker can't claim the job before the new file is visible
+        transaction.on_commit(lambda: enqueue_file_jobs([instance]))
+
+
+def invalidate_on_commit(*scopes):
+    # After commit, so a request can't cache pre-write data under the new generation
+    transaction.on_commit(lambda: cache.bump(*scopes))
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def invalidate_resources(sender, **kwargs):
+    invalidate_on_commit(cache.RESOURCES)
+
+
+@receiver(m2m_changed, sender=Resource.tags.through)
+def invalidate_retagged_resources(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_on_commit(cache.RESOURCES)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    invalidate_on_commit(cache.TAGS, cache.RESOURCES)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, **kwargs):
+    invalidate_on_commit(cache.COMMENTS)
+
+
+@receiver(post_save, sender=User)
+def invalidate_uploader_details(sender, created, update_fields=None, **kwargs):
+    # Users are embedded in resources and comments; logging in only touches last_login
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    invalidate_on_commit(cache.RESOURCES, cache.COMMENTS)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_authenticated_user(sender, instance, update_fields=None, **kwargs):
+    """Drop the user state cached by CachedJWTAuthentication, e.g. after deactivation"""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: authentication.invalidate(user_id))
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    """Count and time each connection's queries for the request metrics"""
+    install_query_timer(connection)
@@ -0,0 +1,146 @@
+"""Content-addressed storage for resource files.
+
+A file is stored once, under the SHA-256 of its bytes:
+``resources/ab/cd/abcd...<ext>``. Uploading bytes that are already stored
+returns the existing name instead of writing a second copy. Files are
+never removed by ``FieldFile.delete``; ``StoredBlob`` counts the resources
+that point at each blob and deletes it when the last one goes.
+
+Saving counts one reference to the blob for whoever stores the returned
+name. It is taken under the blob row's lock before an existing file is
+trusted, so a blob whose last resource is being deleted cannot be purged
+between the save and the new resource pointing at it.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+HASH_CHUNK_SIZE = 64 * 1024
+_BLOB_NAME = re.compile(r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(?:\.[^/]*)?$')
+
+
+def hash_from_name(name):
+    """SHA-256 hex digest encoded in a content-addressed name, or None for other names"""
+    match = _BLOB_NAME.search(name or '')
+    return match.group(1) if match else None
+
+
+def blob_name(prefix, digest, extension):
+    return os.path.join(prefix, digest[:2], digest[2:4], digest + extension).replace('\\', '/')
+
+
+def hash_path(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Names files by the SHA-256 of their content, so identical uploads share one file"""
+    
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save; never add suffixes to the upload name
+        return name
+    
+    def _save(self, name, content):
+        prefix = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk: hash it (unless the upload handler did) and move it into place
+            source = content.temporary_file_path()
+            digest = getattr(content, 'sha256', None) or hash_path(source)
+            return self._place(blob_name(prefix, digest, extension), source)
+        
+        # Hash while copying into a scratch file beside the store, then rename it into place
+        digest = hashlib.sha256()
+        fd, scratch = self._scratch_file()
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    fh.write(chunk)
+            return self._place(blob_name(prefix, digest.hexdigest(), extension), scratch)
+        finally:
+            if os.path.exists(scratch):
+                os.remove(scratch)
+    
+    def save_hashed(self, path, digest, prefix='resources'):
+        """Copy the file at ``path``, whose SHA-256 the caller already computed, into the store"""
+        name = blob_name(prefix, digest, os.path.splitext(path)[1].lower())
+        
+        def copy_into_place():
+            if self.exists(name):
+                return
+            fd, scratch = self._scratch_file()
+            os.close(fd)
+            try:
+                shutil.copyfile(path, scratch)
+                self._move_into_place(name, scratch)
+            finally:
+                if os.path.exists(scratch):
+                    os.remove(scratch)
+        
+        _hold(name, copy_into_place)
+        return name
+    
+    def _scratch_file(self):
+        incoming = os.path.join(self.location, '.incoming')
+        os.makedirs(incoming, exist_ok=True)
+        return tempfile.mkstemp(dir=incoming)
+    
+    def _place(self, name, source):
+        _hold(name, lambda: self._move_into_place(name, source))
+        return name
+    
+    def _move_into_place(self, name, source):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            return
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        try:
+            file_move_safe(source, full_path, allow_overwrite=False)
+        except FileExistsError:
+            # Same bytes stored concurrently by another request
+            return
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+
+
+def _hold(name, place):
+    # api.models imports this module
+    from .models import StoredBlob
+    StoredBlob.hold(name, place)
+
+
+resource_storage = ContentAddressedStorage()
+
+
+def get_resource_storage():
+    return resource_storage
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Computes SHA-256 as chunks arrive, so storage does not have to re-read large uploads"""
+    
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+    
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+    
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.sha256.hexdigest()
+        return uploaded
@@ -1,7 +1,78 @@
-from django.test import TestCase
+import csv
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from logging.handlers import BufferingHandler
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.http import Http404
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from django.utils import timezone
+from rest_framework import serializers as drf_serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
+from PIL import Image
+from . import metrics, utils
+from .cache import response_cache, stats as cache_stats
+from .counters import download_counter
+from .fieldplans import FastListSerializer, compile_plan
+from .jobs import claim, enqueue
+from .logs import DroppingQueueHandler, JSONFormatter, queue_handlers
+from .models import (
+    User, Resource, Tag, Rating, Comment, DownloadTally, ProcessingJob, ResourceContent, ResourceScore,
+    StoredBlob, UploadSession,
+)
+from .ranges import parse_range_header
+from .ranking import recent_downloads, refresh_scores
+from .serializers import CommentSerializer, RatingSerializer, ResourceSerializer
+from .search import suggestion_cache
+from .storage import blob_name, resource_storage
+from .views import adownload_resource, aserve_file, asearch_resources
+from studyshare.pooled_postgresql.pool import ConnectionPool, PoolTimeout
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                   DOWNLOAD_COUNT_FLUSH_INTERVAL=0)
+class MediaTestCase(APITestCase):
+    """Runs each test against a throwaway MEDIA_ROOT"""
+    
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        response_cache().clear()
+        cache_stats.reset()
+    
+    def create_user(self, email, **extra):
+        return User.objects.create_user(username=email, email=email, password='pass12345', **extra)
+    
+    def create_resource(self, uploader, title='Notes', filename='notes.txt', content=b'notes', **extra):
+        fields = {'description': 'Week 1', 'subject': 'Maths', 'topic': 'Algebra', 'course_code': 'MA101'}
+        fields.update(extra)
+        return Resource.objects.create(
+            title=title, uploader=uploader, file=SimpleUploadedFile(filename, content), **fields
+        )
 
 
 class APIHealthTest(APITestCase):
@@ -21,8 +92,1431 @@ class BasicModelTest(TestCase):
     def test_basic_functionality(self):
         """Test basic Django functionality"""
         self.assertTrue(True)  # Basic test to ensure test runner works
-        
+    
     def test_settings_import(self):
         """Test that Django settings can be imported"""
         from django.conf import settings
-        self.assertIsNotNone(settings.SECRET_KEY)
\ No newline at end of file
+        self.assertIsNotNone(settings.SECRET_KEY)
+
+class RatingAggregateTest(MediaTestCase):
+    """Stored rating aggregates on Resource"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('rater@example.com')
+        self.other = self.create_user('other@example.com')
+        self.resource = self.create_resource(self.user)
+        self.url = reverse('resource-ratings', args=[self.resource.id])
+    
+    def test_create_and_change_rating(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(self.url, {'rating_value': 4})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(self.url, {'rating_value': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(self.other)
+        self.client.post(self.url, {'rating_value': 5})
+        
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.rating_count, 2)
+        self.assertEqual(self.resource.rating_sum, 7)
+        self.assertEqual(self.resource.average_rating, 3.5)
+    
+    def test_delete_rating_updates_aggregates(self):
+        Rating.objects.create(resource=self.resource, user=self.user, rating_value=3)
+        rating = Rating.objects.create(resource=self.resource, user=self.other, rating_value=5)
+        rating.delete()
+        
+        self.resource.refresh_from_db()
+        self.assertEqual((self.resource.rating_count, self.resource.rating_sum), (1, 3))
+    
+    def test_invalid_rating_rejected(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(self.url, {'rating_value': 9})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_rebuild_command(self):
+        Rating.objects.create(resource=self.resource, user=self.user, rating_value=4)
+        Resource.objects.filter(id=self.resource.id).update(rating_count=0, rating_sum=0)
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        
+        self.resource.refresh_from_db()
+        self.assertEqual((self.resource.rating_count, self.resource.rating_sum), (1, 4))
+
+
+class QueryBudgetTest(MediaTestCase):
+    """List endpoints must cost a fixed number of queries whatever the page size"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('owner@example.com', name='Owner')
+        self.client.force_authenticate(self.user)
+    
+    def add_resources(self, count):
+        for i in range(count):
+            resource = self.create_resource(self.create_user(f'uploader{Resource.objects.count()}@example.com'),
+                                            title=f'Algebra notes {i}')
+            resource.tags.add(*[Tag.objects.get_or_create(name=name)[0] for name in ('maths', f'week{i}')])
+    
+    def add_comments(self, resource, count):
+        for i in range(count):
+            Comment.objects.create(resource=resource, user=self.create_user(f'commenter{Comment.objects.count()}@example.com'),
+                                   content=f'Comment {i}')
+    
+    def add_ratings(self, resource, count):
+        for i in range(count):
+            Rating.objects.create(resource=resource, user=self.create_user(f'rater{Rating.objects.count()}@example.com'),
+                                  rating_value=i % 5 + 1)
+    
+    def assertQueryBudget(self, url, budget, grow, sizes=(1, 5, 12)):
+        """Grow the data set through ``sizes`` and check every GET of ``url`` stays within ``budget``"""
+        counts = []
+        current = 0
+        for size in sizes:
+            with self.captureOnCommitCallbacks(execute=True):
+                grow(size - current)
+            current = size
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(queries), budget, f'{url} with {size} rows ran {len(queries)} queries')
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, f'{url} query count grows with rows: {counts}')
+    
+    def test_resource_list_budget(self):
+        self.assertQueryBudget(reverse('resource-list') + '?page_size=50', 2, self.add_resources)
+    
+    def test_search_budget(self):
+        self.assertQueryBudget(reverse('search-resources') + '?query=algebra', 2, self.add_resources)
+    
+    def test_comment_list_budget(self):
+        resource = self.create_resource(self.user)
+        self.assertQueryBudget(reverse('resource-comments', args=[resource.id]), 1,
+                               lambda n: self.add_comments(resource, n))
+    
+    def test_rating_list_budget(self):
+        resource = self.create_resource(self.user)
+        self.assertQueryBudget(reverse('resource-ratings', args=[resource.id]), 1,
+                               lambda n: self.add_ratings(resource, n))
+
+
+class SearchTest(MediaTestCase):
+    """Search endpoint on both the full-text and the icontains path"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('searcher@example.com')
+        self.in_title = self.create_resource(self.user, title='Linear algebra summary', description='Exam prep')
+        self.in_description = self.create_resource(self.user, title='Week 3', description='Covers algebra basics')
+        self.unrelated = self.create_resource(self.user, title='Organic chemistry', description='Lab notes',
+                                              subject='Chemistry', topic='Reactions', course_code='CH200')
+        self.url = reverse('search-resources')
+    
+    def result_ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+    
+    def test_query_matches_title_and_description(self):
+        ids = self.result_ids(query='algebra')
+        self.assertCountEqual(ids, [self.in_title.id, self.in_description.id])
+    
+    @skipUnless(connection.vendor == 'postgresql', 'full-text search needs PostgreSQL')
+    def test_title_match_ranks_first(self):
+        Resource.objects.filter(pk=self.in_title.pk).update(upload_date=self.in_description.upload_date - timedelta(days=1))
+        self.assertEqual(self.result_ids(query='algebra'), [self.in_title.id, self.in_description.id])
+    
+    @skipUnless(connection.vendor == 'postgresql', 'full-text search needs PostgreSQL')
+    def test_vector_includes_tags_and_course_code(self):
+        self.unrelated.tags.add(Tag.objects.create(name='stoichiometry'))
+        self.assertEqual(self.result_ids(query='stoichiometry'), [self.unrelated.id])
+        self.assertEqual(self.result_ids(query='CH200'), [self.unrelated.id])
+        
+        Tag.objects.filter(name='stoichiometry').update(name='titration')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.result_ids(query='titration'), [self.unrelated.id])
+    
+    def test_facet_counts_in_one_query(self):
+        self.in_title.tags.add(*Tag.resolve(['exam', 'linear']))
+        self.in_description.tags.add(*Tag.resolve(['exam']))
+        self.unrelated.tags.add(*Tag.resolve(['lab']))
+        params = {'query': 'algebra', 'facets': 'subject,course_code,tags', 'page_size': 1}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 3)  # the page, its tags, and one query for every facet
+        self.assertEqual(response.data['facets'], {
+            'subject': [{'value': 'Maths', 'count': 2}],
+            'course_code': [{'value': 'MA101', 'count': 2}],
+            'tags': [{'value': 'exam', 'count': 2}, {'value': 'linear', 'count': 1}],
+        })
+        
+        response = self.client.get(self.url, {'facets': 'subject,tags', 'facet_limit': 1})
+        self.assertEqual(response.data['facets'], {
+            'subject': [{'value': 'Maths', 'count': 2}],
+            'tags': [{'value': 'exam', 'count': 2}],
+        })
+        self.assertNotIn('facets', self.client.get(self.url).data)
+        self.assertEqual(self.client.get(self.url, {'facets': 'colour'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SuggestTest(MediaTestCase):
+    """Prefix autocomplete endpoint"""
+    
+    def setUp(self):
+        super().setUp()
+        suggestion_cache.clear()
+        self.user = self.create_user('suggest@example.com')
+        self.create_resource(self.user, title='Calculus cheat sheet', course_code='MA101')
+        self.create_resource(self.user, title='Calculus past paper', course_code='MA101')
+        resource = self.create_resource(self.user, title='Cells and tissues', course_code='BIO110')
+        resource.tags.add(Tag.objects.create(name='calc-notes'))
+        self.url = reverse('search-suggest')
+    
+    def suggestions(self, query, **params):
+        response = self.client.get(self.url, {'query': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(item['type'], item['text']) for item in response.data['suggestions']]
+    
+    def test_prefix_across_sources(self):
+        self.assertEqual(self.suggestions('cal'), [
+            ('tag', 'calc-notes'),
+            ('title', 'Calculus cheat sheet'),
+            ('title', 'Calculus past paper'),
+        ])
+        self.assertEqual(self.suggestions('ma1'), [('course_code', 'MA101')])
+        self.assertEqual(len(self.suggestions('c', limit=2)), 2)
+    
+    def test_hot_prefixes_are_cached(self):
+        self.suggestions('cal')
+        with CaptureQueriesContext(connection) as queries:
+            self.suggestions('CAL ')
+        self.assertEqual(len(queries), 0)
+
+
+class KeysetPaginationTest(MediaTestCase):
+    """Cursor pagination on the resource list and search"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('pager@example.com')
+        self.client.force_authenticate(self.user)
+        resources = [self.create_resource(self.user, title=f'Algebra set {i}') for i in range(7)]
+        # Give several rows the same timestamp so the id tiebreaker matters
+        Resource.objects.filter(pk__in=[r.pk for r in resources[2:5]]).update(upload_date=resources[2].upload_date)
+        self.expected = list(Resource.objects.order_by('-upload_date', 'id').values_list('id', flat=True))
+    
+    def walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        return seen
+    
+    def test_walks_every_row_once_in_order(self):
+        self.assertEqual(self.walk(reverse('resource-list') + '?page_size=3'), self.expected)
+    
+    def test_search_uses_cursor(self):
+        ids = self.walk(reverse('search-resources') + '?query=algebra&page_size=2')
+        self.assertCountEqual(ids, self.expected)
+        self.assertEqual(len(ids), len(set(ids)))
+    
+    def test_count_only_on_request(self):
+        response = self.client.get(reverse('resource-list'), {'count': 'exact', 'page_size': 2})
+        self.assertEqual(response.data['count'], 7)
+        self.assertFalse(response.data['count_is_estimate'])
+        self.assertNotIn('count=', response.data['next'])
+        response = self.client.get(reverse('resource-list'), {'count': 'estimate'})
+        self.assertIsInstance(response.data['count'], int)
+    
+    def test_invalid_cursor(self):
+        for cursor in ('not-base64!', 'WzFd', 'WyJ4IiwgInkiXQ'):
+            response = self.client.get(reverse('resource-list'), {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FileDeliveryTest(MediaTestCase):
+    """Download and preview responses for each delivery backend"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('files@example.com')
+        self.resource = self.create_resource(self.user, filename='slides.pdf', content=b'%PDF-1.4 slides')
+    
+    def test_direct_download_streams_file(self):
+        response = self.client.get(reverse('download-resource', args=[self.resource.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 slides')
+        self.assertEqual(response['Content-Length'], '15')
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 1)
+    
+    @override_settings(FILE_DELIVERY_BACKEND='x-accel-redirect', FILE_DELIVERY_INTERNAL_URL='/protected-media/')
+    def test_accel_redirect_hands_off_to_nginx(self):
+        response = self.client.get(reverse('download-resource', args=[self.resource.id]))
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.resource.file.name)
+        self.assertEqual(response.content, b'')
+        
+        response = self.client.get(reverse('serve-file', args=[self.resource.id]), HTTP_RANGE='bytes=0-3')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('X-Accel-Redirect', response)
+    
+    @override_settings(FILE_DELIVERY_BACKEND='x-sendfile')
+    def test_sendfile_header(self):
+        response = self.client.get(reverse('serve-file', args=[self.resource.id]))
+        self.assertEqual(response['X-Sendfile'], self.resource.file.path)
+
+
+class RangeParsingTest(SimpleTestCase):
+    """parse_range_header edge cases"""
+    
+    def test_ranges(self):
+        cases = [
+            ('bytes=0-99', [(0, 99)]),
+            ('bytes=90-500', [(90, 99)]),
+            ('bytes=-30', [(70, 99)]),
+            ('bytes=-500', [(0, 99)]),
+            ('bytes=95-', [(95, 99)]),
+            ('bytes=200-', []),
+            ('bytes=0-9, 5-19, 50-59', [(0, 19), (50, 59)]),
+            ('bytes=100-200', []),
+            ('bytes=-0', []),
+            ('bytes=9-3', None),
+            ('bytes=abc', None),
+            ('items=0-9', None),
+            ('bytes=' + ','.join(f'{i * 3}-{i * 3}' for i in range(20)), None),
+        ]
+        for header, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(parse_range_header(header, 100), expected)
+
+
+class ServeFileRangeTest(MediaTestCase):
+    """Range and conditional requests against serve_file"""
+    
+    def setUp(self):
+        super().setUp()
+        self.content = bytes(range(256)) * 4
+        resource = self.create_resource(self.create_user('video@example.com'), filename='clip.mp4', content=self.content)
+        self.url = reverse('serve-file', args=[resource.id])
+    
+    def get(self, **headers):
+        response = self.client.get(self.url, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+    
+    def test_full_response_has_validators(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+    
+    def test_single_and_suffix_ranges(self):
+        response, body = self.get(HTTP_RANGE='bytes=1000-5000')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+        self.assertEqual(body, self.content[1000:])
+        
+        response, body = self.get(HTTP_RANGE='bytes=-10')
+        self.assertEqual(body, self.content[-10:])
+        self.assertEqual(response['Content-Length'], '10')
+    
+    def test_multiple_ranges(self):
+        response, body = self.get(HTTP_RANGE='bytes=0-1, 10-12')
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges; boundary='))
+        self.assertEqual(int(response['Content-Length']), len(body))
+        boundary = response['Content-Type'].split('boundary=')[1]
+        parts = body.split(f'--{boundary}'.encode())
+        self.assertEqual(len(parts), 4)
+        self.assertIn(b'Content-Range: bytes 0-1/1024\r\n\r\n' + self.content[0:2], parts[1])
+        self.assertIn(b'Content-Range: bytes 10-12/1024\r\n\r\n' + self.content[10:13], parts[2])
+    
+    def test_unsatisfiable_range(self):
+        response, _ = self.get(HTTP_RANGE='bytes=2048-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+    
+    def test_conditional_requests(self):
+        first, _ = self.get()
+        response, body = self.get(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(body, b'')
+        self.assertEqual(response['ETag'], first['ETag'])
+        response, _ = self.get(HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+    
+    def test_if_range(self):
+        first, _ = self.get()
+        response, _ = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=first['ETag'])
+        self.assertEqual(response.status_code, 206)
+        response, body = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+
+
+class DownloadCounterTest(MediaTestCase):
+    """Buffered download counting"""
+    
+    def setUp(self):
+        super().setUp()
+        user = self.create_user('popular@example.com')
+        self.resource = self.create_resource(user)
+        self.other = self.create_resource(user, title='Other')
+        self.addCleanup(download_counter.stop)
+    
+    def download(self, resource):
+        response = self.client.get(reverse('download-resource', args=[resource.id]))
+        b''.join(response.streaming_content)
+    
+    @override_settings(DOWNLOAD_COUNT_FLUSH_INTERVAL=3600, DOWNLOAD_COUNT_MAX_BUFFER=100)
+    def test_downloads_are_buffered_until_flush(self):
+        for _ in range(3):
+            self.download(self.resource)
+        self.download(self.other)
+        self.assertEqual(download_counter.pending(self.resource.id), 3)
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 0)
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(download_counter.flush(), 4)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 2)
+        self.resource.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.resource.download_count, self.other.download_count), (3, 1))
+        self.assertEqual(download_counter.pending(), 0)
+    
+    @override_settings(DOWNLOAD_COUNT_FLUSH_INTERVAL=3600, DOWNLOAD_COUNT_MAX_BUFFER=2)
+    def test_full_buffer_flushes_early(self):
+        self.download(self.resource)
+        self.download(self.resource)
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 2)
+        self.assertEqual(download_counter.pending(), 0)
+    
+    @override_settings(DOWNLOAD_COUNT_FLUSH_INTERVAL=3600)
+    def test_flush_keeps_cached_lists(self):
+        self.client.force_authenticate(self.resource.uploader)
+        url = reverse('resource-list')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.download(self.resource)
+        self.assertEqual(download_counter.flush(), 1)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+
+@override_settings(CHUNKED_UPLOAD_CHUNK_SIZE=4)
+class ChunkedUploadTest(MediaTestCase):
+    """Resumable uploads through /api/uploads/"""
+    
+    content = b'0123456789'
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('uploader@example.com')
+        self.client.force_authenticate(self.user)
+    
+    def start(self, filename='notes.txt', size=None):
+        return self.client.post(reverse('upload-session-create'), {
+            'title': 'Chunked notes', 'description': 'Week 2', 'subject': 'Maths', 'topic': 'Algebra',
+            'course_code': 'MA101', 'tag_names': ['exam'], 'filename': filename,
+            'size': len(self.content) if size is None else size,
+        }, format='json')
+    
+    def put_chunk(self, session_id, index, data):
+        return self.client.put(reverse('upload-chunk', args=[session_id, index]), data,
+                               content_type='application/octet-stream')
+    
+    def test_out_of_order_chunks_resume_and_complete(self):
+        response = self.start()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        session_id = response.data['id']
+        self.assertEqual(response.data['chunk_count'], 3)
+        
+        self.assertEqual(self.put_chunk(session_id, 2, b'89').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.put_chunk(session_id, 0, b'0123').status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse('upload-session-detail', args=[session_id]))
+        self.assertEqual(response.data['missing_chunks'], [1])
+        
+        response = self.client.post(reverse('upload-complete', args=[session_id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['missing_chunks'], [1])
+        
+        self.put_chunk(session_id, 1, b'4567')
+        response = self.client.post(reverse('upload-complete', args=[session_id]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        resource = Resource.objects.get(id=response.data['id'])
+        self.assertEqual(resource.uploader, self.user)
+        self.assertEqual(list(resource.tags.values_list('name', flat=True)), ['exam'])
+        with resource.file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.content)
+        session = UploadSession.objects.get(id=session_id)
+        self.assertEqual((session.status, session.resource_id), ('complete', resource.id))
+        
+        # Completing again returns the same resource instead of creating another
+        response = self.client.post(reverse('upload-complete', args=[session_id]))
+        self.assertEqual((response.status_code, response.data['id']), (status.HTTP_200_OK, resource.id))
+        self.assertEqual(Resource.objects.count(), 1)
+    
+    def test_chunk_length_is_enforced(self):
+        session_id = self.start().data['id']
+        self.assertEqual(self.put_chunk(session_id, 0, b'01234').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.put_chunk(session_id, 2, b'8').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.put_chunk(session_id, 3, b'').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(UploadSession.objects.get(id=session_id).received_chunks, [])
+    
+    def test_file_is_validated_before_upload(self):
+        self.assertEqual(self.start(filename='virus.exe').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.start(size=51 * 1024 * 1024).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(UploadSession.objects.exists())
+    
+    def test_sessions_are_private(self):
+        session_id = self.start().data['id']
+        self.client.force_authenticate(self.create_user('someone@example.com'))
+        response = self.client.get(reverse('upload-session-detail', args=[session_id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.put_chunk(session_id, 0, b'0123').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ContentAddressedStorageTest(MediaTestCase):
+    """Deduplicated, reference-counted resource files"""
+    
+    content = b'%PDF-1.4 lecture 1'
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('dedupe@example.com')
+        self.digest = hashlib.sha256(self.content).hexdigest()
+    
+    def test_identical_uploads_share_one_blob(self):
+        first = self.create_resource(self.user, filename='Lecture 1.pdf', content=self.content)
+        second = self.create_resource(self.user, filename='lecture-1-copy.PDF', content=self.content)
+        self.assertEqual(first.file.name, f'resources/{self.digest[:2]}/{self.digest[2:4]}/{self.digest}.pdf')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual((first.original_filename, second.original_filename), ('Lecture 1.pdf', 'lecture-1-copy.PDF'))
+        self.assertEqual(StoredBlob.objects.get(sha256=self.digest).ref_count, 2)
+        
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('resource-detail', args=[first.id]))
+        self.assertTrue(os.path.exists(second.file.path))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('resource-detail', args=[second.id]))
+        self.assertFalse(os.path.exists(second.file.path))
+        self.assertFalse(StoredBlob.objects.exists())
+    
+    def test_saving_takes_the_reference_before_trusting_the_file(self):
+        first = self.create_resource(self.user, content=self.content)
+        # Same bytes stored for a new resource while the only resource using them is deleted
+        name = resource_storage.save('resources/again.txt', ContentFile(self.content))
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(resource_storage.exists(name))
+        self.assertEqual(StoredBlob.objects.get(sha256=self.digest).ref_count, 1)
+        
+        # Purged meanwhile: the file is put back
+        with self.captureOnCommitCallbacks(execute=True):
+            StoredBlob.release(name)
+        self.assertFalse(resource_storage.exists(name))
+        second = self.create_resource(self.user, content=self.content)
+        with second.file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.content)
+        
+        # Uploading the same bytes again to the same resource keeps one reference
+        second.file = SimpleUploadedFile('again.txt', self.content)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.save()
+        self.assertEqual(StoredBlob.objects.get(sha256=self.digest).ref_count, 1)
+    
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1)
+    def test_streamed_upload_is_hashed_on_arrival(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('resource-list'), {
+            'title': 'Lecture 1', 'description': 'Intro', 'subject': 'Maths', 'topic': 'Algebra',
+            'course_code': 'MA101', 'file': SimpleUploadedFile('Lecture 1.pdf', self.content),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        resource = Resource.objects.get(id=response.data['id'])
+        self.assertEqual(resource.content_hash, self.digest)
+        self.assertEqual(response.data['original_filename'], 'Lecture 1.pdf')
+        with resource.file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.content)
+    
+    def test_hash_is_the_etag_and_original_name_is_kept(self):
+        resource = self.create_resource(self.user, filename='Lecture 1.pdf', content=self.content)
+        response = self.client.get(reverse('serve-file', args=[resource.id]))
+        self.assertEqual(response['ETag'], f'"{self.digest}"')
+        response = self.client.get(reverse('download-resource', args=[resource.id]))
+        b''.join(response.streaming_content)
+        self.assertIn('Lecture 1.pdf', response['Content-Disposition'])
+    
+    def test_migrate_legacy_files(self):
+        resource = self.create_resource(self.user, content=self.content)
+        legacy_path = os.path.join(self.media_root, 'resources', 'legacy.pdf')
+        with open(legacy_path, 'wb') as fh:
+            fh.write(self.content)
+        Resource.objects.filter(id=resource.id).update(file='resources/legacy.pdf')
+        StoredBlob.objects.all().delete()
+        
+        call_command('migrate_resource_files', stdout=StringIO())
+        resource.refresh_from_db()
+        self.assertEqual(resource.content_hash, self.digest)
+        self.assertFalse(os.path.exists(legacy_path))
+        self.assertEqual(StoredBlob.objects.get(sha256=self.digest).ref_count, 1)
+
+
+class FileMetadataTest(MediaTestCase):
+    """Size, MIME type and extension stored on the row at upload"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('meta@example.com')
+        self.resource = self.create_resource(self.user, filename='Slides.PDF', content=b'x' * 300)
+    
+    def test_captured_at_upload_and_served_from_the_row(self):
+        self.assertEqual((self.resource.file_size, self.resource.mime_type, self.resource.file_extension),
+                         (300, 'application/pdf', '.pdf'))
+        # Listing must not touch storage: remove the file and the metadata is still reported
+        os.remove(self.resource.file.path)
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('resource-list'))
+        item = response.data['results'][0]
+        self.assertEqual((item['file_size'], item['file_type'], item['mime_type']), (300, '.pdf', 'application/pdf'))
+    
+    def test_backfill_command(self):
+        Resource.objects.update(file_size=0, mime_type='', file_extension='')
+        call_command('backfill_file_metadata', stdout=StringIO())
+        self.resource.refresh_from_db()
+        self.assertEqual((self.resource.file_size, self.resource.mime_type, self.resource.file_extension),
+                         (300, 'application/pdf', '.pdf'))
+
+
+class ResponseCacheTest(MediaTestCase):
+    """Generation-keyed response cache on the read endpoints"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('reader@example.com')
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.resource = self.create_resource(self.user, title='Algebra notes')
+    
+    def test_hit_after_miss_and_invalidated_by_writes(self):
+        url = reverse('resource-detail', args=[self.resource.id])
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual((second['X-Cache'], second.data), ('HIT', first.data))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('resource-ratings', args=[self.resource.id]), {'rating_value': 4})
+        response = self.client.get(url)
+        self.assertEqual((response['X-Cache'], response.data['average_rating']), ('MISS', 4))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.resource.tags.add(Tag.objects.create(name='exam'))
+        response = self.client.get(url)
+        self.assertEqual([tag['name'] for tag in response.data['tags']], ['exam'])
+    
+    def test_query_parameters_are_normalized(self):
+        url = reverse('resource-list')
+        self.assertEqual(self.client.get(url + '?subject=Maths&page_size=5')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url + '?page_size=5&topic=&subject=Maths')['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(url + '?page_size=6&subject=Maths')['X-Cache'], 'MISS')
+    
+    def test_permissions_run_before_the_cache(self):
+        url = reverse('resource-list')
+        self.client.get(url)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_stats_endpoint(self):
+        url = reverse('search-resources') + '?query=algebra'
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(self.client.get(reverse('cache-stats')).status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.client.force_authenticate(self.create_user('admin@example.com', is_staff=True))
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.data['views']['search_resources'], {'hits': 1, 'misses': 1})
+        self.assertEqual(response.data['hit_ratio'], 0.5)
+
+
+class TagAssignmentTest(MediaTestCase):
+    """Set-based, normalized tag assignment on create and update"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('tagger@example.com')
+        self.client.force_authenticate(self.user)
+        Tag.objects.create(name='maths')
+    
+    def upload(self, tag_names, content=b'notes'):
+        return self.client.post(reverse('resource-list'), {
+            'title': 'Notes', 'description': 'Week 1', 'subject': 'Maths', 'topic': 'Algebra',
+            'course_code': 'MA101', 'file': SimpleUploadedFile('notes.txt', content), 'tag_names': tag_names,
+        }, format='multipart')
+    
+    def tag_names(self, resource_id):
+        return sorted(Resource.objects.get(id=resource_id).tags.values_list('name', flat=True))
+    
+    def test_names_are_normalized_and_deduplicated(self):
+        response = self.upload([' Exam  Prep', 'exam prep', 'MATHS', ' '])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.tag_names(response.data['id']), ['exam prep', 'maths'])
+        self.assertEqual(Tag.objects.count(), 2)
+        
+        # The upload form posts the list JSON-encoded in one field
+        response = self.upload('["Exam Prep", "Revision"]')
+        self.assertEqual(self.tag_names(response.data['id']), ['exam prep', 'revision'])
+    
+    def test_tag_body_must_be_an_object(self):
+        for body in (['maths'], 'maths'):
+            response = self.client.post(reverse('tag-list'), body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('tag-list'), {'name': ' Past  Papers'}, format='json')
+        self.assertEqual(response.data['name'], 'past papers')
+    
+    def test_query_count_does_not_grow_with_tags(self):
+        counts = []
+        for count in (2, 10):
+            with CaptureQueriesContext(connection) as queries:
+                self.upload([f'topic {count} {i}' for i in range(count)] + ['maths'], content=b'notes %d' % count)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+    
+    def test_update_replaces_tags(self):
+        resource_id = self.upload(['maths', 'exam']).data['id']
+        url = reverse('resource-detail', args=[resource_id])
+        response = self.client.patch(url, {'tag_names': ['Revision', 'maths']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(tag['name'] for tag in response.data['tags']), ['maths', 'revision'])
+        self.client.patch(url, {'title': 'Renamed'}, format='json')
+        self.assertEqual(self.tag_names(resource_id), ['maths', 'revision'])
+        self.client.patch(url, {'tag_names': []}, format='json')
+        self.assertEqual(self.tag_names(resource_id), [])
+
+
+class ImportExportTest(MediaTestCase):
+    """export_resources / import_resources round trip"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('teacher@example.com')
+        self.resource = self.create_resource(self.user, title='Lecture 1', filename='Lecture 1.pdf', content=b'%PDF one')
+        self.resource.tags.add(*Tag.resolve(['exam', 'week 1']))
+        self.create_resource(self.user, title='Lecture 2', filename='lecture2.pdf', content=b'%PDF two')
+        self.backup = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.backup, ignore_errors=True)
+    
+    def export(self, manifest):
+        stderr = StringIO()
+        call_command('export_resources', output=manifest, files_dir=self.backup, stderr=stderr)
+        self.assertIn('rows/s', stderr.getvalue())
+    
+    def test_round_trip_jsonl(self):
+        manifest = os.path.join(self.backup, 'resources.jsonl')
+        self.export(manifest)
+        Resource.objects.all().delete()
+        
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_resources', manifest, workers=0, batch_size=1, stdout=stdout, stderr=stderr)
+        self.assertIn('Imported 2 resources (0 skipped)', stdout.getvalue())
+        imported = Resource.objects.get(title='Lecture 1')
+        self.assertEqual(imported.uploader, self.user)
+        self.assertEqual(imported.upload_date, self.resource.upload_date)
+        self.assertEqual((imported.original_filename, imported.file_size), ('Lecture 1.pdf', 8))
+        self.assertEqual(sorted(imported.tags.values_list('name', flat=True)), ['exam', 'week 1'])
+        self.assertEqual(StoredBlob.objects.get(sha256=imported.content_hash).ref_count, 1)
+        with imported.file.open('rb') as fh:
+            self.assertEqual(fh.read(), b'%PDF one')
+    
+    def test_csv_with_process_pool_skips_invalid_rows(self):
+        manifest = os.path.join(self.backup, 'resources.csv')
+        self.export(manifest)
+        with open(manifest, 'a', encoding='utf-8', newline='') as fh:
+            fh.write('9,Bad,,Maths,Algebra,MA101,,teacher@example.com,,0,../../etc/passwd,,,,\r\n')
+            fh.write('10,Nobody,,Maths,Algebra,MA101,,ghost@example.com,,0,' + self.resource.file.name + ',,,,\r\n')
+        
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_resources', manifest, workers=2, stdout=stdout, stderr=stderr)
+        self.assertIn('Imported 2 resources (2 skipped)', stdout.getvalue())
+        self.assertIn('outside', stderr.getvalue())
+        self.assertIn('unknown uploader', stderr.getvalue())
+        self.assertEqual(Resource.objects.count(), 4)
+        self.assertEqual(StoredBlob.objects.get(sha256=self.resource.content_hash).ref_count, 2)
+    
+    def test_invalid_tags_skip_only_their_row(self):
+        manifest = os.path.join(self.backup, 'resources.jsonl')
+        self.export(manifest)
+        with open(manifest, encoding='utf-8') as fh:
+            row = json.loads(fh.readline())
+        with open(manifest, 'a', encoding='utf-8') as fh:
+            for title, tags in (('Numeric tag', ['exam', 3]), ('Long tag', ['x' * 51]), ('Blank tag', ['  '])):
+                fh.write(json.dumps({**row, 'id': None, 'title': title, 'tags': tags}) + '\n')
+        
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_resources', manifest, workers=0, stdout=stdout, stderr=stderr)
+        self.assertIn('Imported 2 resources (3 skipped)', stdout.getvalue())
+        self.assertIn("tag 3 is not a string", stderr.getvalue())
+        self.assertIn('must be 1 to 50 characters long', stderr.getvalue())
+        self.assertFalse(Resource.objects.filter(title__endswith=' tag').exists())
+    
+    def test_failed_batch_leaves_no_files_behind(self):
+        manifest = os.path.join(self.backup, 'resources.jsonl')
+        self.export(manifest)
+        with open(os.path.join(self.backup, 'new.pdf'), 'wb') as fh:
+            fh.write(b'%PDF new')
+        with open(manifest, encoding='utf-8') as fh:
+            row = json.loads(fh.readline())
+        with open(manifest, 'a', encoding='utf-8') as fh:
+            fh.write(json.dumps({**row, 'id': None, 'title': 'New', 'file': 'new.pdf', 'sha256': ''}) + '\n')
+        
+        with mock.patch('api.management.commands.import_resources.update_search_vectors', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                call_command('import_resources', manifest, workers=0, stdout=StringIO(), stderr=StringIO())
+        digest = hashlib.sha256(b'%PDF new').hexdigest()
+        self.assertFalse(StoredBlob.objects.filter(sha256=digest).exists())
+        self.assertFalse(resource_storage.exists(blob_name('resources', digest, '.pdf')))
+        # Files the existing resources hold stay
+        self.assertEqual(Resource.objects.count(), 2)
+        self.assertEqual(StoredBlob.objects.get(sha256=self.resource.content_hash).ref_count, 1)
+        self.assertTrue(resource_storage.exists(self.resource.file.name))
+
+
+class ExportEndpointTest(MediaTestCase):
+    """Streamed catalogue export at /api/resources/export/"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('integrator@example.com')
+        self.client.force_authenticate(self.user)
+        for i in range(5):
+            resource = self.create_resource(self.user, title=f'Notes {i}', content=b'notes %d' % i,
+                                            subject='Maths' if i % 2 else 'Physics')
+            resource.tags.add(*Tag.resolve([f'week {i}']))
+    
+    def export(self, query=''):
+        response = self.client.get(reverse('resource-export') + query)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+    
+    def test_ndjson_with_filters(self):
+        with self.assertNumQueries(2):
+            response, body = self.export('?subject=Maths')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Notes 1', 'Notes 3'])
+        self.assertEqual(rows[0]['tags'], ['week 1'])
+        self.assertTrue(rows[0]['file'].startswith('http://testserver/media/resources/'))
+    
+    def test_csv(self):
+        response, body = self.export('?export_format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[4]['tags'], 'week 4')
+        self.assertEqual(self.client.get(reverse('resource-export') + '?export_format=xml').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+
+class FieldPlanParityTest(MediaTestCase):
+    """FastListSerializer must render exactly what the DRF serializers render"""
+    
+    def test_identical_json(self):
+        user = self.create_user('parity@example.com', name='Ada', university_name='Example')
+        resource = self.create_resource(user, title='Ünïcode notes', filename='notes.pdf')
+        resource.tags.add(*Tag.resolve(['exam', 'week 1']))
+        self.create_resource(self.create_user('other@example.com'), title='No tags', description='')
+        Rating.objects.create(resource=resource, user=user, rating_value=4)
+        Comment.objects.create(resource=resource, user=user, content='Thanks')
+        request = APIRequestFactory().get('/api/resources/')
+        
+        cases = [
+            (ResourceSerializer, Resource.objects.select_related('uploader').prefetch_related('tags')),
+            (RatingSerializer, Rating.objects.select_related('user')),
+            (CommentSerializer, Comment.objects.select_related('user')),
+        ]
+        for serializer_class, queryset in cases:
+            with self.subTest(serializer_class.__name__):
+                context = {'request': request}
+                fast = serializer_class(queryset, many=True, context=context)
+                self.assertIsInstance(fast, FastListSerializer)
+                baseline = drf_serializers.ListSerializer(queryset, child=serializer_class(), context=context)
+                self.assertEqual(JSONRenderer().render(fast.data), JSONRenderer().render(baseline.data))
+    
+    def test_file_without_url_renders_none(self):
+        class FileOnly(drf_serializers.Serializer):
+            file = drf_serializers.FileField()
+        
+        serializer = FileOnly(context={'request': APIRequestFactory().get('/')})
+        instance = SimpleNamespace(file=SimpleNamespace(name='no-url.pdf'))
+        self.assertEqual(compile_plan(serializer)(instance), serializer.to_representation(instance))
+        self.assertIsNone(compile_plan(serializer)(instance)['file'])
+    
+    def test_benchmark_command_checks_parity(self):
+        stdout = StringIO()
+        call_command('benchmark_serializers', rows=5, repeat=1, stdout=stdout)
+        self.assertEqual(stdout.getvalue().count('identical JSON'), 3)
+
+
+class RankingTest(MediaTestCase):
+    """Precomputed trending and top-rated scores"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('ranker@example.com')
+        self.now = timezone.now()
+    
+    def tally(self, resource, count, hours_ago):
+        DownloadTally.objects.create(resource=resource, count=count, recorded_at=self.now - timedelta(hours=hours_ago))
+    
+    def ids(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+    
+    @override_settings(TRENDING_HALF_LIFE_HOURS=24)
+    def test_recent_downloads_outrank_older_ones(self):
+        old = self.create_resource(self.user, title='Old favourite')
+        new = self.create_resource(self.user, title='New favourite', content=b'new')
+        quiet = self.create_resource(self.user, title='Never downloaded', content=b'quiet')
+        self.tally(old, 10, hours_ago=72)
+        self.tally(new, 3, hours_ago=1)
+        refresh_scores(now=self.now)
+        
+        self.assertEqual(self.ids('resource-trending'), [new.id, old.id])
+        score = ResourceScore.objects.get(resource=old)
+        self.assertAlmostEqual(recent_downloads(score.trending_score, self.now), 10 / 8)
+        self.assertNotIn(quiet.id, self.ids('resource-trending'))
+    
+    def test_refresh_is_incremental(self):
+        resource = self.create_resource(self.user)
+        self.tally(resource, 2, hours_ago=1)
+        self.assertEqual(refresh_scores(now=self.now)['tallies'], 1)
+        self.assertEqual(refresh_scores(now=self.now)['tallies'], 0)
+        self.tally(resource, 2, hours_ago=1)
+        refresh_scores(now=self.now)
+        score = ResourceScore.objects.get(resource=resource)
+        self.assertAlmostEqual(recent_downloads(score.trending_score, self.now),
+                               4 * 0.5 ** (1 / settings.TRENDING_HALF_LIFE_HOURS))
+        
+        # A rebuild from the retained tallies gives the same score
+        call_command('refresh_scores', rebuild=True, stdout=StringIO())
+        rebuilt = ResourceScore.objects.get(resource=resource)
+        self.assertAlmostEqual(rebuilt.trending_score, score.trending_score)
+    
+    def test_tallies_committed_late_or_stamped_ahead_are_folded(self):
+        resource = self.create_resource(self.user)
+        self.tally(resource, 1, hours_ago=1)
+        late_id = DownloadTally.objects.get().id
+        DownloadTally.objects.filter(id=late_id).delete()
+        # Recorded by a clock running ahead of this one
+        self.tally(resource, 2, hours_ago=-1)
+        self.assertEqual(refresh_scores(now=self.now)['tallies'], 1)
+        
+        # A flush that took the lower id commits after the refresh read past it
+        DownloadTally.objects.create(id=late_id, resource=resource, count=1, recorded_at=self.now)
+        self.assertEqual(refresh_scores(now=self.now)['tallies'], 1)
+        self.assertFalse(DownloadTally.objects.filter(folded=False).exists())
+        score = ResourceScore.objects.get(resource=resource)
+        self.assertAlmostEqual(recent_downloads(score.trending_score, self.now),
+                               1 + 2 * 2 ** (1 / settings.TRENDING_HALF_LIFE_HOURS))
+    
+    def test_counter_flush_writes_tallies(self):
+        resource = self.create_resource(self.user)
+        download_counter.write({resource.id: 3})
+        self.assertEqual(list(DownloadTally.objects.values_list('resource_id', 'count')), [(resource.id, 3)])
+    
+    def test_top_rated_uses_bayesian_average(self):
+        raters = [self.create_user(f'rater{i}@example.com') for i in range(10)]
+        single = self.create_resource(self.user, title='One perfect rating')
+        steady = self.create_resource(self.user, title='Many good ratings', content=b'steady')
+        poor = self.create_resource(self.user, title='Many poor ratings', content=b'poor')
+        Rating.objects.create(resource=single, user=raters[0], rating_value=5)
+        for i, rater in enumerate(raters):
+            Rating.objects.create(resource=steady, user=rater, rating_value=4 if i % 5 == 0 else 5)
+            Rating.objects.create(resource=poor, user=rater, rating_value=2)
+        refresh_scores(now=self.now)
+        
+        self.assertEqual(self.ids('resource-top'), [steady.id, single.id, poor.id])
+        self.assertEqual(self.ids('resource-top', min_ratings=2), [steady.id, poor.id])
+        self.assertEqual(self.ids('resource-top', limit=1), [steady.id])
+    
+    def test_rankings_filter_by_subject_and_course(self):
+        maths = self.create_resource(self.user)
+        physics = self.create_resource(self.user, subject='Physics', course_code='PH101', content=b'physics')
+        for resource in (maths, physics):
+            self.tally(resource, 1, hours_ago=1)
+        refresh_scores(now=self.now)
+        self.assertEqual(self.ids('resource-trending', subject='Physics'), [physics.id])
+        self.assertEqual(self.ids('resource-trending', course_code='MA101'), [maths.id])
+        
+        Resource.objects.filter(pk=maths.pk).update(subject='Physics')
+        refresh_scores(now=self.now)
+        self.assertEqual(set(self.ids('resource-trending', subject='Physics')), {maths.id, physics.id})
+
+
+class PreviewPipelineTest(MediaTestCase):
+    """Thumbnails and previews drawn by the process_jobs worker"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('previews@example.com')
+    
+    def image_bytes(self, size=(1600, 900), mode='RGB', fmt='PNG'):
+        buffer = BytesIO()
+        Image.new(mode, size, 'teal').save(buffer, fmt)
+        return buffer.getvalue()
+    
+    def upload(self, filename, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.create_resource(self.user, filename=filename, content=content)
+    
+    def process(self):
+        stdout = StringIO()
+        call_command('process_jobs', once=True, workers=0, stdout=stdout)
+        return stdout.getvalue()
+    
+    def test_upload_is_queued_and_rendered(self):
+        resource = self.upload('diagram.png', self.image_bytes())
+        self.assertEqual(list(ProcessingJob.objects.values_list('resource_id', 'status')), [(resource.id, 'pending')])
+        self.assertIn('Processed 1 jobs (0 without results)', self.process())
+        
+        resource.refresh_from_db()
+        self.assertEqual(set(resource.previews), {'thumbnail', 'preview'})
+        with Image.open(resource_storage.path(resource.previews['thumbnail'])) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('JPEG', (320, 180)))
+        with Image.open(resource_storage.path(resource.previews['preview'])) as preview:
+            self.assertEqual(preview.size, (1280, 720))
+        self.assertEqual(ProcessingJob.objects.get().status, 'done')
+    
+    def test_thumbnail_endpoint_is_cacheable(self):
+        resource = self.upload('photo.jpg', self.image_bytes(size=(200, 100), fmt='JPEG'))
+        url = reverse('resource-thumbnail', args=[resource.id])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.process()
+        
+        self.client.force_authenticate(self.user)
+        thumbnail_url = self.client.get(reverse('resource-detail', args=[resource.id])).data['thumbnail_url']
+        self.assertTrue(thumbnail_url.startswith('http://testserver' + url + '?v='))
+        response = self.client.get(thumbnail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            # Never scaled up
+            self.assertEqual(image.size, (200, 100))
+        
+        self.assertEqual(self.client.get(url)['Cache-Control'], 'public, max-age=300')
+        response = self.client.get(thumbnail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_unusable_files_are_not_retried(self):
+        self.upload('notes.txt', b'plain text')
+        self.assertFalse(ProcessingJob.objects.filter(kind=ProcessingJob.PREVIEWS).exists())
+        
+        broken = self.upload('broken.png', b'not really a png')
+        self.assertIn('(1 without results)', self.process())
+        job = ProcessingJob.objects.get(resource=broken)
+        self.assertEqual((job.status, job.attempts), ('failed', 1))
+        self.assertTrue(job.error)
+        self.assertEqual(claim(10), [])
+    
+    def test_missing_tools_fail_jobs_loudly(self):
+        path = os.environ['PATH']
+        os.environ['PATH'] = self.media_root
+        self.addCleanup(os.environ.__setitem__, 'PATH', path)
+        utils._missing_tools.difference_update({'pdftoppm', 'pdftotext'})
+        resource = self.upload('slides.pdf', b'%PDF-1.4 slides')
+        with self.assertLogs('api.utils', 'ERROR') as logs:
+            self.process()
+        for kind, tool in ((ProcessingJob.PREVIEWS, 'pdftoppm'), (ProcessingJob.TEXT, 'pdftotext')):
+            job = ProcessingJob.objects.get(resource=resource, kind=kind)
+            self.assertEqual((job.status, job.error), ('failed', f'{tool} is not installed'))
+            self.assertTrue(any(f'{tool} is not installed' in line for line in logs.output))
+    
+    def test_stale_running_jobs_are_claimed_again(self):
+        resource = self.upload('diagram.png', self.image_bytes())
+        [job] = claim(10)
+        self.assertEqual((job.resource_id, job.status, job.attempts), (resource.id, 'running', 1))
+        self.assertEqual(claim(10), [])
+        later = timezone.now() + timedelta(seconds=settings.PROCESSING_JOB_TIMEOUT + 1)
+        self.assertEqual([job.attempts for job in claim(10, now=later)], [2])
+    
+    def test_backfill_and_purge(self):
+        resource = self.create_resource(self.user, filename='legacy.png', content=self.image_bytes())
+        self.process()
+        self.assertFalse(ProcessingJob.objects.exists())
+        call_command('process_jobs', once=True, workers=0, enqueue_missing=True, stdout=StringIO())
+        resource.refresh_from_db()
+        paths = [resource_storage.path(name) for name in resource.previews.values()]
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+        
+        # Previews belong to the stored bytes and go with them
+        with self.captureOnCommitCallbacks(execute=True):
+            resource.delete()
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+
+class TextExtractionTest(MediaTestCase):
+    """Document contents extracted by the process_jobs worker and fed to search"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('extract@example.com')
+    
+    def upload(self, filename, content, **extra):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.create_resource(self.user, filename=filename, content=content, **extra)
+    
+    def process(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_jobs', once=True, workers=0, stdout=StringIO())
+    
+    def docx_bytes(self, *paragraphs):
+        body = ''.join(f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>' for text in paragraphs)
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('word/document.xml', '<w:document xmlns:w="http://schemas.openxmlformats.org/'
+                                                  f'wordprocessingml/2006/main"><w:body>{body}</w:body></w:document>')
+        return buffer.getvalue()
+    
+    def search_ids(self, query):
+        response = self.client.get(reverse('search-resources'), {'query': query})
+        return [item['id'] for item in response.data['results']]
+    
+    def test_contents_become_searchable(self):
+        notes = self.upload('notes.txt', 'Eigenvalues of a symmetric matrix are real.\x00'.encode())
+        essay = self.upload('essay.docx', self.docx_bytes('Photosynthesis in plants', 'Chlorophyll absorbs light'))
+        self.assertEqual(self.search_ids('eigenvalues'), [])
+        self.process()
+        
+        self.assertEqual(ResourceContent.objects.get(resource=notes).text, 'Eigenvalues of a symmetric matrix are real. ')
+        self.assertEqual(ResourceContent.objects.get(resource=essay).text,
+                         'Photosynthesis in plants\nChlorophyll absorbs light\n')
+        self.assertEqual(self.search_ids('eigenvalues'), [notes.id])
+        self.assertEqual(self.search_ids('chlorophyll'), [essay.id])
+        
+        # Listings never read the text
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('search-resources'))
+        self.assertFalse(any('api_resourcecontent' in query['sql'] for query in queries))
+    
+    def test_text_is_extracted_once_per_content(self):
+        content = b'Thermodynamics lecture'
+        first = self.upload('first.txt', content)
+        self.process()
+        extracted_at = ResourceContent.objects.get(resource=first).extracted_at
+        
+        # Same bytes again: this resource is skipped, a duplicate upload copies the stored text
+        enqueue(ProcessingJob.TEXT, [first.id])
+        second = self.upload('second.txt', content)
+        self.process()
+        self.assertEqual(ResourceContent.objects.get(resource=first).extracted_at, extracted_at)
+        self.assertEqual(ResourceContent.objects.get(resource=second).text, 'Thermodynamics lecture')
+        
+        # New bytes are extracted again
+        with self.captureOnCommitCallbacks(execute=True):
+            first.file = SimpleUploadedFile('first.txt', b'Entropy lecture')
+            first.save()
+        self.process()
+        self.assertEqual(ResourceContent.objects.get(resource=first).text, 'Entropy lecture')
+        self.assertEqual(self.search_ids('entropy'), [first.id])
+    
+    def test_replaced_file_drops_old_text(self):
+        resource = self.upload('notes.txt', b'Mitochondria are the powerhouse of the cell')
+        self.process()
+        self.assertEqual(self.search_ids('mitochondria'), [resource.id])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            resource.file = SimpleUploadedFile('diagram.png', b'not text at all')
+            resource.save()
+        self.process()
+        self.assertFalse(ResourceContent.objects.filter(resource=resource).exists())
+        self.assertEqual(self.search_ids('mitochondria'), [])
+    
+    def test_unreadable_documents_fail_without_retry(self):
+        broken = self.upload('broken.docx', b'not a zip archive')
+        self.process()
+        job = ProcessingJob.objects.get(resource=broken, kind=ProcessingJob.TEXT)
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('not a readable .docx file', job.error)
+        self.assertFalse(ResourceContent.objects.exists())
+
+
+class AsyncViewsTest(MediaTestCase):
+    """Async file and search views served under ASGI"""
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('async@example.com', name='Ada')
+        self.content = bytes(range(256)) * 1024
+        self.resource = self.create_resource(self.user, title='Linear algebra', filename='slides.pdf',
+                                             content=self.content)
+        self.create_resource(self.user, title='Organic chemistry', subject='Chemistry', content=b'chem')
+        self.factory = AsyncRequestFactory()
+        self.addCleanup(download_counter.stop)
+    
+    async def body(self, response):
+        return b''.join([chunk async for chunk in response.streaming_content])
+    
+    async def test_serve_file_streams_ranges(self):
+        response = await aserve_file(self.factory.get('/'), resource_id=self.resource.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(await self.body(response), self.content)
+        self.assertEqual(response['ETag'], f'"{self.resource.content_hash}"')
+        self.assertEqual(response['Access-Control-Allow-Origin'], '*')
+        
+        response = await aserve_file(self.factory.get('/', headers={'Range': 'bytes=100-199'}), resource_id=self.resource.id)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(await self.body(response), self.content[100:200])
+        
+        response = await aserve_file(self.factory.get('/', headers={'Range': 'bytes=0-1,-2'}), resource_id=self.resource.id)
+        self.assertEqual(response.status_code, 206)
+        body = await self.body(response)
+        self.assertIn(self.content[:2], body)
+        self.assertTrue(body.endswith(b'--\r\n'))
+        self.assertEqual(len(body), int(response['Content-Length']))
+        
+        response = await aserve_file(self.factory.get('/', headers={'If-None-Match': response['ETag']}),
+                                     resource_id=self.resource.id)
+        self.assertEqual(response.status_code, 304)
+        with self.assertRaises(Http404):
+            await aserve_file(self.factory.get('/'), resource_id=0)
+    
+    async def test_download_counts_and_streams(self):
+        response = await adownload_resource(self.factory.get('/'), resource_id=self.resource.id)
+        self.assertEqual(await self.body(response), self.content)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="slides.pdf"')
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        resource = await Resource.objects.aget(id=self.resource.id)
+        self.assertEqual(resource.download_count, 1)
+    
+    async def test_search_matches_sync_view(self):
+        for params in ({'query': 'algebra'}, {'subject': 'Chemistry', 'facets': 'subject,tags'},
+                       {'page_size': 1}, {'facets': 'colour'}):
+            with self.subTest(params=params):
+                response = await asearch_resources(self.factory.get('/api/search/', params))
+                await sync_to_async(response_cache().clear)()
+                expected = await sync_to_async(self.client.get)(reverse('search-resources'), params)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(json.loads(response.content), json.loads(expected.content))
+        
+        # Shares cache entries with the sync view
+        await sync_to_async(self.client.get)(reverse('search-resources'), {'query': 'algebra'})
+        response = await asearch_resources(self.factory.get('/api/search/', {'query': 'algebra'}))
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+
+class RequestMetricsTest(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+        self.user = self.create_user('metrics@example.com')
+        self.create_resource(self.user)
+        self.client.force_authenticate(self.user)
+    
+    def test_requests_are_measured_per_route(self):
+        with self.assertLogs('api.middleware', 'INFO') as captured:
+            response = self.client.get(reverse('resource-list'))
+        fields = captured.records[0].fields
+        self.assertEqual(fields['route'], 'resource-list')
+        self.assertEqual(fields['status'], 200)
+        self.assertEqual(fields['bytes'], len(response.content))
+        self.assertGreater(fields['db_queries'], 0)
+        
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('studyshare_http_requests_total{route="resource-list",method="GET",status="200"} 1', body)
+        self.assertIn(
+            'studyshare_http_request_duration_seconds_bucket{route="resource-list",method="GET",le="+Inf"} 1', body
+        )
+        self.assertIn(f'studyshare_http_response_bytes_total{{route="resource-list",method="GET"}} {len(response.content)}',
+                      body)
+        self.assertRegex(body, r'studyshare_db_queries_total\{route="resource-list",method="GET"\} [1-9]')
+    
+    def test_sampling_keeps_slow_requests(self):
+        with override_settings(API_LOG_SAMPLE_RATE=0), self.assertNoLogs('api.middleware', 'INFO'):
+            self.client.get(reverse('tag-list'))
+        with override_settings(API_LOG_SAMPLE_RATE=0, API_LOG_SLOW_MS=0), \
+                self.assertLogs('api.middleware', 'INFO') as captured:
+            self.client.get(reverse('tag-list'))
+        self.assertEqual(len(captured.records), 1)
+        # Unlogged requests are still counted
+        self.assertEqual(metrics.registry.snapshot()[('tag-list', 'GET')]['statuses'][200], 2)
+    
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+    
+    def test_log_records_are_written_in_the_background(self):
+        logger = logging.getLogger('api.tests.queued')
+        target = BufferingHandler(10)
+        logger.addHandler(target)
+        listener = queue_handlers(logger, maxsize=10)
+        self.assertNotIn(target, logger.handlers)
+        # No thread until there is something to write
+        self.assertIsNone(listener._thread)
+        
+        logger.warning('took %sms', 12, extra={'fields': {'status': 200}})
+        self.assertTrue(listener._thread.is_alive())
+        logger.handlers[0].queue.join()
+        entry = json.loads(JSONFormatter().format(target.buffer[0]))
+        self.assertEqual(entry['message'], 'took 12ms')
+        self.assertEqual(entry['status'], 200)
+        
+        full = DroppingQueueHandler(1)
+        full.handle(logging.makeLogRecord({'msg': 'one'}))
+        full.handle(logging.makeLogRecord({'msg': 'two'}))
+        self.assertEqual(full.dropped, 1)
+
+
+class BenchmarkSuiteTest(MediaTestCase):
+
+    def test_seed_benchmark_and_load(self):
+        call_command('seed_benchmark_data', users=4, resources=12, tags=5, files=2, file_size=1024, batch_size=5,
+                     stdout=StringIO())
+        self.assertEqual(Resource.objects.count(), 12)
+        for resource in Resource.objects.all():
+            ratings = Rating.objects.filter(resource=resource)
+            self.assertEqual(resource.rating_count, ratings.count())
+            self.assertEqual(resource.rating_sum, sum(rating.rating_value for rating in ratings))
+        with self.assertRaises(CommandError):
+            call_command('seed_benchmark_data', stdout=StringIO())
+        
+        output = os.path.join(self.media_root, 'benchmark.json')
+        call_command('benchmark', repeat=2, warmup=0, rows=5, only=['queryset.*', 'connection.*'], output=output,
+                     stdout=StringIO())
+        with open(output) as fh:
+            results = json.load(fh)['results']
+        self.assertNotIn('serialize.resources', results)
+        self.assertEqual(results['queryset.resource_page']['runs'], 2)
+        self.assertGreater(results['queryset.resource_page']['queries'], 0)
+        self.assertEqual(results['connection.persistent']['queries'], 1)
+        self.assertEqual('connection.pooled' in results, connection.vendor == 'postgresql')
+        
+        output = os.path.join(self.media_root, 'loadtest.json')
+        call_command('loadtest', endpoints=['resources', 'serve_file'], requests=4, warmup=0, concurrency=1,
+                     output=output, stdout=StringIO())
+        with open(output) as fh:
+            document = json.load(fh)
+        self.assertEqual(document['environment']['dataset']['resources'], 12)
+        for name in ('resources', 'serve_file'):
+            result = document['results'][name]
+            self.assertEqual((result['requests'], result['errors']), (4, 0))
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertIsNotNone(result['queries'])
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+    
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    def test_reuses_released_connections(self):
+        pool = ConnectionPool(size=1, max_overflow=1, timeout=0)
+        first = pool.acquire(FakeConnection)
+        second = pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        pool.release(first)
+        pool.release(second)
+        # Only ``size`` connections stay open; the overflow one is closed
+        self.assertTrue(second.closed)
+        self.assertIs(pool.acquire(FakeConnection), first)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+    
+    def test_replaces_broken_and_old_connections(self):
+        pool = ConnectionPool(size=2, max_overflow=0, check=lambda connection: connection is not broken)
+        broken = pool.acquire(FakeConnection)
+        pool.release(broken)
+        replacement = pool.acquire(FakeConnection)
+        self.assertIsNot(replacement, broken)
+        self.assertTrue(broken.closed)
+        pool.release(replacement, reusable=False)
+        self.assertEqual(pool.stats()['open'], 0)
+        
+        pool = ConnectionPool(size=1, max_age=0)
+        old = pool.acquire(FakeConnection)
+        pool.release(old)
+        self.assertIsNot(pool.acquire(FakeConnection), old)
+    
+    @skipUnless(connection.vendor == 'postgresql', 'the pooled backend needs PostgreSQL')
+    def test_pooled_backend_reuses_connections(self):
+        from django.db.utils import load_backend
+        settings_dict = dict(connection.settings_dict, ENGINE='studyshare.pooled_postgresql', CONN_MAX_AGE=0,
+                             POOL={'SIZE': 1, 'MAX_OVERFLOW': 0})
+        wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'pool-test')
+        connections['pool-test'] = wrapper
+        try:
+            wrapper.ensure_connection()
+            raw = wrapper.connection
+            with wrapper.cursor() as cursor:
+                cursor.execute('BEGIN; SELECT 1')
+            wrapper.close()
+            self.assertEqual(wrapper.pool.stats()['idle'], 1)
+            wrapper.ensure_connection()
+            self.assertIs(wrapper.connection, raw)
+            self.assertEqual(raw.info.transaction_status, 0)
+            # The default database isn't pooled; scraping metrics must not create a pool for it
+            self.assertNotIn('studyshare_db_pool', metrics.render())
+            self.assertIsNone(sys.modules['studyshare.pooled_postgresql.base'].get_pool('default'))
+        finally:
+            wrapper.close()
+            wrapper.pool.close()
+            del connections['pool-test']
+
+
+class AuthenticationCacheTest(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('cached@example.com')
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+    
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [query for query in queries if '"api_user"' in query['sql']]
+    
+    def test_authenticated_requests_reuse_the_user(self):
+        self.assertEqual(len(self.user_queries(reverse('tag-list'))), 1)
+        self.assertEqual(self.user_queries(reverse('tag-list')), [])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('user-profile'), {'name': 'Renamed'})
+        self.assertEqual(len(self.user_queries(reverse('tag-list'))), 1)
+        self.assertEqual(self.client.get(reverse('user-profile')).data['name'], 'Renamed')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            self.user.refresh_from_db()
+            self.user.save()
+        self.assertEqual(self.client.get(reverse('tag-list')).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_logout_blacklists_and_invalidates(self):
+        self.user_queries(reverse('tag-list'))
+        response = self.client.post(reverse('logout'), {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.user_queries(reverse('tag-list'))), 1)
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=self.refresh['jti']).exists())
@@ -0,0 +1,63 @@
+"""Disk side of chunked, resumable uploads.
+
+Each session owns one part file, pre-sized to the declared length. Chunks
+are streamed from the request into their offset, so neither a chunk nor
+the assembled file is ever held in memory, and the finished part file is
+moved (not copied) into storage.
+"""
+import os
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class AssembledUpload(File):
+    """A completed part file; storage backends move it into place via ``temporary_file_path``"""
+    
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def upload_dir():
+    return getattr(settings, 'CHUNKED_UPLOAD_DIR', None) or os.path.join(settings.MEDIA_ROOT, '.chunked')
+
+
+def part_path(session):
+    return os.path.join(upload_dir(), f'{session.id}.part')
+
+
+def create_part_file(session):
+    os.makedirs(upload_dir(), exist_ok=True)
+    with open(part_path(session), 'wb') as fh:
+        fh.truncate(session.total_size)
+
+
+def write_chunk(session, index, stream):
+    """Copy chunk ``index`` from ``stream`` into the part file, checking its length as it arrives"""
+    expected = session.chunk_length(index)
+    written = 0
+    with open(part_path(session), 'r+b') as fh:
+        fh.seek(index * session.chunk_size)
+        while True:
+            data = stream.read(min(COPY_BUFFER_SIZE, expected - written + 1))
+            if not data:
+                break
+            written += len(data)
+            if written > expected:
+                raise ValidationError(f'Chunk {index} is larger than the expected {expected} bytes.')
+            fh.write(data)
+    if written != expected:
+        raise ValidationError(f'Chunk {index} has {written} bytes, expected {expected}.')
+
+
+def open_assembled(session):
+    return AssembledUpload(open(part_path(session), 'rb'), name=session.filename)
+
+
+def discard_part_file(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
@@ -1,18 +1,43 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Under an ASGI server, file transfers and searches run as coroutines instead of holding worker threads
+if settings.ASYNC_VIEWS:
+    download_resource, serve_file, search_resources = (
+        views.adownload_resource, views.aserve_file, views.asearch_resources
+    )
+else:
+    download_resource, serve_file, search_resources = (
+        views.download_resource, views.serve_file, views.search_resources
+    )
+
 urlpatterns = [
     path('register/', views.register, name='register'),
     path('login/', views.login, name='login'),
     path('logout/', views.logout, name='logout'),
     path('users/', views.UserProfileView.as_view(), name='user-profile'),
     path('resources/', views.ResourceListCreateView.as_view(), name='resource-list'),
+    path('resources/export/', views.ResourceExportView.as_view(), name='resource-export'),
+    path('resources/trending/', views.trending_resources, name='resource-trending'),
+    path('resources/top/', views.top_resources, name='resource-top'),
     path('resources/<int:pk>/', views.ResourceDetailView.as_view(), name='resource-detail'),
     path('resources/<int:resource_id>/ratings/', views.RatingListCreateView.as_view(), name='resource-ratings'),
     path('resources/<int:resource_id>/comments/', views.CommentListCreateView.as_view(), name='resource-comments'),
     path('comments/<int:pk>/', views.CommentDetailView.as_view(), name='comment-detail'),
-    path('resources/<int:resource_id>/download/', views.download_resource, name='download-resource'),
-    path('resources/<int:resource_id>/serve/', views.serve_file, name='serve-file'),
+    path('resources/<int:resource_id>/download/', download_resource, name='download-resource'),
+    path('resources/<int:resource_id>/serve/', serve_file, name='serve-file'),
+    path('resources/<int:resource_id>/thumbnail/', views.resource_preview, {'rendition': 'thumbnail'},
+         name='resource-thumbnail'),
+    path('resources/<int:resource_id>/preview/', views.resource_preview, {'rendition': 'preview'},
+         name='resource-preview'),
+    path('uploads/', views.create_upload_session, name='upload-session-create'),
+    path('uploads/<uuid:session_id>/', views.upload_session_detail, name='upload-session-detail'),
+    path('uploads/<uuid:session_id>/chunks/<int:index>/', views.upload_chunk, name='upload-chunk'),
+    path('uploads/<uuid:session_id>/complete/', views.complete_upload, name='upload-complete'),
     path('tags/', views.TagListView.as_view(), name='tag-list'),
-    path('search/', views.search_resources, name='search-resources'),
+    path('search/', search_resources, name='search-resources'),
+    path('search/suggest/', views.suggest_resources, name='search-suggest'),
+    path('cache/stats/', views.cache_stats, name='cache-stats'),
+    path('metrics/', views.metrics_endpoint, name='metrics'),
 ]
\ No newline at end of file
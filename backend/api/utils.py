@@ -0,0 +1,78 @@
+import logging
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+_missing_tools = set()
+
+
+class LRUCache:
+    """Small thread-safe in-process LRU cache whose entries expire after ``ttl`` seconds"""
+    
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self):
+        return len(self._data)
+
+
+class InlineExecutor:
+    """Runs submitted work immediately; stands in for a process pool when commands get --workers 0"""
+    
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+    
+    def shutdown(self, wait=True):
+        pass
+
+
+def find_tool(name):
+    """
+    Path of the command-line tool ``name``, or None. A missing tool means a
+    broken install rather than a bad file, so it is logged, once per process.
+    """
+    path = shutil.which(name)
+    if path is None and name not in _missing_tools:
+        _missing_tools.add(name)
+        logger.error('%s is not installed; jobs that need it will fail until it is', name)
+    return path
@@ -1,15 +1,24 @@
 from django.core.exceptions import ValidationError
 import os
 
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+ALLOWED_EXTENSIONS = ['.pdf', '.docx', '.doc', '.txt', '.jpg', '.jpeg', '.png', '.gif', '.mp4', '.avi', '.mov']
+
+def check_file_size(size):
+    """Reject sizes over the limit; usable before the whole file has arrived"""
+    if size > MAX_FILE_SIZE:
+        raise ValidationError(f'File size cannot exceed 10MB. Current size: {size / (1024*1024):.1f}MB')
+
+def check_file_extension(name):
+    """Reject names whose extension is not allowed"""
+    ext = os.path.splitext(name)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise ValidationError(f'File type {ext} not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}')
+
 def validate_file_size(file):
     """Validate file size - max 10MB"""
-    max_size = 10 * 1024 * 1024  # 10MB
-    if file.size > max_size:
-        raise ValidationError(f'File size cannot exceed 10MB. Current size: {file.size / (1024*1024):.1f}MB')
+    check_file_size(file.size)
 
 def validate_file_extension(file):
     """Validate file extension"""
-    allowed_extensions = ['.pdf', '.docx', '.doc', '.txt', '.jpg', '.jpeg', '.png', '.gif', '.mp4', '.avi', '.mov']
-    ext = os.path.splitext(file.name)[1].lower()
-    if ext not in allowed_extensions:
-        raise ValidationError(f'File type {ext} not allowed. Allowed types: {", ".join(allowed_extensions)}')
\ No newline at end of file
+    check_file_extension(file.name)
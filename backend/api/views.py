@@ -1,21 +1,44 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.db.models import Q, F
+from django.db import transaction
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse, Http404, StreamingHttpResponse
+from django.db.models.fields.files import FieldFile
+from django.http import (
+    Http404, HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified, JsonResponse, StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils.crypto import constant_time_compare
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import require_safe
 from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
+import asyncio
 import os
-import mimetypes
-from .models import User, Resource, Tag, Rating, Comment
+from .models import User, Resource, ResourceScore, Tag, Rating, Comment, UploadSession
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserSerializer,
-    ResourceSerializer, TagSerializer, RatingSerializer, CommentSerializer
+    ResourceSerializer, TagSerializer, RatingSerializer, CommentSerializer,
+    UploadSessionCreateSerializer, UploadSessionSerializer
 )
+from . import authentication, cache, metrics
+from .cache import CachedResponseMixin, cache_response
+from .counters import download_counter
+from .delivery import file_response, guess_content_type, offloads_transfer
+from .exporting import FORMATS, encode_rows, iter_rows
+from .previews import preview_version
 from .permissions import IsOwnerOrReadOnly, IsCommentOwnerOrReadOnly
+from .ranges import aread_file, ranged_file_response
+from .ranking import recent_downloads
+from .pagination import KeysetPagination
+from . import uploads
+from .search import FACETS, RANKED_ORDERING, afacet_counts, facet_counts, filter_by_query, is_ranked, suggest
+from .storage import resource_storage
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
@@ -51,6 +74,7 @@ def logout(request):
         refresh_token = request.data["refresh"]
         token = RefreshToken(refresh_token)
         token.blacklist()
+        authentication.invalidate(request.user.id)
         return Response({'message': 'Successfully logged out'})
     except Exception:
         return Response({'error': 'Invalid token'}, status=status.HTTP_400_BAD_REQUEST)
@@ -61,19 +85,43 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
-class ResourceListCreateView(generics.ListCreateAPIView):
-    queryset = Resource.objects.all().order_by('-upload_date')
+class ResourceListCreateView(CachedResponseMixin, generics.ListCreateAPIView):
+    queryset = Resource.objects.select_related('uploader').prefetch_related('tags').order_by('-upload_date')
     serializer_class = ResourceSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['subject', 'topic', 'course_code', 'uploader']
+    pagination_class = KeysetPagination
+    cache_scopes = (cache.RESOURCES,)
     
     def perform_create(self, serializer):
         serializer.save(uploader=self.request.user)
 
-class ResourceDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ResourceExportView(generics.GenericAPIView):
+    """Whole catalogue as streamed NDJSON (default) or CSV; accepts the resource list filters"""
     queryset = Resource.objects.all()
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ResourceListCreateView.filterset_fields
+    chunk_size = 2000
+    
+    def get(self, request):
+        export_format = request.query_params.get('export_format', 'jsonl')
+        if export_format not in FORMATS:
+            return Response({'error': f'export_format must be one of {", ".join(FORMATS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        rows = iter_rows(self.filter_queryset(self.get_queryset()), chunk_size=self.chunk_size,
+                         file_url=lambda name: request.build_absolute_uri(resource_storage.url(name)))
+        content_type = 'application/x-ndjson' if export_format == 'jsonl' else 'text/csv; charset=utf-8'
+        response = StreamingHttpResponse((line.encode() for line in encode_rows(rows, export_format)),
+                                         content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="resources.{export_format}"'
+        return response
+
+class ResourceDetailView(CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Resource.objects.select_related('uploader').prefetch_related('tags')
     serializer_class = ResourceSerializer
     permission_classes = [IsOwnerOrReadOnly]
+    cache_scopes = (cache.RESOURCES,)
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
@@ -83,13 +131,11 @@ def download_resource(request, resource_id):
     if resource.file:
         file_path = resource.file.path
         if os.path.exists(file_path):
-            # Increment download count
-            Resource.objects.filter(id=resource_id).update(download_count=F('download_count') + 1)
+            # Counted in memory and written back in batches
+            download_counter.record(resource.id)
             
-            with open(file_path, 'rb') as fh:
-                response = HttpResponse(fh.read(), content_type="application/octet-stream")
-                response['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
-                return response
+            return file_response(resource.file, content_type='application/octet-stream',
+                                 as_attachment=True, filename=resource.original_filename or os.path.basename(file_path))
     
     raise Http404("File not found")
 
@@ -97,132 +143,164 @@ def download_resource(request, resource_id):
 @permission_classes([permissions.AllowAny])
 def serve_file(request, resource_id):
     """Serve file for preview with proper content type"""
-    import mimetypes
-    from django.http import StreamingHttpResponse
-    
     resource = get_object_or_404(Resource, id=resource_id)
     
     if resource.file:
         file_path = resource.file.path
         if os.path.exists(file_path):
-            # Get the file extension and determine content type
-            content_type, _ = mimetypes.guess_type(file_path)
-            if not content_type:
-                content_type = 'application/octet-stream'
-            
-            # Handle range requests for video/audio streaming
-            file_size = os.path.getsize(file_path)
-            range_header = request.META.get('HTTP_RANGE')
+            content_type = resource.mime_type or guess_content_type(file_path)
             
-            def file_iterator(file_path, chunk_size=8192, offset=0, length=None):
-                with open(file_path, 'rb') as f:
-                    f.seek(offset)
-                    remaining = length
-                    while True:
-                        bytes_length = chunk_size if remaining is None else min(remaining, chunk_size)
-                        data = f.read(bytes_length)
-                        if not data:
-                            break
-                        if remaining:
-                            remaining -= len(data)
-                        yield data
-            
-            if range_header:
-                range_match = range_header.replace('bytes=', '').split('-')
-                start = int(range_match[0]) if range_match[0] else 0
-                end = int(range_match[1]) if range_match[1] else file_size - 1
-                length = end - start + 1
-                
-                response = StreamingHttpResponse(
-                    file_iterator(file_path, offset=start, length=length),
-                    status=206,
-                    content_type=content_type
-                )
-                response['Content-Range'] = f'bytes {start}-{end}/{file_size}'
-                response['Accept-Ranges'] = 'bytes'
-                response['Content-Length'] = str(length)
+            if offloads_transfer():
+                # The front-end server handles Range and validators itself when it sends the file
+                response = file_response(resource.file, content_type=content_type,
+                                         filename=resource.original_filename or None)
             else:
-                response = StreamingHttpResponse(
-                    file_iterator(file_path),
-                    content_type=content_type
-                )
-                response['Content-Length'] = str(file_size)
-                response['Accept-Ranges'] = 'bytes'
-            
-            # Add CORS headers for cross-origin requests
-            response['Access-Control-Allow-Origin'] = '*'
-            response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
-            response['Access-Control-Allow-Headers'] = 'Range'
-            response['Cache-Control'] = 'no-cache'
+                # Content-addressed files carry their SHA-256, the strongest validator there is
+                etag = f'"{resource.content_hash}"' if resource.content_hash else None
+                response = ranged_file_response(request, file_path, content_type, etag=etag)
             
-            return response
+            return _allow_cross_origin(response)
     
     raise Http404("File not found")
 
-class TagListView(generics.ListCreateAPIView):
+def _allow_cross_origin(response):
+    # Add CORS headers for cross-origin requests
+    response['Access-Control-Allow-Origin'] = '*'
+    response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
+    response['Access-Control-Allow-Headers'] = 'Range, If-Range, If-None-Match, If-Modified-Since'
+    response['Access-Control-Expose-Headers'] = 'Content-Range, Content-Length, ETag, Last-Modified'
+    return response
+
+async def _aget_file_resource(resource_id):
+    """The resource and the path of its file, or Http404, without blocking the event loop"""
+    try:
+        resource = await Resource.objects.only('id', 'file', 'mime_type', 'original_filename').aget(id=resource_id)
+    except Resource.DoesNotExist:
+        raise Http404("File not found")
+    if not resource.file or not await asyncio.to_thread(os.path.exists, resource.file.path):
+        raise Http404("File not found")
+    return resource, resource.file.path
+
+async def adownload_resource(request, resource_id):
+    """``download_resource`` for ASGI: the file is streamed by a coroutine instead of a worker thread"""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET'])
+    resource, file_path = await _aget_file_resource(resource_id)
+    await sync_to_async(download_counter.record)(resource.id)
+    
+    filename = resource.original_filename or os.path.basename(file_path)
+    if offloads_transfer():
+        return file_response(resource.file, content_type='application/octet-stream', as_attachment=True, filename=filename)
+    response = StreamingHttpResponse(aread_file(file_path), content_type='application/octet-stream')
+    response['Content-Length'] = str(await asyncio.to_thread(os.path.getsize, file_path))
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+async def aserve_file(request, resource_id):
+    """``serve_file`` for ASGI: thousands of slow range requests cost a coroutine each, not a thread"""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET'])
+    resource, file_path = await _aget_file_resource(resource_id)
+    content_type = resource.mime_type or guess_content_type(file_path)
+    
+    if offloads_transfer():
+        response = file_response(resource.file, content_type=content_type, filename=resource.original_filename or None)
+    else:
+        etag = f'"{resource.content_hash}"' if resource.content_hash else None
+        stat = await asyncio.to_thread(os.stat, file_path)
+        response = ranged_file_response(request, file_path, content_type, stat=stat, etag=etag, reader=aread_file)
+    return _allow_cross_origin(response)
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def resource_preview(request, resource_id, rendition):
+    """Generated thumbnail or preview image; 404 until the process_jobs worker has drawn it"""
+    resource = get_object_or_404(Resource.objects.only('id', 'previews'), id=resource_id)
+    name = resource.previews.get(rendition)
+    if not name or not resource_storage.exists(name):
+        raise Http404("No preview yet")
+    
+    etag = f'"{preview_version(name)}"'
+    if request.GET.get('v') == preview_version(name):
+        # A versioned URL always names the same bytes
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = 'public, max-age=300'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = file_response(FieldFile(None, Resource._meta.get_field('file'), name), content_type='image/jpeg')
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    response['Access-Control-Allow-Origin'] = '*'
+    return response
+
+class TagListView(CachedResponseMixin, generics.ListCreateAPIView):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    cache_scopes = (cache.TAGS,)
 
 class RatingListCreateView(generics.ListCreateAPIView):
     serializer_class = RatingSerializer
     
     def get_queryset(self):
-        return Rating.objects.filter(resource_id=self.kwargs['resource_id'])
+        return Rating.objects.filter(resource_id=self.kwargs['resource_id']).select_related('user')
     
     def create(self, request, *args, **kwargs):
-        resource = Resource.objects.get(id=self.kwargs['resource_id'])
-        rating_value = request.data.get('rating_value')
+        resource = get_object_or_404(Resource, id=self.kwargs['resource_id'])
+        try:
+            rating_value = int(request.data.get('rating_value'))
+        except (TypeError, ValueError):
+            rating_value = None
+        if rating_value is None or not 1 <= rating_value <= 5:
+            return Response({'rating_value': ['Rating must be an integer between 1 and 5.']},
+                            status=status.HTTP_400_BAD_REQUEST)
         
-        # Update or create rating
-        rating, created = Rating.objects.update_or_create(
-            resource=resource,
-            user=request.user,
-            defaults={'rating_value': rating_value}
-        )
+        # Update or create rating; signals keep the resource aggregates in step
+        with transaction.atomic():
+            rating, created = Rating.objects.update_or_create(
+                resource=resource,
+                user=request.user,
+                defaults={'rating_value': rating_value}
+            )
         
         serializer = self.get_serializer(rating)
         return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
-class CommentListCreateView(generics.ListCreateAPIView):
+class CommentListCreateView(CachedResponseMixin, generics.ListCreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cache_scopes = (cache.COMMENTS,)
     
     def get_queryset(self):
-        return Comment.objects.filter(resource_id=self.kwargs['resource_id']).order_by('-created_at')
+        return Comment.objects.filter(resource_id=self.kwargs['resource_id']).select_related('user').order_by('-created_at')
     
     def create(self, request, *args, **kwargs):
         try:
             resource = Resource.objects.get(id=self.kwargs['resource_id'])
         except Resource.DoesNotExist:
             return Response({'error': 'Resource not found'}, status=status.HTTP_404_NOT_FOUND)
-            
+        
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         comment = serializer.save(user=request.user, resource=resource)
         return Response(CommentSerializer(comment).data, status=status.HTTP_201_CREATED)
 
 class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related('user')
     serializer_class = CommentSerializer
     permission_classes = [IsCommentOwnerOrReadOnly]
 
-@api_view(['GET'])
-@permission_classes([permissions.AllowAny])
-def search_resources(request):
-    query = request.GET.get('query', '')
-    subject = request.GET.get('subject', '')
-    topic = request.GET.get('topic', '')
-    uploader = request.GET.get('uploader', '')
+def _search_queryset(params):
+    query = params.get('query', '')
+    subject = params.get('subject', '')
+    topic = params.get('topic', '')
+    uploader = params.get('uploader', '')
     
-    resources = Resource.objects.all()
+    resources = Resource.objects.select_related('uploader').prefetch_related('tags')
     
     if query:
-        resources = resources.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(subject__icontains=query) |
-            Q(topic__icontains=query)
-        )
+        resources = filter_by_query(resources, query)
     
     if subject:
         resources = resources.filter(subject__icontains=subject)
@@ -232,30 +310,202 @@ def search_resources(request):
     
     if uploader:
         resources = resources.filter(uploader__name__icontains=uploader)
+    return resources
+
+def _facet_params(params):
+    """Requested facet names and values per facet; ValueError names an unknown facet"""
+    facets = list(dict.fromkeys(name for name in params.get('facets', '').split(',') if name))
+    unknown = [name for name in facets if name not in FACETS]
+    if unknown:
+        raise ValueError(f'Unknown facet {unknown[0]!r}; choose from {", ".join(FACETS)}')
+    try:
+        facet_limit = min(max(int(params.get('facet_limit', 10)), 1), 50)
+    except ValueError:
+        facet_limit = 10
+    return facets, facet_limit
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@cache_response(cache.RESOURCES)
+def search_resources(request):
+    resources = _search_queryset(request.GET)
+    try:
+        facets, facet_limit = _facet_params(request.GET)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Add pagination for large result sets
-    from django.core.paginator import Paginator
+    paginator = KeysetPagination(ordering=RANKED_ORDERING if is_ranked(resources) else None)
+    page = paginator.paginate_queryset(resources, request)
+    serializer = ResourceSerializer(page, many=True)
+    response = paginator.get_paginated_response(serializer.data)
+    if facets:
+        # Counts cover the whole result set, not just this page
+        response.data['facets'] = facet_counts(resources, facets, facet_limit)
+    return response
+
+async def asearch_resources(request):
+    """``search_resources`` for ASGI: same JSON and cache entries, queried through the async ORM"""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET'])
+    request = Request(request)
     
-    page_size = request.GET.get('page_size', 20)
-    page = request.GET.get('page', 1)
+    async def compute():
+        resources = _search_queryset(request.GET)
+        try:
+            facets, facet_limit = _facet_params(request.GET)
+        except ValueError as exc:
+            return {'error': str(exc)}, status.HTTP_400_BAD_REQUEST
+        
+        paginator = KeysetPagination(ordering=RANKED_ORDERING if is_ranked(resources) else None)
+        try:
+            page = await paginator.apaginate_queryset(resources, request)
+        except NotFound as exc:
+            return {'detail': exc.detail}, status.HTTP_404_NOT_FOUND
+        data = paginator.get_paginated_response(ResourceSerializer(page, many=True).data).data
+        if facets:
+            data['facets'] = await afacet_counts(resources, facets, facet_limit)
+        return data, status.HTTP_200_OK
     
+    return await cache.acached(request, 'search_resources', (cache.RESOURCES,), compute)
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def suggest_resources(request):
+    """Autocomplete for the search box: completions for a title, tag or course code prefix"""
+    query = request.GET.get('query', '')
     try:
-        page_size = int(page_size)
-        page = int(page)
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
     except ValueError:
-        page_size = 20
-        page = 1
+        limit = 8
     
-    paginator = Paginator(resources, page_size)
-    page_obj = paginator.get_page(page)
+    response = Response({'suggestions': suggest(query, limit)})
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
+def _ranked_resources(request, score_field, scores):
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    subject = request.GET.get('subject', '')
+    course_code = request.GET.get('course_code', '')
+    if subject:
+        scores = scores.filter(subject=subject)
+    if course_code:
+        scores = scores.filter(course_code=course_code)
     
-    serializer = ResourceSerializer(page_obj.object_list, many=True)
+    scores = list(scores.order_by(f'-{score_field}', 'resource_id')
+                  .select_related('resource__uploader').prefetch_related('resource__tags')[:limit])
+    results = ResourceSerializer([score.resource for score in scores], many=True, context={'request': request}).data
+    for item, score in zip(results, scores):
+        value = getattr(score, score_field)
+        item[score_field] = round(recent_downloads(value), 2) if score_field == 'trending_score' else round(value, 3)
+    return Response({'results': results})
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@cache_response(cache.RESOURCES, cache.RANKINGS)
+def trending_resources(request):
+    """Most downloaded resources, recent downloads counting most; scores are refreshed by refresh_scores"""
+    return _ranked_resources(request, 'trending_score', ResourceScore.objects.filter(trending_score__isnull=False))
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@cache_response(cache.RESOURCES, cache.RANKINGS)
+def top_resources(request):
+    """Highest rated resources by Bayesian average, so a handful of ratings can't top the list"""
+    try:
+        min_ratings = max(int(request.GET.get('min_ratings', 1)), 0)
+    except ValueError:
+        min_ratings = 1
+    return _ranked_resources(request, 'rating_score', ResourceScore.objects.filter(rating_count__gte=min_ratings))
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def cache_stats(request):
+    """Response cache hit/miss counters of this worker process"""
+    return Response(cache.stats.snapshot())
+
+@require_safe
+def metrics_endpoint(request):
+    """Request metrics of this worker process in Prometheus text format, for scraping"""
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return JsonResponse({'error': 'A valid metrics token is required'}, status=401)
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@api_view(['POST'])
+def create_upload_session(request):
+    """Start a chunked upload: declare the file and resource metadata, get back the chunk layout"""
+    serializer = UploadSessionCreateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    metadata = dict(serializer.validated_data)
+    filename = metadata.pop('filename')
+    size = metadata.pop('size')
+    
+    session = UploadSession.objects.create(
+        user=request.user,
+        filename=os.path.basename(filename),
+        total_size=size,
+        chunk_size=settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        metadata=metadata,
+    )
+    uploads.create_part_file(session)
+    return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+@api_view(['GET', 'DELETE'])
+def upload_session_detail(request, session_id):
+    """Progress of an upload (which chunks are still missing), or abort it"""
+    session = get_object_or_404(UploadSession, id=session_id, user=request.user)
+    if request.method == 'DELETE':
+        uploads.discard_part_file(session)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(UploadSessionSerializer(session).data)
+
+@api_view(['PUT'])
+def upload_chunk(request, session_id, index):
+    """Store one chunk; the raw request body is streamed to its offset in the part file"""
+    session = get_object_or_404(UploadSession, id=session_id, user=request.user, status='active')
+    if index >= session.chunk_count:
+        return Response({'error': f'Chunk index must be below {session.chunk_count}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        uploads.write_chunk(session, index, request.stream)
+    except ValidationError as exc:
+        return Response({'error': exc.messages}, status=status.HTTP_400_BAD_REQUEST)
+    except FileNotFoundError:
+        raise Http404('Upload data not found')
     
-    return Response({
-        'results': serializer.data,
-        'count': paginator.count,
-        'num_pages': paginator.num_pages,
-        'current_page': page,
-        'has_next': page_obj.has_next(),
-        'has_previous': page_obj.has_previous()
-    })
\ No newline at end of file
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(id=session.id)
+        if index not in session.received_chunks:
+            session.received_chunks = sorted(session.received_chunks + [index])
+            session.save(update_fields=['received_chunks', 'updated_at'])
+    return Response(UploadSessionSerializer(session).data)
+
+@api_view(['POST'])
+def complete_upload(request, session_id):
+    """Validate the assembled file and create the resource from it"""
+    with transaction.atomic():
+        # Locked, so concurrent calls can't both create a resource from the same upload
+        session = get_object_or_404(UploadSession.objects.select_for_update(), id=session_id, user=request.user)
+        if session.status == 'complete':
+            # A retried or concurrent call: answer with what the first one created
+            if session.resource is None:
+                raise NotFound()
+            return Response(ResourceSerializer(session.resource, context={'request': request}).data)
+        if session.missing_chunks:
+            return Response({'error': 'Upload is incomplete', 'missing_chunks': session.missing_chunks},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        with uploads.open_assembled(session) as assembled:
+            serializer = ResourceSerializer(data={**session.metadata, 'file': assembled}, context={'request': request})
+            serializer.is_valid(raise_exception=True)
+            resource = serializer.save(uploader=request.user)
+        session.status = 'complete'
+        session.resource = resource
+        session.save(update_fields=['status', 'resource', 'updated_at'])
+    uploads.discard_part_file(session)
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
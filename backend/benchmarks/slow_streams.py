@@ -0,0 +1,134 @@
+"""Slow-client load test for file streaming: threaded WSGI workers vs ASGI.
+
+Opens ``--streams`` concurrent requests for one resource's file and reads
+each at ``--read-rate`` KB/s, like phones on a poor connection. A probe
+meanwhile requests ``--probe-path`` every ``--probe-interval`` seconds and
+records how long it takes. Under a threaded WSGI server every slow stream
+holds a thread, so once they outnumber the threads the probe queues behind
+them. Under an ASGI server with ``ASYNC_VIEWS=True`` each stream is a
+coroutine and the probe stays fast. Only the standard library is used.
+
+    # WSGI: one process, 8 threads
+    gunicorn studyshare.wsgi -w 1 --threads 8
+    python benchmarks/slow_streams.py --resource 1 --streams 200
+    
+    # ASGI
+    ASYNC_VIEWS=True uvicorn studyshare.asgi:application --port 8000
+    python benchmarks/slow_streams.py --resource 1 --streams 200
+
+Pick a file of several MB (a video) so that socket buffers can't absorb it.
+"""
+import argparse
+import asyncio
+import socket
+import statistics
+import time
+from urllib.parse import urlsplit
+
+RECEIVE_BUFFER = 16 * 1024
+
+
+async def open_connection(host, port):
+    # A small receive window keeps the server from pushing the whole file into kernel buffers
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, (host, port))
+    return await asyncio.open_connection(sock=sock, limit=RECEIVE_BUFFER)
+
+
+async def request(host, port, path):
+    """Send a GET and return ``(reader, writer, status)`` once the response headers are in"""
+    reader, writer = await open_connection(host, port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n'.encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    while (await reader.readline()) not in (b'\r\n', b''):
+        pass
+    status = int(status_line.split()[1]) if status_line else 0
+    return reader, writer, status
+
+
+async def slow_stream(host, port, path, rate, duration, results):
+    started = time.monotonic()
+    try:
+        reader, writer, status = await request(host, port, path)
+    except OSError as exc:
+        results['errors'].append(str(exc))
+        return
+    results['first_byte'].append(time.monotonic() - started)
+    chunk = max(rate // 10, 1)
+    try:
+        while time.monotonic() - started < duration:
+            data = await reader.read(chunk)
+            if not data:
+                break
+            results['bytes'] += len(data)
+            await asyncio.sleep(0.1)
+    finally:
+        writer.close()
+
+
+async def probe(host, port, path, interval, duration, timeout, latencies):
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            reader, writer, status = await asyncio.wait_for(request(host, port, path), timeout)
+            await asyncio.wait_for(reader.read(), timeout)
+            writer.close()
+            latencies.append(time.monotonic() - started if status == 200 else None)
+        except (asyncio.TimeoutError, OSError):
+            latencies.append(None)
+        await asyncio.sleep(max(interval - (time.monotonic() - started), 0))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else float('nan')
+
+
+async def main(options):
+    url = urlsplit(options.url)
+    host, port = url.hostname, url.port or 80
+    file_path = f'{url.path.rstrip("/")}/api/resources/{options.resource}/{options.endpoint}/'
+    results = {'first_byte': [], 'bytes': 0, 'errors': []}
+    latencies = []
+    
+    print(f'{options.streams} streams of {file_path} at {options.read_rate} KB/s for {options.duration}s, '
+          f'probing {options.probe_path}')
+    streams = [
+        asyncio.create_task(slow_stream(host, port, file_path, options.read_rate * 1024, options.duration, results))
+        for _ in range(options.streams)
+    ]
+    # Let the streams take their seats before measuring
+    await asyncio.sleep(1)
+    await probe(host, port, options.probe_path, options.probe_interval, options.duration - 1,
+                options.probe_timeout, latencies)
+    await asyncio.gather(*streams)
+    
+    answered = [latency for latency in latencies if latency is not None]
+    print(f'streams started:      {len(results["first_byte"])}/{options.streams} '
+          f'({len(results["errors"])} connection errors)')
+    print(f'time to first byte:   p50 {percentile(results["first_byte"], 0.5) * 1000:.0f} ms, '
+          f'p95 {percentile(results["first_byte"], 0.95) * 1000:.0f} ms')
+    print(f'stream throughput:    {results["bytes"] / options.duration / 1024 / 1024:.1f} MB/s total')
+    print(f'probe requests:       {len(answered)}/{len(latencies)} answered within {options.probe_timeout}s')
+    if answered:
+        print(f'probe latency:        p50 {percentile(answered, 0.5) * 1000:.0f} ms, '
+              f'p95 {percentile(answered, 0.95) * 1000:.0f} ms, '
+              f'mean {statistics.mean(answered) * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--resource', type=int, required=True, help='Id of the resource whose file is streamed')
+    parser.add_argument('--endpoint', choices=['serve', 'download'], default='serve')
+    parser.add_argument('--streams', type=int, default=200)
+    parser.add_argument('--read-rate', type=int, default=32, help='KB/s each stream reads')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--probe-path', default='/api/search/?query=notes')
+    parser.add_argument('--probe-interval', type=float, default=1.0)
+    parser.add_argument('--probe-timeout', type=float, default=10.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,80 @@
+"""PostgreSQL backend that borrows connections from an in-process pool.
+
+Django opens a connection per thread and, with ``CONN_MAX_AGE = 0``,
+closes it when the request ends. Here "opening" takes a connection from
+the worker's ``ConnectionPool`` and "closing" gives it back. The threads
+of a worker share a bounded set of connections, and a request only pays
+for the TCP and authentication handshake when the pool has to grow.
+
+Settings come from the ``POOL`` entry of the database settings: ``SIZE``,
+``MAX_OVERFLOW``, ``TIMEOUT`` (seconds a request waits for a free
+connection) and ``MAX_AGE`` (seconds before a connection is replaced).
+With ``CONN_HEALTH_CHECKS`` an idle connection is pinged before it is
+reused. Pools are per process; create them after forking, as gunicorn
+does unless ``--preload`` is given. Requires psycopg2.
+"""
+import threading
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from .pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias):
+    """The pool of database ``alias`` in this process, or None before its first connection"""
+    return _pools.get(alias)
+
+
+def _usable(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+    except base.Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self):
+        with _pools_lock:
+            if self.alias not in _pools:
+                options = self.settings_dict.get('POOL', {})
+                _pools[self.alias] = ConnectionPool(
+                    size=options.get('SIZE', 5),
+                    max_overflow=options.get('MAX_OVERFLOW', 10),
+                    timeout=options.get('TIMEOUT', 30.0),
+                    max_age=options.get('MAX_AGE'),
+                    check=_usable if self.settings_dict['CONN_HEALTH_CHECKS'] else None,
+                )
+            return _pools[self.alias]
+    
+    def get_new_connection(self, conn_params):
+        # A new connection sets the isolation level as it is made; reused ones need it too
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        return self.pool.acquire(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+    
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        try:
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                # Never hand the next request a connection in the middle of a transaction
+                connection.rollback()
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                # In autocommit mode psycopg2 leaves transactions opened with a raw BEGIN alone
+                with connection.cursor() as cursor:
+                    cursor.execute('ROLLBACK')
+            reusable = not self.errors_occurred or _usable(connection)
+        except base.Database.Error:
+            reusable = False
+        self.pool.release(connection, reusable=reusable)
@@ -0,0 +1,121 @@
+"""A bounded pool of DB-API connections shared by the threads of one process."""
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Every connection stayed busy for the whole wait"""
+
+
+class ConnectionPool:
+    """
+    Keeps up to ``size`` connections open between uses. When they are all
+    checked out, up to ``max_overflow`` more are opened and closed again on
+    release. Past that, ``acquire`` waits up to ``timeout`` seconds for
+    one to come back.
+    
+    ``acquire(connect)`` calls ``connect()`` when a connection has to be
+    opened. ``check(connection)`` decides whether an idle connection is
+    still usable before it is handed out.
+    Connections older than ``max_age`` seconds are closed instead of
+    being reused.
+    """
+    
+    def __init__(self, size=5, max_overflow=10, timeout=30.0, max_age=None, check=None):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_age = max_age
+        self._check = check
+        self._available = threading.Condition()
+        # LIFO, so the warmest connections are reused and extra ones age out
+        self._idle = deque()
+        self._opened_at = {}
+        self._open = 0
+        self.waits = 0
+        self.timeouts = 0
+    
+    def acquire(self, connect):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection = None
+            with self._available:
+                while not self._idle and self._open >= self.size + self.max_overflow:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(f'No database connection free within {self.timeout}s '
+                                          f'({self.size} pooled + {self.max_overflow} overflow in use)')
+                    self.waits += 1
+                    self._available.wait(remaining)
+                if self._idle:
+                    connection = self._idle.pop()
+                else:
+                    self._open += 1
+            if connection is None:
+                return self._open_connection(connect)
+            if not self._expired(connection) and (self._check is None or self._check(connection)):
+                return connection
+            # Dead or too old; make room and try again
+            self._discard(connection)
+    
+    def release(self, connection, reusable=True):
+        """Take a connection back; ``reusable=False`` closes it, e.g. after it broke"""
+        with self._available:
+            keep = reusable and not self._expired(connection) and len(self._idle) < self.size
+            if keep:
+                self._idle.append(connection)
+                self._available.notify()
+        if not keep:
+            self._discard(connection)
+    
+    def close(self):
+        """Close the idle connections; checked-out ones are closed when they come back"""
+        with self._available:
+            idle = list(self._idle)
+            self._idle.clear()
+        for connection in idle:
+            self._discard(connection)
+    
+    def stats(self):
+        with self._available:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+            }
+    
+    def _open_connection(self, connect):
+        try:
+            connection = connect()
+        except BaseException:
+            self._forget(None)
+            raise
+        with self._available:
+            self._opened_at[id(connection)] = time.monotonic()
+        return connection
+    
+    def _expired(self, connection):
+        if getattr(connection, 'closed', False):
+            return True
+        opened_at = self._opened_at.get(id(connection))
+        return self.max_age is not None and opened_at is not None and time.monotonic() - opened_at >= self.max_age
+    
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        self._forget(connection)
+    
+    def _forget(self, connection):
+        with self._available:
+            if connection is not None:
+                self._opened_at.pop(id(connection), None)
+            self._open -= 1
+            self._available.notify()
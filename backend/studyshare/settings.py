@@ -20,8 +20,10 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'cloudinary_storage',
     'cloudinary',
@@ -61,16 +63,51 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'studyshare.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': config('DB_NAME', default='studyshare'),
-        'USER': config('DB_USER', default='postgres'),
-        'PASSWORD': config('DB_PASSWORD', default='password'),
-        'HOST': config('DB_HOST', default='localhost'),
-        'PORT': config('DB_PORT', default='5432'),
+# DB_ENGINE=sqlite runs on a local file instead (DB_NAME, default db.sqlite3), e.g. for offline benchmarks.
+# Full-text search ranking needs PostgreSQL; SQLite falls back to substring matching.
+DB_ENGINE = config('DB_ENGINE', default='postgresql')
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='studyshare'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default='password'),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+        }
+    }
+
+# Connection lifecycle. Each worker thread keeps its connection for DB_CONN_MAX_AGE seconds
+# (0 opens a new one for every request) and checks it is alive before reusing it. Django
+# advises 0 under ASGI; reuse connections there through the pool below.
+DATABASES['default'].update(
+    CONN_MAX_AGE=config('DB_CONN_MAX_AGE', default=60, cast=int),
+    CONN_HEALTH_CHECKS=config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+)
+# DB_POOL_SIZE > 0 shares a pool of connections between the threads of a worker instead
+# (PostgreSQL only, see studyshare/pooled_postgresql). Connections go back to the pool
+# when the request ends; DB_POOL_MAX_OVERFLOW extra ones are opened under load, and a
+# request waits up to DB_POOL_TIMEOUT seconds for a free one.
+DB_POOL_SIZE = config('DB_POOL_SIZE', default=0, cast=int)
+if DB_POOL_SIZE > 0 and DB_ENGINE != 'sqlite':
+    DATABASES['default'].update(
+        ENGINE='studyshare.pooled_postgresql',
+        CONN_MAX_AGE=0,
+        POOL={
+            'SIZE': DB_POOL_SIZE,
+            'MAX_OVERFLOW': config('DB_POOL_MAX_OVERFLOW', default=10, cast=int),
+            'TIMEOUT': config('DB_POOL_TIMEOUT', default=30.0, cast=float),
+            'MAX_AGE': config('DB_POOL_MAX_AGE', default=3600, cast=int),
+        },
+    )
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -91,13 +128,20 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# How downloads and previews are sent: 'direct' (FileResponse/sendfile from Django),
+# 'x-accel-redirect' (nginx internal location) or 'x-sendfile' (Apache/lighttpd)
+FILE_DELIVERY_BACKEND = config('FILE_DELIVERY_BACKEND', default='direct')
+FILE_DELIVERY_INTERNAL_URL = config('FILE_DELIVERY_INTERNAL_URL', default='/protected-media/')
+# max-age for previews; 0 lets caches store them but revalidate with ETag/Last-Modified
+FILE_CACHE_MAX_AGE = config('FILE_CACHE_MAX_AGE', default=0, cast=int)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'api.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -110,6 +154,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
 }
+# Seconds each worker reuses an authenticated user before loading it again (api/authentication.py); 0 disables
+AUTH_CACHE_TIMEOUT = config('AUTH_CACHE_TIMEOUT', default=60, cast=int)
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -141,11 +187,17 @@ X_FRAME_OPTIONS = 'SAMEORIGIN'
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'api.logs.JSONFormatter',
+        },
+    },
     'handlers': {
         'file': {
             'level': 'INFO',
             'class': 'logging.FileHandler',
             'filename': BASE_DIR / 'api.log',
+            'formatter': 'json',
         },
         'console': {
             'level': 'INFO',
@@ -161,6 +213,63 @@ LOGGING = {
     },
 }
 
+# Request logging (api/middleware.py). Every API request is counted in /api/metrics/;
+# only this fraction of them is logged, plus all server errors and slow requests.
+API_LOG_SAMPLE_RATE = config('API_LOG_SAMPLE_RATE', default=1.0, cast=float)
+API_LOG_SLOW_MS = config('API_LOG_SLOW_MS', default=1000, cast=float)
+# Request log records wait in a queue of this size for a background writer (0 writes them inline)
+API_LOG_QUEUE_SIZE = config('API_LOG_QUEUE_SIZE', default=10000, cast=int)
+# When set, /api/metrics/ requires "Authorization: Bearer <token>"
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Download counts are buffered per process and flushed every N seconds (0 writes each download immediately)
+DOWNLOAD_COUNT_FLUSH_INTERVAL = config('DOWNLOAD_COUNT_FLUSH_INTERVAL', default=5.0, cast=float)
+DOWNLOAD_COUNT_MAX_BUFFER = config('DOWNLOAD_COUNT_MAX_BUFFER', default=1000, cast=int)
+
+# Autocomplete settings
+SEARCH_SUGGEST_CACHE_SIZE = config('SEARCH_SUGGEST_CACHE_SIZE', default=2048, cast=int)
+SEARCH_SUGGEST_CACHE_TTL = config('SEARCH_SUGGEST_CACHE_TTL', default=60, cast=int)
+
+# Response cache for resource, tag, comment and search reads (api/cache.py). The
+# local-memory default is per process; point CACHE_BACKEND at Redis or Memcached
+# so invalidations are shared between workers. RESPONSE_CACHE_TIMEOUT=0 disables it.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='studyshare'),
+    }
+}
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
\ No newline at end of file
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB; larger multipart uploads spill to a temporary file
+# The temporary-file handler hashes uploads as they stream in, for the content-addressed store
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'api.storage.HashingTemporaryFileUploadHandler',
+]
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Chunked uploads (/api/uploads/): chunk size handed to clients and where part files are kept.
+# The directory must be on the same filesystem as MEDIA_ROOT so completed files are moved, not copied.
+CHUNKED_UPLOAD_CHUNK_SIZE = config('CHUNKED_UPLOAD_CHUNK_SIZE', default=1024 * 1024, cast=int)
+CHUNKED_UPLOAD_DIR = config('CHUNKED_UPLOAD_DIR', default='') or None
+CHUNKED_UPLOAD_EXPIRY_HOURS = config('CHUNKED_UPLOAD_EXPIRY_HOURS', default=24, cast=int)
+
+# Trending and top-rated scores (recomputed by the refresh_scores command)
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=72, cast=float)
+TRENDING_TALLY_RETENTION_DAYS = config('TRENDING_TALLY_RETENTION_DAYS', default=30, cast=int)
+RATING_PRIOR_WEIGHT = config('RATING_PRIOR_WEIGHT', default=5, cast=float)
+
+# Background jobs (thumbnails/previews), run by the process_jobs command.
+# A running job not finished within PROCESSING_JOB_TIMEOUT seconds is retried.
+PROCESSING_JOB_TIMEOUT = config('PROCESSING_JOB_TIMEOUT', default=600, cast=int)
+PREVIEW_COMMAND_TIMEOUT = config('PREVIEW_COMMAND_TIMEOUT', default=60, cast=int)
+# Characters of extracted document text fed into the search index per resource
+SEARCH_CONTENT_MAX_CHARS = config('SEARCH_CONTENT_MAX_CHARS', default=100000, cast=int)
+
+# Route file serving, downloads and search to their async views. Turn on only when running
+# under an ASGI server (e.g. `uvicorn studyshare.asgi:application`); under WSGI they'd run
+# through a sync adapter for no benefit.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
@@ -5,10 +5,11 @@ interface FileViewerProps {
   fileUrl: string;
   fileName: string;
   resourceId?: number;
+  thumbnailUrl?: string | null;
   className?: string;
 }
 
-const FileViewer: React.FC<FileViewerProps> = ({ fileUrl, fileName, resourceId, className = '' }) => {
+const FileViewer: React.FC<FileViewerProps> = ({ fileUrl, fileName, resourceId, thumbnailUrl, className = '' }) => {
   const getFileExtension = (filename: string): string => {
     return filename.split('.').pop()?.toLowerCase() || '';
   };
@@ -34,6 +35,18 @@ const FileViewer: React.FC<FileViewerProps> = ({ fileUrl, fileName, resourceId,
     : (fileUrl.startsWith('http') ? fileUrl : `http://localhost:8000${fileUrl}`);
 
   const renderThumbnail = () => {
+    // Server-generated thumbnail: a few KB instead of the whole original
+    if (thumbnailUrl) {
+      return (
+        <img
+          src={thumbnailUrl}
+          alt={fileName}
+          loading="lazy"
+          className="w-full h-full object-cover"
+        />
+      );
+    }
+
     switch (fileType) {
       case 'pdf':
         return (
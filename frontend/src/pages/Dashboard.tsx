@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
-import { Resource } from '../types';
+import { Resource, ResourcePage } from '../types';
 import api from '../utils/api';
 import { StarIcon, EyeIcon, ArrowDownTrayIcon } from '@heroicons/react/24/solid';
 import Loader from '../components/Loader';
@@ -20,13 +20,15 @@ const Dashboard: React.FC = () => {
 
   const fetchResources = async () => {
     try {
-      const response = await api.get('/resources/');
-      const allResources = response.data;
-      setResources(allResources.slice(0, 6));
-      
-      // Mock most downloaded and top rated for demo
-      setMostDownloaded(allResources.slice(0, 3));
-      setTopRated(allResources.sort((a: Resource, b: Resource) => b.average_rating - a.average_rating).slice(0, 3));
+      const [recent, trending, top] = await Promise.all([
+        api.get<ResourcePage>('/resources/?page_size=6'),
+        api.get<{ results: Resource[] }>('/resources/trending/?limit=3'),
+        api.get<{ results: Resource[] }>('/resources/top/?limit=3'),
+      ]);
+      setResources(recent.data.results);
+      // Ranked on the server across every resource, not just the first page
+      setMostDownloaded(trending.data.results);
+      setTopRated(top.data.results);
     } catch (error) {
       console.error('Error fetching resources:', error);
     } finally {
@@ -40,8 +42,9 @@ const Dashboard: React.FC = () => {
       <div className="h-32 relative">
         <FileViewer
           fileUrl={resource.file}
-          fileName={resource.file.split('/').pop() || 'Unknown file'}
+          fileName={resource.original_filename || resource.file.split('/').pop() || 'Unknown file'}
           resourceId={resource.id}
+          thumbnailUrl={resource.thumbnail_url}
           className="w-full h-full"
         />
         <div className="absolute top-2 right-2">
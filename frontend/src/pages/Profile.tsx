@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../hooks/useAuth';
-import { Resource } from '../types';
+import { Resource, ResourcePage } from '../types';
 import api from '../utils/api';
 import { StarIcon, TrashIcon } from '@heroicons/react/24/outline';
 import Loader from '../components/Loader';
@@ -19,8 +19,15 @@ const Profile: React.FC = () => {
 
   const fetchUserResources = async () => {
     try {
-      const response = await api.get(`/resources/?uploader=${user?.id}`);
-      setUserResources(response.data);
+      // The list is paged by cursor; follow next until the last page
+      const collected: Resource[] = [];
+      let url: string | null = `/resources/?uploader=${user?.id}&page_size=100`;
+      while (url) {
+        const response = await api.get<ResourcePage>(url);
+        collected.push(...response.data.results);
+        url = response.data.next;
+      }
+      setUserResources(collected);
     } catch (error) {
       console.error('Error fetching user resources:', error);
     } finally {
@@ -176,7 +176,7 @@ const ResourceDetail: React.FC = () => {
         {/* File Preview */}
         <FilePreview
           fileUrl={resource.file}
-          fileName={resource.file.split('/').pop() || 'Unknown file'}
+          fileName={resource.original_filename || resource.file.split('/').pop() || 'Unknown file'}
           title={resource.title}
           resourceId={resource.id}
           onDownload={downloadFile}
@@ -259,7 +259,7 @@ const ResourceDetail: React.FC = () => {
         isOpen={showPreviewModal}
         onClose={() => setShowPreviewModal(false)}
         fileUrl={resource.file}
-        fileName={resource.file.split('/').pop() || 'Unknown file'}
+        fileName={resource.original_filename || resource.file.split('/').pop() || 'Unknown file'}
         title={resource.title}
         resourceId={resource.id}
         onDownload={downloadFile}
@@ -12,6 +12,9 @@ export interface Resource {
   title: string;
   description: string;
   file: string;
+  original_filename?: string;
+  thumbnail_url?: string | null;
+  preview_url?: string | null;
   uploader: User;
   subject: string;
   topic: string;
@@ -21,6 +24,11 @@ export interface Resource {
   average_rating: number;
 }
 
+export interface ResourcePage {
+  next: string | null;
+  results: Resource[];
+}
+
 export interface Tag {
   id: number;
   name: string;